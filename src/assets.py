@@ -0,0 +1,116 @@
+import os
+import re
+from typing import Dict, Tuple
+
+from memo import clear_memos
+from template_engine import Template
+
+# the fingerprint is this many hex characters of the content hash
+FINGERPRINT_LENGTH = 8
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+asset_attribute_regex = re.compile(r"""(\b(?:href|src)\s*=\s*)(["'])([^"']+)\2""")
+
+# url of every static file to the url of its fingerprinted copy, for the build running in this process
+asset_map: Dict[str, str] = {}
+
+
+def fingerprinted_path(rel_path: str, content_hash: str, length: int = FINGERPRINT_LENGTH) -> str:
+    """the name a static file is published under, e.g. index.css becomes index.3f9a1c2b.css.
+
+    Args:
+        rel_path (str): path of the file relative to the static directory
+        content_hash (str): hex digest of the file contents
+        length (int, optional): number of hash characters kept. Defaults to FINGERPRINT_LENGTH.
+
+    Returns:
+        str: rel_path with the fingerprint before the extension
+    """
+    root, extension = os.path.splitext(rel_path)
+    return f"{root}.{content_hash[:length]}{extension}"
+
+def asset_url(rel_path: str) -> str:
+    """the url a static file is served from, relative to the output root."""
+    return "/" + rel_path.replace(os.sep, "/")
+
+def use_asset_map(mapping: Dict[str, str]) -> None:
+    """make generated pages reference the fingerprinted copies in mapping, an empty mapping turns rewriting off.
+    the inline parsing memos hold rendered image sources, so they are dropped when the mapping changes.
+    """
+    global asset_map
+    mapping = mapping or {}
+    if mapping == asset_map:
+        return
+    asset_map = dict(mapping)
+    _rewritten_templates.clear()
+    clear_memos()
+
+def rewrite_url(url: str) -> str:
+    return asset_map.get(url, url)
+
+def rewrite_asset_urls(html: str, mapping: Dict[str, str] = None) -> str:
+    """point every href and src attribute that names a static file at its fingerprinted copy.
+
+    Args:
+        html (str): html text, e.g. a template
+        mapping (Dict[str, str], optional): url to fingerprinted url. Defaults to the active asset map.
+
+    Returns:
+        str: html with the urls replaced
+    """
+    mapping = asset_map if mapping is None else mapping
+    if not mapping:
+        return html
+
+    def replace(match: re.Match) -> str:
+        return match.group(1) + match.group(2) + mapping.get(match.group(3), match.group(3)) + match.group(2)
+
+    return asset_attribute_regex.sub(replace, html)
+
+_rewritten_templates: Dict[int, Tuple[Template, Template]] = {}
+
+def template_with_assets(template: Template) -> Template:
+    """the template with its static file references rewritten by the active asset map, compiled once per template."""
+    if not asset_map:
+        return template
+    cached = _rewritten_templates.get(id(template))
+    if cached is not None and cached[0] is template:
+        return cached[1]
+    # the literal parts keep placeholders as written, so joining them gives back the source
+    rewritten = Template(rewrite_asset_urls("".join(template.parts)))
+    _rewritten_templates[id(template)] = (template, rewritten)
+    return rewritten
+
+def asset_salt(text: str) -> str:
+    """the part of the active asset map that can change how text renders,
+    i.e. the fingerprinted urls of the images it references. used to key caches of rendered markdown.
+    """
+    if not asset_map or "![" not in text:
+        return ""
+    return "".join(f"\0{url}\0{fingerprinted}" for url, fingerprinted in asset_map.items() if url in text)
+
+def write_headers_file(path: str, mapping: Dict[str, str]) -> bool:
+    """write a _headers file (as read by netlify and cloudflare pages) marking fingerprinted files immutable.
+    the file is only rewritten when its contents change.
+
+    Args:
+        path (str): path of the headers file, e.g. public/_headers
+        mapping (Dict[str, str]): url to fingerprinted url
+
+    Returns:
+        bool: whether the file was written
+    """
+    lines = []
+    for url in sorted(mapping.values()):
+        lines.append(url)
+        lines.append(f"  Cache-Control: {IMMUTABLE_CACHE_CONTROL}")
+    content = "\n".join(lines) + "\n" if lines else ""
+    try:
+        with open(path) as file:
+            if file.read() == content:
+                return False
+    except OSError:
+        pass
+    with open(path, 'w') as file:
+        file.write(content)
+    return True
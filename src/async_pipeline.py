@@ -0,0 +1,263 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from assets import use_asset_map
+from file_system_utilities import read_file, write_file
+from search_index import add_page_terms, collecting_terms, take_page_terms, use_search_terms
+from site_gen import STREAM_THRESHOLD, generate_page, render_markdown_page
+
+# marks the end of a queue, every consumer of the queue gets one
+_DONE = None
+
+
+class PipelineOptions:
+    """concurrency limits of the asyncio build pipeline."""
+    def __init__(self, readers: int = 8, renderers: int = 1, writers: int = 8, queue_size: int = 16) -> None:
+        """
+        Args:
+            readers (int, optional): files read at the same time. Defaults to 8.
+            renderers (int, optional): pages parsed and rendered at the same time, more than one renders
+                in worker processes, as rendering holds the GIL. Defaults to 1.
+            writers (int, optional): files written at the same time. Defaults to 8.
+            queue_size (int, optional): pages buffered between two stages,
+                a full queue makes the stage before it wait. Defaults to 16.
+        """
+        if min(readers, renderers, writers, queue_size) < 1:
+            raise ValueError("pipeline concurrency limits must be at least 1")
+        self.readers = readers
+        self.renderers = renderers
+        self.writers = writers
+        self.queue_size = queue_size
+
+    def __repr__(self) -> str:
+        return (f"PipelineOptions(readers: {self.readers}, renderers: {self.renderers}, "
+                f"writers: {self.writers}, queue_size: {self.queue_size})")
+
+
+def parse_pipeline_options(text: str) -> PipelineOptions:
+    """parse concurrency limits written as name=value pairs separated by commas, unnamed limits keep their default.
+
+    Args:
+        text (str): e.g. "readers=16,writers=4", empty for the defaults
+
+    Raises:
+        ValueError: unknown limit or invalid value
+
+    Returns:
+        PipelineOptions: the parsed limits
+    """
+    limits = {}
+    for pair in filter(None, (pair.strip() for pair in text.split(","))):
+        name, _, value = pair.partition("=")
+        name = name.strip()
+        if name not in ("readers", "renderers", "writers", "queue_size"):
+            raise ValueError(f"Unknown pipeline limit {name}, expected one of readers, renderers, writers, queue_size")
+        limits[name] = int(value)
+    return PipelineOptions(**limits)
+
+
+class PipelineStats:
+    """what a pipeline run did, peak_queued shows the backpressure holding pages in memory down."""
+    def __init__(self) -> None:
+        self.pages = 0
+        self.streamed = 0
+        self.seconds = 0.0
+        # most pages waiting in the queues at any one time
+        self.peak_queued = 0
+
+    def __repr__(self) -> str:
+        return f"PipelineStats(pages: {self.pages}, streamed: {self.streamed}, seconds: {self.seconds:.3f}, peak_queued: {self.peak_queued})"
+
+
+def _scan(pages: Iterable[Tuple[str, str]], queue: asyncio.Queue, loop: asyncio.AbstractEventLoop,
+          stopped: threading.Event) -> None:
+    """feed pages into the first queue from an I/O thread, iterating pages may list directories.
+    blocks while the queue is full, so a slow pipeline also slows down the directory scan.
+    gives up once the pipeline stopped, e.g. because a later stage failed.
+    """
+    for page in pages:
+        if stopped.is_set():
+            return
+        put = queue.put(page)
+        try:
+            future = asyncio.run_coroutine_threadsafe(put, loop)
+        except RuntimeError:
+            # the loop closed after the check above, the coroutine was never scheduled
+            put.close()
+            return
+        while True:
+            try:
+                future.result(timeout=0.1)
+                break
+            except TimeoutError:
+                if stopped.is_set():
+                    future.cancel()
+                    return
+
+async def _supervise(*stages) -> None:
+    """run the stages together, the first failure cancels the rest and is raised."""
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def run_pipeline(pages: Iterable[Tuple[str, str]], template_path: str, options: PipelineOptions = None,
+                       read: Callable[[str], str] = read_file, write: Callable[[str, str], object] = None,
+                       render_executor: Executor = None, io_executor: Executor = None,
+                       skip_unchanged: bool = False) -> PipelineStats:
+    """generate pages with reads, rendering and writes overlapping.
+    the directory scan and file reads feed a bounded queue of markdown, rendering runs in an executor
+    and feeds a bounded queue of html that writers drain. a full queue pauses the stage before it,
+    so at most about two queues and every stage's workers worth of pages are held in memory.
+    markdown files too large to hold in memory are generated with generate_page instead.
+
+    Args:
+        pages (Iterable[Tuple[str, str]]): (markdown source path, html destination path) pairs, may be lazy
+        template_path (str): path to the template html file
+        options (PipelineOptions, optional): concurrency limits. Defaults to PipelineOptions().
+        read (Callable[[str], str], optional): reads a markdown file. Defaults to read_file.
+        write (Callable[[str, str], object], optional): writes html to a path. Defaults to write_file.
+        render_executor (Executor, optional): runs parsing and rendering. Defaults to the loop's default executor.
+        io_executor (Executor, optional): runs scans, reads and writes. Defaults to the loop's default executor.
+        skip_unchanged (bool, optional): leave pages that already hold the same html untouched. Defaults to False.
+
+    Returns:
+        PipelineStats: pages generated, time taken and the most pages queued at once
+    """
+    options = options or PipelineOptions()
+    if write is None:
+        def write(content: str, dest_path: str) -> None:
+            write_file(content, dest_path, skip_unchanged)
+    stats = PipelineStats()
+    loop = asyncio.get_running_loop()
+    paths = asyncio.Queue(options.queue_size)
+    markdown = asyncio.Queue(options.queue_size)
+    html = asyncio.Queue(options.queue_size)
+    stopped = threading.Event()
+    start = time.perf_counter()
+
+    async def put(queue: asyncio.Queue, item) -> None:
+        await queue.put(item)
+        queued = markdown.qsize() + html.qsize()
+        if queued > stats.peak_queued:
+            stats.peak_queued = queued
+
+    async def scan() -> None:
+        await loop.run_in_executor(io_executor, _scan, pages, paths, loop, stopped)
+        for _ in range(options.readers):
+            await paths.put(_DONE)
+
+    async def reader() -> None:
+        while (page := await paths.get()) is not _DONE:
+            from_path, dest_path = page
+            text = await loop.run_in_executor(io_executor, _read_unless_large, read, from_path)
+            if text is None:
+                terms = await loop.run_in_executor(render_executor, _generate_large_page, from_path, template_path,
+                                                   dest_path, skip_unchanged)
+                _add_terms(from_path, terms)
+                stats.streamed += 1
+                stats.pages += 1
+                continue
+            print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+            await put(markdown, (from_path, dest_path, text))
+
+    async def renderer() -> None:
+        while (item := await markdown.get()) is not _DONE:
+            from_path, dest_path, text = item
+            page, terms = await loop.run_in_executor(render_executor, _render_page, from_path, text, template_path)
+            _add_terms(from_path, terms)
+            await put(html, (dest_path, page))
+
+    async def writer() -> None:
+        while (item := await html.get()) is not _DONE:
+            dest_path, page = item
+            await loop.run_in_executor(io_executor, write, page, dest_path)
+            stats.pages += 1
+
+    async def stage(workers, count: int, next_queue: asyncio.Queue, next_count: int) -> None:
+        await asyncio.gather(*(workers() for _ in range(count)))
+        if next_queue is not None:
+            for _ in range(next_count):
+                await next_queue.put(_DONE)
+
+    try:
+        await _supervise(
+            scan(),
+            stage(reader, options.readers, markdown, options.renderers),
+            stage(renderer, options.renderers, html, options.writers),
+            stage(writer, options.writers, None, 0),
+        )
+    finally:
+        stopped.set()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+def _render_page(from_path: str, markdown: str, template_path: str) -> Tuple[str, Optional[Tuple[str, Set[str]]]]:
+    """render executor entry point, the page and, when terms are collected, its title and terms.
+    they are taken out of the collector of the process the page was rendered in, a worker's own,
+    and handed to the pipeline's with _add_terms.
+    """
+    return render_markdown_page(markdown, template_path, from_path), take_page_terms(from_path)
+
+def _generate_large_page(from_path: str, template_path: str, dest_path: str,
+                         skip_unchanged: bool) -> Optional[Tuple[str, Set[str]]]:
+    """render executor entry point, generate_page for a file too large to read whole, returns like _render_page."""
+    generate_page(from_path, template_path, dest_path, skip_unchanged=skip_unchanged)
+    return take_page_terms(from_path)
+
+def _add_terms(from_path: str, terms: Optional[Tuple[str, Set[str]]]) -> None:
+    if terms is not None:
+        add_page_terms(from_path, *terms)
+
+def _init_renderer(asset_map: Dict[str, str], collect_terms: bool) -> None:
+    use_asset_map(asset_map)
+    use_search_terms({} if collect_terms else None)
+
+def _read_unless_large(read: Callable[[str], str], path: str) -> str:
+    """the contents of a markdown file, or None when it is large enough to be streamed."""
+    if os.path.getsize(path) >= STREAM_THRESHOLD:
+        return None
+    return read(path)
+
+def generate_pages_pipelined(pages: Iterable[Tuple[str, str]], template_path: str, options: PipelineOptions = None,
+                             asset_map: Dict[str, str] = None, skip_unchanged: bool = False,
+                             read: Callable[[str], str] = read_file, write: Callable[[str, str], object] = None) -> PipelineStats:
+    """generate pages in this process through the asyncio pipeline, see run_pipeline.
+    the output is the same as generate_pages_serial.
+
+    Args:
+        pages (Iterable[Tuple[str, str]]): (markdown source path, html destination path) pairs, may be lazy
+        template_path (str): path to the template html file
+        options (PipelineOptions, optional): concurrency limits. Defaults to PipelineOptions().
+        asset_map (Dict[str, str], optional): static file url to fingerprinted url. Defaults to None.
+        skip_unchanged (bool, optional): leave pages that already hold the same html untouched. Defaults to False.
+        read (Callable[[str], str], optional): reads a markdown file. Defaults to read_file.
+        write (Callable[[str, str], object], optional): writes html to a path. Defaults to write_file.
+
+    Returns:
+        PipelineStats: pages generated, time taken and the most pages queued at once
+    """
+    options = options or PipelineOptions()
+    use_asset_map(asset_map)
+    if options.renderers > 1:
+        render_executor = ProcessPoolExecutor(options.renderers, initializer=_init_renderer,
+                                              initargs=(asset_map, collecting_terms()))
+    else:
+        render_executor = ThreadPoolExecutor(1)
+    # one thread for the scan, then one per concurrent read and write
+    io_executor = ThreadPoolExecutor(1 + options.readers + options.writers)
+    try:
+        return asyncio.run(run_pipeline(pages, template_path, options, read, write, render_executor, io_executor,
+                                        skip_unchanged))
+    finally:
+        render_executor.shutdown()
+        io_executor.shutdown()
@@ -0,0 +1,100 @@
+"""peak memory of a constant memory build over a synthetic content tree.
+writes --pages small pages, builds them with generate_pages_recursive(constant_memory=True)
+and reports the peak resident set size and, with --tracemalloc, the peak traced python allocations.
+exits with status 1 when the peak rss is above --rss-limit.
+
+usage: python3 src/benchmark_build_memory.py [--pages 1000000] [--pages-per-dir 1000] [--tracemalloc] [--json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Dict
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+from site_gen import generate_pages_recursive
+
+
+def write_tree(root: str, pages: int, pages_per_dir: int = 1000) -> None:
+    """write pages small markdown files, pages_per_dir to a directory, without keeping a list of them."""
+    for x in range(pages):
+        directory = os.path.join(root, f"section{x // pages_per_dir}")
+        if x % pages_per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"page{x}.md"), 'w') as file:
+            file.write(f"# Page {x}\n\nthe **text** of page {x} with a [link](/section0/page{x + 1}.html)"
+                       f"\n\n* first item\n* item {x}\n")
+
+def peak_rss_bytes() -> int:
+    """the most memory this process has had resident, or 0 when it can not be read."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def measure_build(pages: int, pages_per_dir: int = 1000, trace: bool = False) -> Dict:
+    """build a synthetic tree in constant memory mode.
+
+    Args:
+        pages (int): pages in the tree
+        pages_per_dir (int, optional): pages in each directory. Defaults to 1000.
+        trace (bool, optional): also trace python allocations, slower. Defaults to False.
+
+    Returns:
+        Dict: pages generated, build seconds, peak rss bytes, and peak traced bytes or None
+    """
+    root = tempfile.mkdtemp()
+    try:
+        content = os.path.join(root, "content")
+        template = os.path.join(root, "template.html")
+        with open(template, 'w') as file:
+            file.write("<html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>")
+        write_tree(content, pages, pages_per_dir)
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            stats = generate_pages_recursive(content, template, os.path.join(root, "public"), constant_memory=True)
+        seconds = time.perf_counter() - start
+        traced = None
+        if trace:
+            traced = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return {"pages": stats.generated, "seconds": seconds, "peak_rss": peak_rss_bytes(), "peak_traced": traced}
+    finally:
+        shutil.rmtree(root)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000000)
+    parser.add_argument("--pages-per-dir", type=int, default=1000)
+    parser.add_argument("--tracemalloc", action="store_true", help="also report peak traced python allocations")
+    parser.add_argument("--rss-limit", type=float, default=128, help="peak rss ceiling in MiB")
+    parser.add_argument("--json", action="store_true", help="print the results as json")
+    args = parser.parse_args()
+
+    results = measure_build(args.pages, args.pages_per_dir, args.tracemalloc)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print(f"Built {results['pages']} pages in {results['seconds']:.1f}s "
+              f"({results['pages'] / results['seconds']:.0f} pages/s)")
+        print(f"peak rss {results['peak_rss'] / 2**20:.1f}MiB")
+        if results["peak_traced"] is not None:
+            print(f"peak traced {results['peak_traced'] / 1024:.0f}KiB")
+    if resource is not None and results["peak_rss"] > args.rss_limit * 2**20:
+        print(f"peak rss is above the {args.rss_limit:g}MiB ceiling", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""micro-benchmark of inline parsing.
+compares tokenize_inline, the tokenizer behind text_to_textnodes,
+with the previous chain of split_nodes_* passes on link heavy paragraphs.
+
+usage: python3 src/benchmark_inline.py [--links 100 1000 10000] [--repeat 5]
+"""
+import argparse
+import timeit
+from typing import List
+
+from inline_markdown import (
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_to_textnodes,
+)
+from textnode import (
+    TextNode,
+    text_type_text,
+    text_type_bold,
+    text_type_italic,
+    text_type_code,
+)
+
+
+def text_to_textnodes_chained(text: str) -> List[TextNode]:
+    """the chained implementation text_to_textnodes used before tokenize_inline, its output is the reference tokenize_inline must match."""
+    output_list = [TextNode(text,text_type_text)]
+    if "**" in text:
+        output_list = split_nodes_delimiter(output_list,'**',text_type_bold)
+    if "*" in text:
+        output_list = split_nodes_delimiter(output_list,'*',text_type_italic)
+    if "`" in text:
+        output_list = split_nodes_delimiter(output_list,'`',text_type_code)
+    if "![" in text:
+        output_list = split_nodes_image(output_list)
+    if "[" in text:
+        output_list = split_nodes_link(output_list)
+    return output_list
+
+def links_only_paragraph(links: int) -> str:
+    """build a paragraph of plain text and the given number of links."""
+    return " ".join(f"see [page number {x}](https://example.com/pages/{x}) now" for x in range(links))
+
+def link_heavy_paragraph(links: int) -> str:
+    """build a paragraph with the given number of links, plus some images and emphasis."""
+    parts = []
+    for x in range(links):
+        parts.append(f"see the [page number {x}](https://example.com/pages/{x}) for **detail {x}**")
+        if x % 10 == 0:
+            parts.append(f"and ![figure {x}](/images/figure{x}.png) with `code {x}` and *notes*")
+    return " ".join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'paragraph':>10} {'links':>6} {'chained ms':>11} {'single ms':>10} {'speedup':>8}")
+    for name, build in (("links", links_only_paragraph), ("mixed", link_heavy_paragraph)):
+        for links in args.links:
+            text = build(links)
+            if text_to_textnodes(text) != text_to_textnodes_chained(text):
+                raise AssertionError(f"tokenizer output differs from the chained passes for {links} links")
+            chained = min(timeit.repeat(lambda: text_to_textnodes_chained(text), number=1, repeat=args.repeat))
+            single = min(timeit.repeat(lambda: text_to_textnodes(text), number=1, repeat=args.repeat))
+            print(f"{name:>10} {links:>6} {chained * 1000:>11.2f} {single * 1000:>10.2f} {chained / single:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
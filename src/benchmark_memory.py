@@ -0,0 +1,89 @@
+"""memory benchmark of the node classes.
+reports the bytes allocated per node for the slotted TextNode, LeafNode and ParentNode,
+next to standalone copies of the classes as they were before, with a per instance __dict__.
+
+usage: python3 src/benchmark_memory.py [--nodes 100000]
+"""
+import argparse
+import gc
+import tracemalloc
+from typing import Callable
+
+from htmlnode import LeafNode, ParentNode
+from textnode import TextNode, text_type_text, text_type_link, text_node_to_html_node
+
+
+class DictTextNode:
+    """the baseline TextNode, standalone and without __slots__, so every instance has a __dict__."""
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+class DictHTMLNode:
+    """the baseline HTMLNode, standalone and without __slots__, so every instance has a __dict__.
+    subclassing the slotted classes would keep the attributes in their inherited slots instead.
+    """
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+class DictLeafNode(DictHTMLNode):
+    def __init__(self, tag, value, props=None):
+        super().__init__(tag, value, None, props)
+
+class DictParentNode(DictHTMLNode):
+    def __init__(self, tag, children, props=None):
+        super().__init__(tag, None, children, props)
+
+
+def bytes_per_node(build: Callable[[int], list], count: int) -> float:
+    """measure the memory held by count nodes created by build.
+
+    Args:
+        build (Callable[[int], list]): returns a list of count nodes
+        count (int): number of nodes to build
+
+    Returns:
+        float: bytes allocated per node, not counting the list holding them
+    """
+    gc.collect()
+    tracemalloc.start()
+    nodes = build(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    list_size = nodes.__sizeof__()
+    del nodes
+    return (size - list_size) / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100000)
+    args = parser.parse_args()
+
+    # texts are shared between both layouts, only the node objects themselves are measured
+    texts = [f"text {x}" for x in range(args.nodes)]
+    urls = [f"/pages/{x}" for x in range(args.nodes)]
+    cases = [
+        ("TextNode", lambda n: [DictTextNode(texts[x], text_type_text) for x in range(n)],
+                     lambda n: [TextNode(texts[x], text_type_text) for x in range(n)]),
+        ("LeafNode text", lambda n: [DictLeafNode(None, texts[x]) for x in range(n)],
+                          lambda n: [LeafNode(None, texts[x]) for x in range(n)]),
+        ("LeafNode empty props", lambda n: [DictLeafNode("b", texts[x], {}) for x in range(n)],
+                                 lambda n: [LeafNode("b", texts[x], {}) for x in range(n)]),
+        ("LeafNode link", lambda n: [DictLeafNode("a", texts[x], {"href": urls[x]}) for x in range(n)],
+                          lambda n: [text_node_to_html_node(TextNode(texts[x], text_type_link, urls[x])) for x in range(n)]),
+        ("ParentNode", lambda n: [DictParentNode("li", []) for x in range(n)],
+                       lambda n: [ParentNode("li", []) for x in range(n)]),
+    ]
+    print(f"{'node':>22} {'before B/node':>14} {'after B/node':>13} {'saved':>7}")
+    for name, before, after in cases:
+        before_bytes = bytes_per_node(before, args.nodes)
+        after_bytes = bytes_per_node(after, args.nodes)
+        saved = 1 - after_bytes / before_bytes
+        print(f"{name:>22} {before_bytes:>14.1f} {after_bytes:>13.1f} {saved:>6.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""benchmark of the asyncio build pipeline against the serial path on a simulated high latency filesystem.
+every read and write sleeps for --latency milliseconds first, like a round trip to a network mounted volume,
+and directory listings cost one round trip each.
+
+usage: python3 src/benchmark_pipeline.py [--pages 200] [--blocks 20] [--latency 5] [--pipeline readers=8,writers=8]
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Iterator, List, Tuple
+
+from async_pipeline import PipelineOptions, generate_pages_pipelined, parse_pipeline_options
+from corpus import generate_corpus
+from file_system_utilities import read_file, write_file
+from site_gen import iter_pages, render_markdown_page
+
+
+class LatencyFilesystem:
+    """reads, writes and directory scans that each wait latency seconds before doing the real work."""
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    def read(self, path: str) -> str:
+        time.sleep(self.latency)
+        return read_file(path)
+
+    def write(self, content: str, dest_path: str) -> None:
+        time.sleep(self.latency)
+        write_file(content, dest_path)
+
+    def iter_pages(self, content: str, dest: str) -> Iterator[Tuple[str, str]]:
+        """iter_pages, paying one round trip per directory listed."""
+        time.sleep(self.latency)
+        for from_path, dest_path in iter_pages(content, dest):
+            if os.path.basename(from_path) == "index.md":
+                time.sleep(self.latency)
+            yield from_path, dest_path
+
+def build_serial(filesystem: LatencyFilesystem, content: str, dest: str, template: str) -> int:
+    """read, render and write one page after another, like generate_pages_serial."""
+    pages = 0
+    for from_path, dest_path in filesystem.iter_pages(content, dest):
+        filesystem.write(render_markdown_page(filesystem.read(from_path), template), dest_path)
+        pages += 1
+    return pages
+
+def build_pipelined(filesystem: LatencyFilesystem, content: str, dest: str, template: str,
+                    options: PipelineOptions) -> int:
+    stats = generate_pages_pipelined(filesystem.iter_pages(content, dest), template, options,
+                                     read=filesystem.read, write=filesystem.write)
+    return stats.pages
+
+def outputs(dest: str) -> List[Tuple[str, bytes]]:
+    files = []
+    for directory, _, names in sorted(os.walk(dest)):
+        for name in sorted(names):
+            with open(os.path.join(directory, name), 'rb') as file:
+                files.append((os.path.relpath(os.path.join(directory, name), dest), file.read()))
+    return files
+
+def measure(build, *args) -> Tuple[float, int]:
+    """seconds taken and peak traced memory in bytes of one build."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        build(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=5.0, help="milliseconds per read, write and listing")
+    parser.add_argument("--pipeline", type=parse_pipeline_options, default=PipelineOptions(),
+                        help="pipeline limits, e.g. readers=8,renderers=1,writers=8,queue_size=16")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        content = os.path.join(root, "content")
+        template = os.path.join(root, "template.html")
+        with open(template, 'w') as file:
+            file.write("<html><head><title> {{ Title }} </title></head><body><article>{{ Content }}</article></body></html>")
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            generate_corpus(content, args.pages, args.blocks)
+        filesystem = LatencyFilesystem(args.latency / 1000)
+
+        print(f"{args.pages} pages, {args.latency:g}ms latency, {args.pipeline}")
+        print(f"{'build':>10} {'seconds':>8} {'pages/s':>8} {'peak memory':>12}")
+        results = {}
+        for name, build, extra in (("serial", build_serial, ()), ("pipelined", build_pipelined, (args.pipeline,))):
+            dest = os.path.join(root, name)
+            seconds, peak = measure(build, filesystem, content, dest, template, *extra)
+            results[name] = seconds
+            print(f"{name:>10} {seconds:>8.2f} {args.pages / seconds:>8.1f} {peak / 1024:>10.0f}KB")
+        if outputs(os.path.join(root, "serial")) != outputs(os.path.join(root, "pipelined")):
+            raise AssertionError("pipelined output differs from the serial build")
+        print(f"speedup {results['serial'] / results['pipelined']:.1f}x, outputs identical")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
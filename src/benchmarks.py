@@ -0,0 +1,201 @@
+"""end-to-end and per-stage build benchmarks on a synthetic corpus.
+
+usage:
+    python3 src/benchmarks.py run [--pages 200] [--output results.json] [--baseline baseline.json]
+    python3 src/benchmarks.py compare baseline.json results.json [--threshold 0.10]
+
+run times every stage of the build and writes the results as json,
+compare flags every stage that got slower than the baseline by more than the threshold
+and exits with a non zero status when there is a regression.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List
+
+from block_markdown import block_to_block_type, block_type_paragraph, markdown_to_blocks, markdown_to_html_node
+from corpus import generate_corpus, parse_inline_mix, parse_mix
+from inline_markdown import text_to_textnodes
+from memo import clear_memos
+from site_gen import generate_page, generate_pages_recursive
+
+RESULTS_FORMAT = 1
+
+
+def time_stage(function: Callable[[], None], repeat: int) -> float:
+    """best wall clock time of repeat runs of function, in seconds.
+    the memos are emptied before every run, so each run starts as cold as the first.
+    """
+    best = None
+    for _ in range(repeat):
+        clear_memos()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def run_benchmarks(pages: int = 200, blocks: int = 40, mix: Dict[str, int] = None,
+                   seed: int = 1, repeat: int = 3, inline_mix: Dict[str, float] = None) -> Dict:
+    """time each build stage over a generated corpus.
+
+    Args:
+        pages (int, optional): number of pages in the corpus. Defaults to 200.
+        blocks (int, optional): blocks per page. Defaults to 40.
+        mix (Dict[str, int], optional): block kind to weight. Defaults to corpus.default_mix.
+        seed (int, optional): corpus seed. Defaults to 1.
+        repeat (int, optional): runs per stage, the fastest is kept. Defaults to 3.
+        inline_mix (Dict[str, float], optional): inline construct to percent of words.
+            Defaults to corpus.default_inline_mix.
+
+    Returns:
+        Dict: json serialisable results, with seconds, items and microseconds per item for every stage
+    """
+    root = tempfile.mkdtemp()
+    try:
+        content = os.path.join(root, "content")
+        public = os.path.join(root, "public")
+        template = os.path.join(root, "template.html")
+        with open(template, 'w') as file:
+            file.write("<html><head><title> {{ Title }} </title></head><body><article>{{ Content }}</article></body></html>")
+        paths = generate_corpus(content, pages, blocks, mix, seed, inline_mix=inline_mix)
+        documents = []
+        for path in paths:
+            with open(path) as file:
+                documents.append(file.read())
+        all_blocks: List[str] = [block for document in documents for block in markdown_to_blocks(document)]
+        paragraphs = [block for block in all_blocks if block_to_block_type(block) == block_type_paragraph]
+        nodes = [markdown_to_html_node(document) for document in documents]
+        dests = [os.path.join(public, f"page{x}.html") for x in range(len(paths))]
+
+        def build_pages():
+            for from_path, dest_path in zip(paths, dests):
+                generate_page(from_path, template, dest_path)
+
+        def build_site():
+            shutil.rmtree(public, ignore_errors=True)
+            generate_pages_recursive(content, template, public)
+
+        stages = {
+            "markdown_to_blocks": (lambda: [markdown_to_blocks(document) for document in documents], len(documents)),
+            "block_to_block_type": (lambda: [block_to_block_type(block) for block in all_blocks], len(all_blocks)),
+            "text_to_textnodes": (lambda: [text_to_textnodes(text) for text in paragraphs], len(paragraphs)),
+            "markdown_to_html_node": (lambda: [markdown_to_html_node(document) for document in documents], len(documents)),
+            "to_html": (lambda: [node.to_html() for node in nodes], len(nodes)),
+            "generate_page": (build_pages, len(paths)),
+            "generate_pages_recursive": (build_site, len(paths)),
+        }
+        results = {}
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            for name, (function, items) in stages.items():
+                seconds = time_stage(function, repeat)
+                results[name] = {
+                    "seconds": seconds,
+                    "items": items,
+                    "us_per_item": seconds / items * 1e6 if items else 0.0,
+                }
+    finally:
+        shutil.rmtree(root)
+    return {
+        "format": RESULTS_FORMAT,
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pages": pages,
+            "blocks": blocks,
+            "seed": seed,
+            "repeat": repeat,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": results,
+    }
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = 0.10) -> List[Dict]:
+    """compare two benchmark results stage by stage, by time per item.
+
+    Args:
+        baseline (Dict): results of the reference run
+        current (Dict): results of the run being checked
+        threshold (float, optional): allowed slowdown before a stage counts as a regression. Defaults to 0.10.
+
+    Returns:
+        List[Dict]: one entry per stage present in both results, with the ratio and a regression flag
+    """
+    rows = []
+    for name, stage in current["stages"].items():
+        reference = baseline["stages"].get(name)
+        if reference is None or not reference["us_per_item"]:
+            continue
+        ratio = stage["us_per_item"] / reference["us_per_item"]
+        rows.append({
+            "stage": name,
+            "baseline_us": reference["us_per_item"],
+            "current_us": stage["us_per_item"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold,
+        })
+    return rows
+
+def print_results(results: Dict) -> None:
+    print(f"{'stage':>26} {'items':>8} {'seconds':>9} {'us/item':>10}")
+    for name, stage in results["stages"].items():
+        print(f"{name:>26} {stage['items']:>8} {stage['seconds']:>9.4f} {stage['us_per_item']:>10.2f}")
+
+def print_comparison(rows: List[Dict]) -> None:
+    print(f"{'stage':>26} {'baseline us':>12} {'current us':>11} {'ratio':>7}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['stage']:>26} {row['baseline_us']:>12.2f} {row['current_us']:>11.2f} {row['ratio']:>6.2f}x{flag}")
+
+def load_results(path: str) -> Dict:
+    with open(path) as file:
+        results = json.load(file)
+    if results.get("format") != RESULTS_FORMAT:
+        raise ValueError(f"Unsupported benchmark results format in {path}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("--pages", type=int, default=200)
+    run.add_argument("--blocks", type=int, default=40)
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--mix", type=parse_mix, default=None)
+    run.add_argument("--inline-mix", type=parse_inline_mix, default=None)
+    run.add_argument("--output", help="write the results as json to this path")
+    run.add_argument("--baseline", help="compare against the results stored at this path")
+    run.add_argument("--threshold", type=float, default=0.10)
+    compare = commands.add_parser("compare", help="compare two stored results")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_benchmarks(args.pages, args.blocks, args.mix, args.seed, args.repeat, args.inline_mix)
+        print_results(results)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(results, file, indent=2)
+        if not args.baseline:
+            return
+        baseline = load_results(args.baseline)
+    else:
+        baseline = load_results(args.baseline)
+        results = load_results(args.current)
+    rows = compare_results(baseline, results, args.threshold)
+    print_comparison(rows)
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
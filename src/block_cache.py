@@ -0,0 +1,169 @@
+import os
+import time
+import sqlite3
+import hashlib
+from typing import Dict, Optional, Tuple
+
+from build_manifest import generator_version
+from block_markdown import registered_block_types
+
+# blocks shorter than this render faster than a cache lookup
+MIN_BLOCK_SIZE = 64
+# pending entries are written out once they reach this size, so a long build holds a bounded amount of them
+FLUSH_BYTES = 4 * 1024 * 1024
+# last used times waiting for a flush, bounded for the same reason
+FLUSH_TOUCHED = 65536
+# layout of the blocks table, a cache written with another layout is dropped
+CACHE_FORMAT = 2
+
+
+class BlockCache:
+    """persistent map from the hash of a raw markdown block to its rendered html,
+    and the text of the node tree it was rendered from, which the search index takes its terms from.
+    backed by sqlite, so it is shared across builds and between worker processes.
+
+    lookups hit the database, but new entries and last used times are only written on flush,
+    in one short transaction, so concurrent workers rarely wait on each other.
+    flush runs on its own once FLUSH_BYTES of entries or FLUSH_TOUCHED lookups are pending.
+    the cache is emptied when the generator version or CACHE_FORMAT changes,
+    and flush evicts the least recently used entries once the stored html and text exceed max_bytes.
+    """
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, version: str = None,
+                 min_block_size: int = MIN_BLOCK_SIZE) -> None:
+        """
+        Args:
+            path (str): path of the sqlite database
+            max_bytes (int, optional): upper bound on the stored html and text. Defaults to 256MiB.
+            version (str, optional): generator version the entries are valid for.
+                Defaults to generator_version() and the names of the registered custom block types.
+            min_block_size (int, optional): blocks shorter than this are not cached. Defaults to MIN_BLOCK_SIZE.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.min_block_size = min_block_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pending: Dict[bytes, Tuple[str, str]] = {}
+        self.pending_bytes = 0
+        self.touched = set()
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            version = f"{CACHE_FORMAT}:" + (version or ",".join((generator_version(),) + registered_block_types()))
+            row = self.connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if row is None or row[0] != version:
+                self.connection.execute("DROP TABLE IF EXISTS blocks")
+                self.connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (version,))
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS blocks (key BLOB PRIMARY KEY, html TEXT NOT NULL, text TEXT NOT NULL, "
+                "size INTEGER NOT NULL, used REAL NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS blocks_used ON blocks (used)")
+
+    @staticmethod
+    def block_key(block: str) -> bytes:
+        return hashlib.blake2b(block.encode(), digest_size=16).digest()
+
+    def get(self, block: str) -> Optional[str]:
+        """look up the rendered html of a block.
+
+        Args:
+            block (str): raw markdown block
+
+        Returns:
+            Optional[str]: the cached html, or None when the block is not cached
+        """
+        entry = self.get_entry(block)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, block: str) -> Optional[Tuple[str, str]]:
+        """look up the rendered html of a block along with the text it was rendered from.
+
+        Args:
+            block (str): raw markdown block
+
+        Returns:
+            Optional[Tuple[str, str]]: the cached (html, text), or None when the block is not cached
+        """
+        if len(block) < self.min_block_size:
+            return None
+        key = self.block_key(block)
+        entry = self.pending.get(key)
+        if entry is None:
+            entry = self.connection.execute("SELECT html, text FROM blocks WHERE key = ?", (key,)).fetchone()
+            if entry is not None:
+                self.touched.add(key)
+                if len(self.touched) >= FLUSH_TOUCHED:
+                    self.flush()
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, block: str, html: str, text: str = "") -> None:
+        """store the rendered html of a block, written to disk on the next flush.
+
+        Args:
+            block (str): raw markdown block
+            html (str): html the block renders to
+            text (str, optional): node_text of the tree the html was rendered from. Defaults to "".
+        """
+        if len(block) < self.min_block_size:
+            return
+        self.pending[self.block_key(block)] = (html, text)
+        self.pending_bytes += len(html) + len(text)
+        if self.pending_bytes >= FLUSH_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        """write new entries and last used times, then evict down to max_bytes."""
+        now = time.time()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO blocks (key, html, text, size, used) VALUES (?, ?, ?, ?, ?)",
+                ((key, html, text, len(html) + len(text), now) for key, (html, text) in self.pending.items()),
+            )
+            self.connection.executemany(
+                "UPDATE blocks SET used = ? WHERE key = ?",
+                ((now, key) for key in self.touched),
+            )
+            self.pending = {}
+            self.pending_bytes = 0
+            self.touched = set()
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in self.connection.execute("SELECT key, size FROM blocks ORDER BY used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.connection.executemany("DELETE FROM blocks WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self) -> 'BlockCache':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.close()
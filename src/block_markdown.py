@@ -1,7 +1,13 @@
 import re
-from typing import List,Tuple
-from htmlnode import HTMLNode, LeafNode, ParentNode
-from inline_markdown import text_to_textnodes
+from time import perf_counter_ns
+from functools import partial
+from typing import Callable,Dict,Iterable,Iterator,List,Optional,Tuple
+from instrumentation import tracer
+from assets import asset_salt
+from htmlnode import HTMLNode, LeafNode, ParentNode, RenderedNode, node_text
+from inline_markdown import tokenize_inline
+from memo import LRUMemo
+from page_metadata import PageMetadata, without_front_matter
 from textnode import text_node_to_html_node
 
 block_type_paragraph = "paragraph"
@@ -11,6 +17,8 @@ block_type_quote = "quote"
 block_type_ulist = "unordered_list"
 block_type_olist = "ordered_list"
 
+heading_tags = ("h1", "h2", "h3", "h4", "h5", "h6")
+
 
 def markdown_to_blocks(markdown: str) -> List[str]:
     """takes a raw Markdown string (representing a full document)
@@ -22,13 +30,51 @@ def markdown_to_blocks(markdown: str) -> List[str]:
     Returns:
         List[str]: returns a list of string block's
     """    
-    segments = markdown.split("\n\n")
-    output = []
-    for segment in segments:
-        if segment != "":
-            segment = segment.strip()
-            output.append(segment)
-    return output
+    return list(iter_blocks((markdown,)))
+
+def iter_blocks(chunks: Iterable[str]) -> Iterator[str]:
+    """lazily split a stream of markdown text into blocks.
+    yields the same blocks as markdown_to_blocks would for the joined text,
+    but only ever holds the block currently being read in memory.
+
+    Args:
+        chunks (Iterable[str]): consecutive pieces of a markdown document, of any size
+
+    Yields:
+        str: each block of the document, in order
+    """
+    pieces = []
+    for chunk in chunks:
+        if chunk == "":
+            continue
+        # a separator can only end in this chunk if the chunk contains one,
+        # or the chunk starts with a newline right after a pending newline
+        if "\n\n" not in chunk and not (chunk[0] == "\n" and pieces and pieces[-1].endswith("\n")):
+            pieces.append(chunk)
+            continue
+        pieces.append(chunk)
+        segments = "".join(pieces).split("\n\n")
+        pieces = [segments.pop()]
+        for segment in segments:
+            if segment != "":
+                yield segment.strip()
+    segment = "".join(pieces)
+    if segment != "":
+        yield segment.strip()
+
+def iter_file_blocks(path: str, chunk_size: int = 1 << 16) -> Iterator[str]:
+    """lazily read the blocks of a markdown file through a buffered reader.
+    peak memory is bounded by the largest block rather than the whole file.
+
+    Args:
+        path (str): path to a markdown file
+        chunk_size (int, optional): number of characters read at a time. Defaults to 64Ki.
+
+    Yields:
+        str: each block of the document, in order
+    """
+    with open(path) as file:
+        yield from iter_blocks(iter(lambda: file.read(chunk_size), ""))
 
 def block_to_block_type(block: str) -> str:
     """given a block of markdown text and determine what type of block it is.
@@ -39,6 +85,7 @@ def block_to_block_type(block: str) -> str:
             quote
             unordered_list
             ordered_list
+        and the custom block types added with register_block_type.
     Args:
         block (str): tring of block markdown text
 
@@ -46,29 +93,28 @@ def block_to_block_type(block: str) -> str:
         str: returns a string representing the type of markdown block text given
             e.g.(paragraph,heading,code,quote,unordered_list,ordered_list)
     """    
-    if is_heading(block):
-        return block_type_heading
-    if is_code(block):
-        return block_type_code
-    if is_quote(block):
-        return block_type_quote
-    if is_ordered_list(block):
-        return block_type_olist
-    if is_unordered_list(block):
-        return block_type_ulist
-    return block_type_paragraph
+    return classify_block(block)[0]
+
+def classify_block(block: str) -> Tuple[str, Optional[List[str]]]:
+    """determine the type of a block by dispatching on its first character,
+    only the block types that can start with that character are checked
+    and the block is split into lines at most once.
+
+    Args:
+        block (str): string of block markdown text
+
+    Returns:
+        Tuple[str, Optional[List[str]]]: the block type, and the lines of the block when classifying it split them,
+            block_to_htmlnode takes them so the block does not have to be split again
+    """
+    classify = _classifiers.get(block[:1])
+    if classify is None:
+        return block_type_paragraph, None
+    return classify(block)
 
 def is_heading(block: str) -> bool:
-    if (
-        block.startswith('# ') or
-        block.startswith('## ') or
-        block.startswith('### ') or
-        block.startswith('#### ') or
-        block.startswith('##### ') or
-        block.startswith('###### ')
-        ):
-        return True
-    return False
+    level = len(block) - len(block.lstrip("#"))
+    return 1 <= level <= 6 and block[level:level + 1] == " "
 
 def is_code(block: str) -> bool:
     if block.startswith("```"):
@@ -76,26 +122,29 @@ def is_code(block: str) -> bool:
             return True
     return False
 
-def is_quote(block: str) -> bool:
-    lines = block.split("\n")
+def is_quote(block: str, lines: List[str] = None) -> bool:
+    if lines is None:
+        lines = block.split("\n")
     for line in lines:
         if not line.startswith(">"):
             return False
     return True
 
-def is_ordered_list(block: str) -> bool:
+def is_ordered_list(block: str, lines: List[str] = None) -> bool:
     """Every line in an ordered list block must start 
     with a number followed by a . character and a space. 
     The number must start at 1 and increment by 1 for each line.
 
     Args:
         block (str): input string of a block of markdown text.
+        lines (List[str], optional): the lines of the block when they were already split. Defaults to None.
 
     Returns:
         bool: return true if each line is an number sequence starting with 1 
             otherwise returns false
     """
-    lines = block.split("\n")
+    if lines is None:
+        lines = block.split("\n")
     order_start = 1
     for line in lines:
         if not line.startswith(f"{order_start}. "):
@@ -103,23 +152,124 @@ def is_ordered_list(block: str) -> bool:
         order_start += 1
     return True
 
-def is_unordered_list(block: str) -> bool:
+def is_unordered_list(block: str, lines: List[str] = None) -> bool:
     """Every line in an unordered list block must start 
         with a * or - character, followed by a space.
         
     Args:
         block (str): input string of a block of markdown text.
+        lines (List[str], optional): the lines of the block when they were already split. Defaults to None.
 
     Returns:
         bool: return true if all lines start with '* ' or '- '
                 otherwise returns false
     """
-    lines = block.split("\n")
+    if lines is None:
+        lines = block.split("\n")
     for line in lines:
         if not line.startswith("* ") and not line.startswith("- "):
             return False
     return True
 
+# the built in block types by the first character of the block,
+# each takes the block and its lines, when already split, and returns (block type, lines)
+def _classify_heading(block: str, lines: List[str] = None) -> Tuple[str, Optional[List[str]]]:
+    return (block_type_heading if is_heading(block) else block_type_paragraph), lines
+
+def _classify_code(block: str, lines: List[str] = None) -> Tuple[str, Optional[List[str]]]:
+    return (block_type_code if is_code(block) else block_type_paragraph), lines
+
+def _classify_quote(block: str, lines: List[str] = None) -> Tuple[str, Optional[List[str]]]:
+    lines = lines or block.split("\n")
+    return (block_type_quote if is_quote(block, lines) else block_type_paragraph), lines
+
+def _classify_ordered_list(block: str, lines: List[str] = None) -> Tuple[str, Optional[List[str]]]:
+    lines = lines or block.split("\n")
+    return (block_type_olist if is_ordered_list(block, lines) else block_type_paragraph), lines
+
+def _classify_unordered_list(block: str, lines: List[str] = None) -> Tuple[str, Optional[List[str]]]:
+    lines = lines or block.split("\n")
+    return (block_type_ulist if is_unordered_list(block, lines) else block_type_paragraph), lines
+
+builtin_classifiers = {
+    "#": _classify_heading,
+    "`": _classify_code,
+    ">": _classify_quote,
+    "1": _classify_ordered_list,
+    "*": _classify_unordered_list,
+    "-": _classify_unordered_list,
+}
+builtin_block_types = (block_type_paragraph, block_type_heading, block_type_code,
+                       block_type_quote, block_type_ulist, block_type_olist)
+
+
+class BlockType:
+    """a custom kind of markdown block, like an admonition or a table, see register_block_type."""
+    def __init__(self, name: str, first_characters: str, matches: Callable[[str, List[str]], bool],
+                 build: Callable[[str, List[str]], HTMLNode]) -> None:
+        self.name = name
+        self.first_characters = first_characters
+        self.matches = matches
+        self.build = build
+
+    def __repr__(self) -> str:
+        return f"BlockType({self.name}, {self.first_characters!r})"
+
+
+def register_block_type(name: str, first_characters: str, matches: Callable[[str, List[str]], bool],
+                        build: Callable[[str, List[str]], HTMLNode]) -> None:
+    """add a custom block type, or replace the one with the same name.
+    it is only checked for blocks starting with one of first_characters, before the built in type
+    starting with the same character, so blocks starting with other characters are classified as fast as before.
+    the default block cache version includes the names of the custom types,
+    a build whose custom types changed behavior needs a new cache version.
+
+    Args:
+        name (str): block type name, as returned by block_to_block_type
+        first_characters (str): every character a block of this type can start with, e.g. "|" for tables
+        matches (Callable[[str, List[str]], bool]): takes the block and its lines, true when the block is of this type
+        build (Callable[[str, List[str]], HTMLNode]): takes the block and its lines, returns the block's html node,
+            text_to_children converts inline markdown
+
+    Raises:
+        ValueError: name is a built in block type, or first_characters is empty
+    """
+    if name in builtin_block_types:
+        raise ValueError(f"{name} is a built in block type")
+    if not first_characters:
+        raise ValueError("a custom block type needs at least one first character")
+    custom_block_types[name] = BlockType(name, first_characters, matches, build)
+    _update_classifiers()
+
+def unregister_block_type(name: str) -> None:
+    """remove a custom block type, blocks of that type are classified as before it was registered."""
+    if custom_block_types.pop(name, None) is not None:
+        _update_classifiers()
+
+def registered_block_types() -> Tuple[str, ...]:
+    """the names of the custom block types, in the order they were registered."""
+    return tuple(custom_block_types)
+
+def _update_classifiers() -> None:
+    global _classifiers
+    classifiers = dict(builtin_classifiers)
+    for character in {character for block_type in custom_block_types.values() for character in block_type.first_characters}:
+        candidates = tuple(block_type for block_type in custom_block_types.values() if character in block_type.first_characters)
+        classifiers[character] = partial(_classify_custom, candidates, builtin_classifiers.get(character))
+    _classifiers = classifiers
+
+def _classify_custom(candidates: Tuple[BlockType, ...], fallback: Optional[Callable], block: str) -> Tuple[str, Optional[List[str]]]:
+    lines = block.split("\n")
+    for block_type in candidates:
+        if block_type.matches(block, lines):
+            return block_type.name, lines
+    if fallback is None:
+        return block_type_paragraph, lines
+    return fallback(block, lines)
+
+custom_block_types: Dict[str, BlockType] = {}
+_classifiers = dict(builtin_classifiers)
+
     #split markdown into blocks
     #loop over each block
     #   determine the type of block
@@ -131,50 +281,167 @@ def is_unordered_list(block: str) -> bool:
     #make all the block nodes Children under a single parent HTML node (which should 
     #   just be a div) and return it.
     
-def markdown_to_html_node(markdown: str) -> HTMLNode:
-    blocks = markdown_to_blocks(markdown)
-    children = []
+def markdown_to_html_node(markdown: str, metadata: PageMetadata = None) -> HTMLNode:
+    """convert a markdown document to a div holding one node per block.
+    a front matter block at the start of the document is not part of the html.
+
+    Args:
+        markdown (str): a full document of markdown text
+        metadata (PageMetadata, optional): filled in with the title, front matter, headings
+            and word count while the blocks are converted. Defaults to None.
+
+    Returns:
+        HTMLNode: the div of the document
+    """
+    with tracer.span("blocks"):
+        blocks = markdown_to_blocks(markdown)
+    return ParentNode("div", list(blocks_to_html_nodes(blocks, metadata)))
+
+def markdown_file_to_html_node(path: str, metadata: PageMetadata = None) -> HTMLNode:
+    """build the html node of a markdown file lazily.
+    the children of the returned div are a generator that reads, parses and converts
+    one block at a time, so the tree can only be rendered once,
+    which is done with iter_html or write_html to keep memory bounded by the largest block.
+
+    Args:
+        path (str): path to a markdown file
+        metadata (PageMetadata, optional): filled in while the div is rendered, gives the headings their ids.
+            Defaults to None.
+
+    Returns:
+        HTMLNode: a div whose children are produced while it is rendered
+    """
+    return ParentNode("div", blocks_to_html_nodes(iter_file_blocks(path), metadata))
+
+def use_block_cache(cache) -> None:
+    """render blocks through a BlockCache, or stop caching when cache is None.
+    cached blocks are returned as RenderedNodes holding the rendered html and the text of the block,
+    so they render to exactly the same output.
+    """
+    global _block_cache
+    _block_cache = cache
+
+_block_cache = None
+
+def blocks_to_html_nodes(blocks: Iterable[str], metadata: PageMetadata = None) -> Iterator[HTMLNode]:
+    blocks = without_front_matter(blocks, metadata)
+    if _block_cache is not None:
+        yield from _cached_blocks_to_html_nodes(blocks, _block_cache, metadata)
+        return
+    if tracer.enabled:
+        yield from _traced_blocks_to_html_nodes(blocks, metadata)
+        return
+    for block in blocks:
+        block_type, lines = classify_block(block)
+        node = block_to_htmlnode(block,block_type,lines)
+        if metadata is not None:
+            anchor = metadata.add_block(block, block_type, node)
+            if anchor is not None:
+                node.props = {"id": anchor}
+        yield node
+
+def _cached_blocks_to_html_nodes(blocks: Iterable[str], cache, metadata: PageMetadata = None) -> Iterator[HTMLNode]:
+    for block in blocks:
+        start = perf_counter_ns()
+        anchor = metadata.add_block(block) if metadata is not None else None
+        # image sources depend on the asset fingerprints, so they are part of the key,
+        # as is a heading id, after a blank line no block can contain
+        key = block + asset_salt(block)
+        if anchor is not None:
+            key += "\n\n#" + anchor
+        entry = cache.get_entry(key)
+        if tracer.enabled:
+            tracer.add("block_cache", perf_counter_ns() - start)
+        if entry is None:
+            if tracer.enabled:
+                node = next(_traced_blocks_to_html_nodes((block,)))
+            else:
+                node = block_to_htmlnode(block,*classify_block(block))
+            if anchor is not None:
+                node.props = {"id": anchor}
+            entry = node.to_html(), node_text(node)
+            cache.put(key, *entry)
+        yield RenderedNode(*entry)
+
+def _traced_blocks_to_html_nodes(blocks: Iterable[str], metadata: PageMetadata = None) -> Iterator[HTMLNode]:
+    # spans per block would cost more than the work, time the stages by hand instead
     for block in blocks:
-        block_type = block_to_block_type(block)
-        children.append(block_to_htmlnode(block,block_type))
-    return ParentNode("div", children)
+        start = perf_counter_ns()
+        block_type, lines = classify_block(block)
+        classified = perf_counter_ns()
+        node = block_to_htmlnode(block,block_type,lines)
+        if metadata is not None:
+            anchor = metadata.add_block(block, block_type, node)
+            if anchor is not None:
+                node.props = {"id": anchor}
+        tracer.add("classify", classified - start)
+        tracer.add("inline", perf_counter_ns() - classified)
+        yield node
         
 
-def block_to_htmlnode(block: str, block_type: str) -> HTMLNode:
+def block_to_htmlnode(block: str, block_type: str, lines: List[str] = None) -> HTMLNode:
+    """build the html node of a block.
+
+    Args:
+        block (str): string of block markdown text
+        block_type (str): the type of the block, from block_to_block_type or classify_block
+        lines (List[str], optional): the lines of the block, as returned by classify_block. Defaults to None.
+
+    Returns:
+        HTMLNode: the node of the block, unknown block types become paragraphs
+    """
     return_node = None
     match block_type:         
+        case "paragraph":
+            return_node = ParentNode("p",text_to_children(block))
         case "heading":
             tag, value = get_heading_info(block)
             return_node = ParentNode(tag,text_to_children(value))
         case "quote":
-            tag, value = get_quote_info(block)
+            tag, value = get_quote_info(block, lines)
             return_node = ParentNode(tag,text_to_children(value))
         case "code":
             tag, value = get_code_info(block)
             return_node = ParentNode("pre",[LeafNode(tag,value)])
         case "unordered_list":
-            tag, children = get_ulist_info(block)
+            tag, children = get_ulist_info(block, lines)
             return_node = ParentNode(tag,children)
         case "ordered_list":
-            tag, children = get_olist_info(block)
+            tag, children = get_olist_info(block, lines)
             return_node = ParentNode(tag,children)
         case _:
+            custom = custom_block_types.get(block_type)
+            if custom is not None:
+                return custom.build(block, lines if lines is not None else block.split("\n"))
             return_node = ParentNode("p",text_to_children(block))
     return return_node
    
 def text_to_children(text: str) -> List[HTMLNode]:
-    return [text_node_to_html_node(node) for node in text_to_textnodes(text)]
+    fields = children_memo.get(text)
+    if fields is not None:
+        return [LeafNode(tag, value, dict(props) if props else None) for tag, value, props in fields]
+    children = [text_node_to_html_node(node) for node in tokenize_inline(text)]
+    if children_memo.admit(text):
+        children_memo.put(text, tuple([
+            (child.tag, child.value, tuple(child.props.items()) if child.props else None) for child in children
+        ]))
+    return children
+
+# repeated fragments (nav lists, headings, footer links) are only parsed once,
+# the memo holds plain tuples and every call gets its own fresh LeafNodes
+children_memo = LRUMemo("text_to_children")
 
 def get_heading_info(block: str) -> Tuple[str,str]:
     regex_pattern = r"^#{1,6} "
     matches = re.findall(regex_pattern,block)
     if len(matches) > 1 or len(matches) < 1:
         print("Issue with Heading Syntax")
-    return f"h{matches[0].count('#')}",block[len(matches[0]):]
+    return heading_tags[matches[0].count('#') - 1],block[len(matches[0]):]
 
-def get_quote_info(block: str) -> Tuple[str,str]:
+def get_quote_info(block: str, lines: List[str] = None) -> Tuple[str,str]:
     tag = "blockquote"
-    lines = block.split("\n")
+    if lines is None:
+        lines = block.split("\n")
     new_lines = []
     for line in lines:
         new_lines.append(line[1:].strip())
@@ -185,19 +452,21 @@ def get_code_info(block: str) -> Tuple[str,str]:
     tag = "code"
     return tag, block.lstrip().rstrip()[3:-3]
 
-def get_ulist_info(block: str) -> Tuple[str,List[ParentNode]]:
+def get_ulist_info(block: str, lines: List[str] = None) -> Tuple[str,List[ParentNode]]:
     tag = "ul"
     list_nodes = []
-    lines = block.split('\n')
+    if lines is None:
+        lines = block.split('\n')
     for line in lines:
         list_nodes.append(ParentNode("li",text_to_children(line.lstrip()[2:])))
     return tag, list_nodes
 
-def get_olist_info(block: str) -> Tuple[str,List[ParentNode]]:
+def get_olist_info(block: str, lines: List[str] = None) -> Tuple[str,List[ParentNode]]:
     tag = "ol"
     list_nodes = []
     order_start = 1
-    lines = block.split('\n')
+    if lines is None:
+        lines = block.split('\n')
     for line in lines:
         order = f"{order_start}. "
         list_nodes.append(ParentNode("li",text_to_children(line.lstrip()[len(order):])))
@@ -0,0 +1,180 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+from typing import Dict
+
+MANIFEST_FORMAT = 1
+
+
+def hash_bytes(data: bytes) -> str:
+    """hash a bytes object into the hex digest used by the build manifest.
+
+    Args:
+        data (bytes): bytes to hash
+
+    Returns:
+        str: sha256 hex digest of the bytes
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 16) -> str:
+    """hash the contents of a file without loading the whole file into memory.
+
+    Args:
+        path (str): path to the file to hash
+        chunk_size (int, optional): number of bytes read per chunk. Defaults to 64KiB.
+
+    Returns:
+        str: sha256 hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# the modules generate_pages_recursive runs, with the pipeline it imports on demand.
+# benchmarks, the corpus generator and the servers do not change the output, editing them keeps the build
+GENERATOR_MODULES = (
+    "assets",
+    "async_pipeline",
+    "block_cache",
+    "block_markdown",
+    "build_manifest",
+    "dependency_graph",
+    "file_system_utilities",
+    "htmlnode",
+    "inline_markdown",
+    "instrumentation",
+    "memo",
+    "page_metadata",
+    "search_index",
+    "shard_build",
+    "site_gen",
+    "split_page",
+    "template_engine",
+    "textnode",
+)
+
+
+@lru_cache(maxsize=None)
+def generator_version() -> str:
+    """a version string for the generator itself.
+    computed from the source of the GENERATOR_MODULES,
+    so any change to the code that builds pages invalidates previously generated pages.
+
+    Returns:
+        str: sha256 hex digest of the generator source files
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for module in GENERATOR_MODULES:
+        entry = module + ".py"
+        digest.update(entry.encode())
+        with open(os.path.join(src_dir, entry), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """persistent record of the inputs used for the last build.
+    pages are keyed by source markdown path and store the hash of the
+    source along with the destination html path it was written to.
+    the fingerprinted asset urls the pages were built against are kept too.
+    """
+    def __init__(self, path: str = None) -> None:
+        """
+        Args:
+            path (str, optional): path of the json file backing this manifest. Defaults to None.
+        """
+        self.path = path
+        self.template_hash = None
+        self.generator = None
+        self.pages: Dict[str, Dict[str, str]] = {}
+        self.assets: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'BuildManifest':
+        """load a manifest from disk.
+        a missing or unreadable manifest results in an empty manifest,
+        which simply causes a full build.
+
+        Args:
+            path (str): path of the json manifest file
+
+        Returns:
+            BuildManifest: the loaded manifest
+        """
+        manifest = cls(path)
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return manifest
+        if not isinstance(data, dict) or data.get("format") != MANIFEST_FORMAT:
+            return manifest
+        manifest.template_hash = data.get("template")
+        manifest.generator = data.get("generator")
+        manifest.pages = data.get("pages", {})
+        manifest.assets = data.get("assets", {})
+        return manifest
+
+    def save(self, path: str = None) -> None:
+        """write the manifest to disk.
+        the file is written to a temporary path first and then moved into place,
+        so an interrupted build never leaves a half written manifest behind.
+
+        Args:
+            path (str, optional): path to write to. Defaults to the path the manifest was loaded from.
+        """
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "format": MANIFEST_FORMAT,
+            "template": self.template_hash,
+            "generator": self.generator,
+            "pages": self.pages,
+            "assets": self.assets,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def is_stale(self, template_hash: str, generator: str) -> bool:
+        """check if every page must be rebuilt, because the template or the generator changed.
+
+        Args:
+            template_hash (str): hash of the current template
+            generator (str): current generator version
+
+        Returns:
+            bool: true if every page needs to be regenerated
+        """
+        return self.template_hash != template_hash or self.generator != generator
+
+    def page_unchanged(self, source_path: str, source_hash: str, dest_path: str) -> bool:
+        """check if a page was built from the same source into the same destination,
+        and that the destination still exists.
+
+        Args:
+            source_path (str): path to the markdown source
+            source_hash (str): hash of the markdown source
+            dest_path (str): path of the generated html file
+
+        Returns:
+            bool: true if the page can be skipped
+        """
+        record = self.pages.get(source_path)
+        if record is None:
+            return False
+        return (
+            record.get("hash") == source_hash
+            and record.get("dest") == dest_path
+            and os.path.exists(dest_path)
+        )
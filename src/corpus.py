@@ -0,0 +1,193 @@
+"""synthetic markdown corpus generator for benchmarks and load tests.
+
+usage: python3 src/corpus.py OUTPUT_DIR [--pages 1000] [--blocks 40] [--seed 1] [--mix heading=1,paragraph=4,...]
+                             [--inline-mix link=10,image=2,...]
+"""
+import os
+import random
+import argparse
+from typing import Dict, List
+
+# relative weight of each kind of block in a generated page
+default_mix = {
+    "heading": 2,
+    "paragraph": 6,
+    "unordered_list": 2,
+    "ordered_list": 1,
+    "code": 1,
+    "quote": 1,
+}
+
+# percent of the words in generated text that become each inline construct, rolled in this order
+default_inline_mix = {
+    "bold": 4,
+    "italic": 4,
+    "code": 2,
+    "link": 4,
+    "image": 1,
+}
+
+inline_constructs = {
+    "bold": lambda rng, word: f"**{word}**",
+    "italic": lambda rng, word: f"*{word}*",
+    "code": lambda rng, word: f"`{word}`",
+    "link": lambda rng, word: f"[{word}](/pages/{rng.randrange(1000)})",
+    "image": lambda rng, word: f"![{word}](/images/{word}.png)",
+}
+
+words = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure"
+).split()
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """parse a block mix written as name=weight pairs separated by commas.
+
+    Args:
+        text (str): e.g. "heading=1,paragraph=4"
+
+    Raises:
+        ValueError: unknown block kind or invalid weight
+
+    Returns:
+        Dict[str, int]: block kind to weight
+    """
+    mix = {}
+    for pair in text.split(","):
+        name, _, weight = pair.partition("=")
+        name = name.strip()
+        if name not in default_mix:
+            raise ValueError(f"Unknown block kind {name}, expected one of {', '.join(default_mix)}")
+        mix[name] = int(weight)
+    return mix
+
+def parse_inline_mix(text: str) -> Dict[str, float]:
+    """parse inline construct rates written as name=percent pairs separated by commas,
+    the constructs left out keep their rate from default_inline_mix.
+
+    Args:
+        text (str): e.g. "link=10,image=0"
+
+    Raises:
+        ValueError: unknown inline construct, invalid percent or rates adding up to more than 100
+
+    Returns:
+        Dict[str, float]: inline construct to percent of words
+    """
+    mix = dict(default_inline_mix)
+    for pair in text.split(","):
+        name, _, percent = pair.partition("=")
+        name = name.strip()
+        if name not in default_inline_mix:
+            raise ValueError(f"Unknown inline construct {name}, expected one of {', '.join(default_inline_mix)}")
+        mix[name] = float(percent)
+        if mix[name] < 0:
+            raise ValueError(f"Invalid percent {percent} for {name}")
+    if sum(mix.values()) > 100:
+        raise ValueError(f"Inline rates add up to more than 100 percent in {text}")
+    return mix
+
+def inline_text(rng: random.Random, length: int, inline_mix: Dict[str, float] = None) -> str:
+    """a line of text with a random sprinkling of bold, italic, code, links and images at the rates in inline_mix."""
+    inline_mix = inline_mix or default_inline_mix
+    limits = []
+    total = 0
+    for kind in default_inline_mix:
+        total += inline_mix.get(kind, 0)
+        limits.append((total / 100, inline_constructs[kind]))
+    parts = []
+    for x in range(length):
+        word = rng.choice(words)
+        roll = rng.random()
+        for limit, construct in limits:
+            if roll < limit:
+                word = construct(rng, word)
+                break
+        parts.append(word)
+    return " ".join(parts)
+
+def generate_block(rng: random.Random, kind: str, inline_mix: Dict[str, float] = None) -> str:
+    """generate a single markdown block of the given kind."""
+    def text(low, high):
+        return inline_text(rng, rng.randint(low, high), inline_mix)
+
+    if kind == "heading":
+        return f"{'#' * rng.randint(2, 6)} {text(2, 6)}"
+    if kind == "unordered_list":
+        marker = rng.choice("*-")
+        return "\n".join(f"{marker} {text(3, 10)}" for _ in range(rng.randint(2, 8)))
+    if kind == "ordered_list":
+        return "\n".join(f"{x}. {text(3, 10)}" for x in range(1, rng.randint(3, 9)))
+    if kind == "code":
+        lines = [f"print({rng.choice(words)!r})" for _ in range(rng.randint(1, 10))]
+        return "```\n" + "\n".join(lines) + "\n```"
+    if kind == "quote":
+        return "\n".join(f"> {text(5, 15)}" for _ in range(rng.randint(1, 4)))
+    return "\n".join(text(10, 30) for _ in range(rng.randint(1, 4)))
+
+def generate_markdown(rng: random.Random, blocks: int, mix: Dict[str, int] = None, title: str = None,
+                      inline_mix: Dict[str, float] = None) -> str:
+    """generate a markdown page with an h1 title followed by blocks picked by the weights in mix.
+
+    Args:
+        rng (random.Random): source of randomness, seed it for a reproducible page
+        blocks (int): number of blocks after the title
+        mix (Dict[str, int], optional): block kind to weight. Defaults to default_mix.
+        title (str, optional): page title. Defaults to random words.
+        inline_mix (Dict[str, float], optional): inline construct to percent of words. Defaults to default_inline_mix.
+
+    Returns:
+        str: the markdown page
+    """
+    mix = mix or default_mix
+    kinds: List[str] = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    title = title or " ".join(rng.choice(words) for _ in range(4))
+    output = [f"# {title}"]
+    for kind in rng.choices(kinds, weights, k=blocks):
+        output.append(generate_block(rng, kind, inline_mix))
+    return "\n\n".join(output) + "\n"
+
+def generate_corpus(root: str, pages: int, blocks: int = 40, mix: Dict[str, int] = None,
+                    seed: int = 1, pages_per_dir: int = 100, inline_mix: Dict[str, float] = None) -> List[str]:
+    """write a tree of synthetic markdown pages.
+
+    Args:
+        root (str): directory to write the pages into
+        pages (int): number of pages
+        blocks (int, optional): blocks per page. Defaults to 40.
+        mix (Dict[str, int], optional): block kind to weight. Defaults to default_mix.
+        seed (int, optional): random seed, the same seed writes the same corpus. Defaults to 1.
+        pages_per_dir (int, optional): pages in each sub directory. Defaults to 100.
+        inline_mix (Dict[str, float], optional): inline construct to percent of words. Defaults to default_inline_mix.
+
+    Returns:
+        List[str]: paths of the generated markdown files
+    """
+    rng = random.Random(seed)
+    paths = []
+    for x in range(pages):
+        directory = os.path.join(root, f"section{x // pages_per_dir}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"page{x}.md")
+        with open(path, 'w') as file:
+            file.write(generate_markdown(rng, blocks, mix, f"Page {x}", inline_mix))
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--blocks", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mix", type=parse_mix, default=None)
+    parser.add_argument("--inline-mix", type=parse_inline_mix, default=None)
+    args = parser.parse_args()
+    paths = generate_corpus(args.output, args.pages, args.blocks, args.mix, args.seed, inline_mix=args.inline_mix)
+    print(f"Wrote {len(paths)} pages to {args.output}")
+
+if __name__ == "__main__":
+    main()
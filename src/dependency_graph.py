@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import posixpath
+from typing import Dict, Iterable, List, Optional, Set
+
+from assets import asset_attribute_regex
+from inline_markdown import extract_markdown_images, extract_markdown_links
+from template_engine import Template
+
+GRAPH_FORMAT = 1
+
+# a url with a scheme (https:, mailto:) or a protocol relative url never names a local file
+external_url_regex = re.compile(r"^(?:[a-zA-Z][a-zA-Z0-9+.-]*:|//)")
+
+
+def dependency_key(path: str) -> str:
+    """the form paths are stored and compared in, relative to the working directory,
+    so ./content/index.md, content/index.md and its absolute path are the same input.
+    """
+    return os.path.normpath(os.path.relpath(path))
+
+def resolve_static_url(url: str, static_dir: str, page_dir: str = "", must_exist: bool = True) -> Optional[str]:
+    """the static file a url in a page refers to.
+
+    Args:
+        url (str): url as written in markdown or the template
+        static_dir (str): directory with static assets
+        page_dir (str, optional): directory of the page within the site, relative urls are resolved against it.
+            Defaults to the site root.
+        must_exist (bool, optional): only return paths of existing files. Defaults to True.
+
+    Returns:
+        Optional[str]: path of the static file, or None when the url does not name a local file
+    """
+    url = url.strip().split('#', 1)[0].split('?', 1)[0]
+    if not url or external_url_regex.match(url):
+        return None
+    rel_path = posixpath.normpath(url.lstrip('/') if url.startswith('/') else posixpath.join(page_dir, url))
+    if rel_path == '.' or rel_path.startswith('..'):
+        return None
+    path = os.path.join(static_dir, *rel_path.split('/'))
+    if must_exist and not os.path.isfile(path):
+        return None
+    return path
+
+def markdown_static_references(from_path: str, static_dir: str, page_dir: str = "") -> Set[str]:
+    """static files a markdown file references, read one line at a time.
+    images count even when the file does not exist yet, so adding it later affects the page.
+
+    Args:
+        from_path (str): path to the markdown file
+        static_dir (str): directory with static assets
+        page_dir (str, optional): directory of the page within the site. Defaults to the site root.
+
+    Returns:
+        Set[str]: paths of the referenced static files
+    """
+    references = set()
+    with open(from_path) as file:
+        for line in file:
+            if "](" not in line:
+                continue
+            for _, url in extract_markdown_images(line):
+                path = resolve_static_url(url, static_dir, page_dir, must_exist=False)
+                if path is not None:
+                    references.add(path)
+            for _, url in extract_markdown_links(line):
+                path = resolve_static_url(url, static_dir, page_dir)
+                if path is not None:
+                    references.add(path)
+    return references
+
+def template_static_references(template: Template, static_dir: str) -> Set[str]:
+    """static files the href and src attributes of a template reference."""
+    references = set()
+    for _, _, url in asset_attribute_regex.findall("".join(template.parts)):
+        path = resolve_static_url(url, static_dir)
+        if path is not None:
+            references.add(path)
+    return references
+
+
+class DependencyGraph:
+    """persistent record of what every generated page was built from:
+    its markdown source, the template and the static files either of them reference.
+    answers which outputs a set of changed files affects, for incremental builds, watch mode and ci.
+    """
+    def __init__(self, path: str = None, static_dir: str = None) -> None:
+        """
+        Args:
+            path (str, optional): path of the json file backing this graph. Defaults to None.
+            static_dir (str, optional): directory with static assets, references into it are recorded.
+                Defaults to None.
+        """
+        self.path = path
+        self.static_dir = static_dir
+        # output path to its input paths, the markdown source first
+        self.outputs: Dict[str, List[str]] = {}
+        # input path to the outputs depending on it, built on the first query
+        self._dependents: Dict[str, Set[str]] = None
+
+    @classmethod
+    def load(cls, path: str, static_dir: str = None) -> 'DependencyGraph':
+        """load a graph from disk, a missing or unreadable file results in an empty graph.
+
+        Args:
+            path (str): path of the json graph file
+            static_dir (str, optional): directory with static assets. Defaults to None.
+
+        Returns:
+            DependencyGraph: the loaded graph
+        """
+        graph = cls(path, static_dir)
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return graph
+        if isinstance(data, dict) and data.get("format") == GRAPH_FORMAT:
+            graph.outputs = data.get("outputs", {})
+        return graph
+
+    def save(self, path: str = None) -> None:
+        """write the graph to disk through a temporary file, like the build manifest.
+
+        Args:
+            path (str, optional): path to write to. Defaults to the path the graph was loaded from.
+        """
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump({"format": GRAPH_FORMAT, "outputs": self.outputs}, file, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def record(self, output: str, source: str, inputs: Iterable[str] = ()) -> None:
+        """set what an output was built from.
+
+        Args:
+            output (str): path of the generated file
+            source (str): path of the markdown source
+            inputs (Iterable[str], optional): every other input, e.g. the template and static files. Defaults to ().
+        """
+        keys = [dependency_key(source)]
+        keys.extend(sorted({dependency_key(path) for path in inputs} - {keys[0]}))
+        self.outputs[dependency_key(output)] = keys
+        self._dependents = None
+
+    def record_page(self, from_path: str, dest_path: str, template_path: str, dir_path_content: str,
+                    template_references: Set[str] = frozenset()) -> None:
+        """record a page generated from a markdown file, scanning the markdown for static references.
+
+        Args:
+            from_path (str): path to the markdown source
+            dest_path (str): path of the generated html file
+            template_path (str): path to the template html file
+            dir_path_content (str): directory with markdown content
+            template_references (Set[str], optional): static files the template references. Defaults to none.
+        """
+        inputs = {template_path}
+        inputs.update(template_references)
+        if self.static_dir is not None:
+            page_dir = os.path.dirname(os.path.relpath(from_path, dir_path_content)).replace(os.sep, '/')
+            inputs.update(markdown_static_references(from_path, self.static_dir, page_dir))
+        self.record(dest_path, from_path, inputs)
+
+    def remove(self, output: str) -> None:
+        if self.outputs.pop(dependency_key(output), None) is not None:
+            self._dependents = None
+
+    def prune(self, outputs: Iterable[str]) -> None:
+        """forget every output not in outputs, e.g. pages whose source was deleted."""
+        keep = {dependency_key(output) for output in outputs}
+        for output in [output for output in self.outputs if output not in keep]:
+            del self.outputs[output]
+        self._dependents = None
+
+    def covers(self, outputs: Iterable[str]) -> bool:
+        """whether every one of outputs has been recorded."""
+        return all(dependency_key(output) in self.outputs for output in outputs)
+
+    def source(self, output: str) -> Optional[str]:
+        """the markdown source of an output."""
+        inputs = self.outputs.get(dependency_key(output))
+        return inputs[0] if inputs else None
+
+    def static_path(self, url: str) -> Optional[str]:
+        """the static file a site root relative url names, whether or not it exists."""
+        if self.static_dir is None:
+            return None
+        return resolve_static_url(url, self.static_dir, must_exist=False)
+
+    def dependents(self) -> Dict[str, Set[str]]:
+        if self._dependents is None:
+            dependents: Dict[str, Set[str]] = {}
+            for output, inputs in self.outputs.items():
+                for path in inputs:
+                    dependents.setdefault(path, set()).add(output)
+            self._dependents = dependents
+        return self._dependents
+
+    def affected(self, paths: Iterable[str]) -> Set[str]:
+        """the outputs that have to be rebuilt when paths change.
+        a directory affects every output with an input inside it.
+
+        Args:
+            paths (Iterable[str]): changed, created or deleted files and directories, directories may end with os.sep
+
+        Returns:
+            Set[str]: paths of the affected outputs
+        """
+        dependents = self.dependents()
+        affected = set()
+        for path in paths:
+            if path is None:
+                continue
+            key = dependency_key(path)
+            affected.update(dependents.get(key, ()))
+            if path.endswith(os.sep) or os.path.isdir(path):
+                prefix = "" if key == os.curdir else os.path.join(key, '')
+                for input_path, outputs in dependents.items():
+                    if input_path.startswith(prefix):
+                        affected.update(outputs)
+        return affected
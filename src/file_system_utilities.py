@@ -1,5 +1,20 @@
+import io
 import os
+import sys
+import json
 import shutil
+from typing import Dict, List, TextIO
+from build_manifest import hash_bytes, hash_file
+from instrumentation import tracer
+from assets import asset_url, fingerprinted_path
+
+try:
+    import fcntl
+except ImportError:  # not available on windows
+    fcntl = None
+
+# linux ioctl request to share the extents of one file with another (reflink)
+FICLONE = 0x40049409
 
 def copy_static_dir(source_dir: str, destination_dir: str):
     """copy directory tree of a given directory to a given destination directory.
@@ -26,6 +41,215 @@ def copy_static_dir(source_dir: str, destination_dir: str):
                 os.makedirs(destination_path)
             copy_static_dir(source_path, destination_path)
     
+class SyncStats:
+    """counts of what a static sync did with each file."""
+    def __init__(self) -> None:
+        self.copied = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.methods: Dict[str, int] = {}
+        # url of every static file to the url of its fingerprinted copy
+        self.assets: Dict[str, str] = {}
+
+    def __repr__(self) -> str:
+        return f"SyncStats(copied: {self.copied}, unchanged: {self.unchanged}, removed: {self.removed}, methods: {self.methods})"
+
+def sync_static_dir(source_dir: str, destination_dir: str, manifest_path: str, use_hash: bool = False, link: bool = False,
+                    fingerprint: bool = False) -> SyncStats:
+    """make destination_dir hold the same static files as source_dir without recopying unchanged files.
+    unlike copy_static_dir the destination is not wiped, so generated pages are preserved.
+    
+    every synced file is recorded in a manifest with its size and mtime.
+    a file whose size and mtime match the manifest costs a stat of the source and one of its copy,
+    so a copy deleted from the destination is copied again.
+    files that were synced before but no longer exist in the source are deleted,
+    files that were never synced (e.g. generated pages) are left alone.
+
+    Args:
+        source_dir (str): source path to static directory string
+        destination_dir (str): destination path directory string
+        manifest_path (str): path to the json manifest of synced files
+        use_hash (bool, optional): compare content hashes when size or mtime differ,
+            so touched but unchanged files are not copied. Defaults to False.
+        link (bool, optional): hard link files into the destination instead of copying when possible. Defaults to False.
+        fingerprint (bool, optional): also publish every file under a name holding a hash of its contents,
+            e.g. index.3f9a1c2b.css, listed in SyncStats.assets. the hash is kept in the manifest,
+            so only new or changed files are read. Defaults to False.
+
+    Returns:
+        SyncStats: how many files were copied, left unchanged and removed
+    """
+    stats = SyncStats()
+    old_files = {}
+    if os.path.isdir(destination_dir):
+        old_files = load_file_manifest(manifest_path)
+    new_files = {}
+    known_dirs = set()
+    for rel_path, stat in scan_files(source_dir, ''):
+        source_path = os.path.join(source_dir, rel_path)
+        destination_path = os.path.join(destination_dir, rel_path)
+        record = old_files.get(rel_path)
+        old_fingerprint = record[3] if record is not None and len(record) > 3 else None
+        if (
+            record is not None
+            and record[0] == stat.st_size
+            and record[1] == stat.st_mtime_ns
+            and os.path.exists(destination_path)
+            and (not fingerprint or _fingerprint_exists(destination_dir, old_fingerprint))
+        ):
+            new_files[rel_path] = record
+            stats.unchanged += 1
+            if fingerprint:
+                stats.assets[asset_url(rel_path)] = asset_url(old_fingerprint)
+            continue
+        content_hash = None
+        copied = True
+        if use_hash or fingerprint:
+            content_hash = hash_file(source_path)
+            copied = not (
+                record is not None
+                and record[0] == stat.st_size
+                and record[2] == content_hash
+                and os.path.exists(destination_path)
+            )
+        if copied:
+            parent = os.path.dirname(destination_path)
+            if parent not in known_dirs:
+                os.makedirs(parent, exist_ok=True)
+                known_dirs.add(parent)
+            with tracer.span("static_copy", path=source_path):
+                method = copy_file_fast(source_path, destination_path, link)
+            stats.methods[method] = stats.methods.get(method, 0) + 1
+            stats.copied += 1
+        else:
+            stats.unchanged += 1
+        new_fingerprint = None
+        if fingerprint:
+            new_fingerprint = fingerprinted_path(rel_path, content_hash)
+            fingerprint_path = os.path.join(destination_dir, new_fingerprint)
+            if not os.path.exists(fingerprint_path):
+                # a hard link to a file the source is linked to would change along with the source,
+                # fingerprinted files must never change, so they are only linked to our own copy
+                copy_file_fast(source_path if link else destination_path, fingerprint_path, not link)
+            if old_fingerprint is not None and old_fingerprint != new_fingerprint:
+                _remove_synced_file(destination_dir, old_fingerprint)
+            stats.assets[asset_url(rel_path)] = asset_url(new_fingerprint)
+        new_files[rel_path] = [stat.st_size, stat.st_mtime_ns, content_hash, new_fingerprint]
+
+    for rel_path, record in old_files.items():
+        if rel_path in new_files:
+            continue
+        if _remove_synced_file(destination_dir, rel_path):
+            stats.removed += 1
+        if len(record) > 3 and record[3] is not None:
+            _remove_synced_file(destination_dir, record[3])
+
+    save_file_manifest(manifest_path, new_files)
+    return stats
+
+def _fingerprint_exists(destination_dir: str, fingerprint: str) -> bool:
+    return fingerprint is not None and os.path.exists(os.path.join(destination_dir, fingerprint))
+
+def _remove_synced_file(destination_dir: str, rel_path: str) -> bool:
+    destination_path = os.path.join(destination_dir, rel_path)
+    if not os.path.isfile(destination_path):
+        return False
+    os.remove(destination_path)
+    _remove_empty_dirs(os.path.dirname(destination_path), destination_dir)
+    return True
+
+def copy_file_fast(source_path: str, destination_path: str, link: bool = False) -> str:
+    """copy a single file using the cheapest method the filesystem supports.
+    tries, in order: a hard link (only when link is true), a reflink,
+    os.copy_file_range and finally a regular copy.
+    the destination is unlinked first, so a previously hard linked file never has its source overwritten.
+
+    Args:
+        source_path (str): file to copy
+        destination_path (str): path of the copy
+        link (bool, optional): allow hard linking the destination to the source. Defaults to False.
+
+    Returns:
+        str: the method used ("link", "reflink", "copy_file_range" or "copy")
+    """
+    if os.path.lexists(destination_path):
+        os.remove(destination_path)
+    if link:
+        try:
+            os.link(source_path, destination_path)
+            return "link"
+        except OSError:
+            pass
+    method = "copy"
+    with open(source_path, 'rb') as source, open(destination_path, 'wb') as destination:
+        if fcntl is not None and sys.platform.startswith("linux"):
+            try:
+                fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+                method = "reflink"
+            except OSError:
+                pass
+        if method == "copy" and hasattr(os, "copy_file_range"):
+            try:
+                size = os.fstat(source.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    copied = os.copy_file_range(source.fileno(), destination.fileno(), size - offset, offset, offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+                if offset == size:
+                    method = "copy_file_range"
+                else:
+                    destination.seek(0)
+                    destination.truncate()
+            except OSError:
+                destination.seek(0)
+                destination.truncate()
+        if method == "copy":
+            shutil.copyfileobj(source, destination)
+    shutil.copystat(source_path, destination_path)
+    return method
+
+def scan_files(root: str, rel_dir: str):
+    """yield (relative path, stat) for every file under root, one stat per file."""
+    with os.scandir(os.path.join(root, rel_dir)) as entries:
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name)
+            if entry.is_dir():
+                yield from scan_files(root, rel_path)
+            elif entry.is_file():
+                yield rel_path, entry.stat()
+
+def _remove_empty_dirs(path: str, stop_dir: str) -> None:
+    """remove path and its parents while they are empty, never removing stop_dir."""
+    stop_dir = os.path.abspath(stop_dir)
+    path = os.path.abspath(path)
+    while path != stop_dir and path.startswith(stop_dir):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
+
+def load_file_manifest(manifest_path: str) -> Dict[str, List]:
+    try:
+        with open(manifest_path) as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return data
+
+def save_file_manifest(manifest_path: str, files: Dict[str, List]) -> None:
+    directory = os.path.dirname(manifest_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(files, file, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
 def read_file(path: str) -> str:
     """pass a valid path string into this function 
     and get the contents of that file returned.
@@ -45,25 +269,159 @@ def read_file(path: str) -> str:
         content = file.read()
     return content
         
-def write_file(content: str, dest_path: str) -> None:
+# directories this process created or found to exist, so writing a page costs no stat or makedirs
+_known_dirs = set()
+# the set is emptied when it reaches this size, which keeps huge builds at constant memory
+KNOWN_DIRS_LIMIT = 4096
+
+# how many files open_for_write and write_file wrote or left alone in skip unchanged mode
+write_counts = {"written": 0, "unchanged": 0}
+
+def ensure_dir(path: str) -> None:
+    """create a directory and its parents unless this process already knows it exists.
+
+    Args:
+        path (str): directory path, an empty path is the current directory
+    """
+    if path and path not in _known_dirs:
+        os.makedirs(path, 511, True)
+        if len(_known_dirs) >= KNOWN_DIRS_LIMIT:
+            _known_dirs.clear()
+        _known_dirs.add(path)
+
+def _open_in_dir(path: str, mode: str):
+    """open a file for writing, creating its directory if needed.
+    a known directory may have been removed since, e.g. by --clean between watch builds, then it is created again.
+    """
+    directory = os.path.dirname(path)
+    ensure_dir(directory)
+    try:
+        return open(path, mode)
+    except FileNotFoundError:
+        _known_dirs.discard(directory)
+        ensure_dir(directory)
+        return open(path, mode)
+
+def _same_file_contents(path: str, size: int, content_hash) -> bool:
+    """whether the file at path holds size bytes hashing to content_hash, the hash is only computed when the size matches.
+
+    Args:
+        path (str): path to an existing or missing file
+        size (int): size of the new content in bytes
+        content_hash: hex digest of the new content, or a function returning it
+
+    Returns:
+        bool: whether the file exists with exactly that content
+    """
+    try:
+        if os.stat(path).st_size != size:
+            return False
+    except FileNotFoundError:
+        return False
+    if callable(content_hash):
+        content_hash = content_hash()
+    return hash_file(path) == content_hash
+
+def _temp_path(dest_path: str) -> str:
+    # next to the destination so os.replace stays on one filesystem, unique per process for parallel builds
+    return f"{dest_path}.{os.getpid()}.tmp"
+
+def write_file(content: str, dest_path: str, skip_unchanged: bool = False) -> bool:
     """write given content to a file, at the given path.
     overwrite file content if the file exists.
     if the path and file does not exist create it.
 
+    with skip_unchanged a file that already holds the same bytes is left untouched, keeping its mtime,
+    so deploys that compare mtimes see no change. a changed file is written to a temporary file
+    and moved over the destination, readers never see a partly written file.
+
     Args:
         content (str): a string of content to be writen to a file.
         dest_path (str): destination path with filename.
-    """    
-    path = os.path.dirname(dest_path)
-    
-    if os.path.exists(dest_path):
-        # file exists in destination already.
-        # overwrite the file
-        with open(dest_path, 'w') as file:
-            file.write(content)
-    else:
-        # file does not exist in destination path,
-        # or path does not exist
-        os.makedirs(path, 511 ,True)
-        with open(dest_path, 'w') as file:
+        skip_unchanged (bool, optional): compare with the existing file by size, then hash,
+            and write atomically. Defaults to False.
+
+    Returns:
+        bool: whether the file was written
+    """
+    if not skip_unchanged:
+        with _open_in_dir(dest_path, 'w') as file:
             file.write(content)
+        return True
+
+    data = content.encode()
+    if _same_file_contents(dest_path, len(data), lambda: hash_bytes(data)):
+        write_counts["unchanged"] += 1
+        return False
+    tmp_path = _temp_path(dest_path)
+    with _open_in_dir(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, dest_path)
+    write_counts["written"] += 1
+    return True
+
+
+class SkipUnchangedWriter(io.TextIOBase):
+    """text file returned by open_for_write in skip unchanged mode.
+    text is written to a temporary file next to the destination. closing it moves the temporary file
+    over the destination, unless the destination already holds the same bytes, then it is deleted.
+    """
+    def __init__(self, dest_path: str) -> None:
+        super().__init__()
+        self.dest_path = dest_path
+        self.tmp_path = _temp_path(dest_path)
+        self.file = _open_in_dir(self.tmp_path, 'w')
+        self.written = None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        return self.file.write(text)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self.file.close()
+            size = os.stat(self.tmp_path).st_size
+            if _same_file_contents(self.dest_path, size, lambda: hash_file(self.tmp_path)):
+                os.remove(self.tmp_path)
+                self.written = False
+                write_counts["unchanged"] += 1
+            else:
+                os.replace(self.tmp_path, self.dest_path)
+                self.written = True
+                write_counts["written"] += 1
+        finally:
+            super().close()
+
+    def discard(self) -> None:
+        """close without touching the destination."""
+        if self.closed:
+            return
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        super().close()
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+def open_for_write(dest_path: str, skip_unchanged: bool = False) -> TextIO:
+    """open a file for writing text, creating the destination directory if it does not exist.
+
+    Args:
+        dest_path (str): destination path with filename.
+        skip_unchanged (bool, optional): write through a SkipUnchangedWriter,
+            so an identical file is left untouched and a changed one is replaced atomically. Defaults to False.
+
+    Returns:
+        TextIO: the opened file
+    """
+    if skip_unchanged:
+        return SkipUnchangedWriter(dest_path)
+    return _open_in_dir(dest_path, 'w')
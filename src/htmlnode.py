@@ -1,18 +1,23 @@
-from typing import (Type,Dict,List)
+import io
+from typing import (Type,Dict,List,Iterable,Iterator,IO)
 
 
 class HTMLNode:
     """represent a "node" in an HTML document tree 
     (like a <p> tag and its contents, or an <a> tag and its contents)
     and is purpose-built to render itself as HTML.
+    uses __slots__ instead of a per instance __dict__, large pages create a lot of nodes.
     """
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag: str = None, value: str = None, children: List['HTMLNode'] = None, props: Dict[str,str] = None) -> None:
         """4 optional data members
             counterintuitively, every data member should be optional and default to None:
             An HTMLNode without a tag will just render as raw text
             An HTMLNode without a value will be assumed to have children
             An HTMLNode without children will be assumed to have a value
-            An HTMLNode without props simply won't have any attributes
+            An HTMLNode without props simply won't have any attributes,
+                empty props are stored as None so every attribute-less node shares it
 
         Args:
             tag (str, optional): A string representing the HTML tag name.(e.g. "p", "a", "h1", etc.) Defaults to None.
@@ -25,7 +30,7 @@ class HTMLNode:
         self.tag = tag  #A string representing the HTML tag name
         self.value = value #A string representing the value of the HTML tag
         self.children = children #A list of HTMLNode objects representing the children of this node
-        self.props = props #A dictionary of key-value pairs representing the attributes of the HTML tag
+        self.props = props or None #A dictionary of key-value pairs representing the attributes of the HTML tag
 
     def to_html(self):
         raise NotImplementedError("to_html method not implemented")
@@ -36,12 +41,9 @@ class HTMLNode:
         Returns:
             str: string representation of the HTML attributes of the node
         """        
-        if self.props is None or self.props is {}:
+        if not self.props:
             return ''
-        prop = ''
-        for key, value in self.props.items():
-            prop += f' {key}="{value}"'
-        return prop
+        return ''.join([f' {key}="{value}"' for key, value in self.props.items()])
     
     def __repr__(self) -> str:
         return f"HTMLNode({self.tag},{self.value}, children: {self.children},{self.props})"
@@ -80,6 +82,8 @@ class LeafNode(HTMLNode):
     """a type of HTMLNode that represents a single HTML tag with no children. 
     For example, a simple <p> tag with some text inside of it
     """
+    __slots__ = ()
+
     def __init__(self, tag: str, value:str, props: Dict[str,str] = None):
         """inherits from HTMLNode.
         dissallows children.
@@ -116,6 +120,8 @@ class ParentNode(HTMLNode):
     """model to handle the nesting of HTML nodes inside of one another. 
     Any HTML node that's not "leaf" node (i.e. it has children) is a "parent" node.
     """
+    __slots__ = ()
+
     def __init__(self, tag: str, children: List[HTMLNode], props: Dict[str,str] = None):
         """It doesn't take a value argument
             The children argument is not optional
@@ -140,23 +146,123 @@ class ParentNode(HTMLNode):
         Returns:
             str: returns a string representing the HTML tag of the node and its children.
         """        
-        if self.tag is None:
-            raise ValueError("Tag value required")
-        if self.children is None:
-            raise ValueError("Parent node requires children")
-        if self.children == []:
-            return f"<{self.tag}{self.props_to_html()}></{self.tag}>"
-        html= f"<{self.tag}{self.props_to_html()}>"
-        if self.tag == '':
-            html = ''
-        for child in self.children:
-            html += child.to_html()
-        if self.tag == '':
-            return html
-        html += f"</{self.tag}>"
-        return html
+        return "".join(iter_html(self))
     
     def __repr__(self) -> str:
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
 
+class RenderedNode(LeafNode):
+    """html rendered ahead of time, by the block cache or a worker process,
+    kept with the text of the node tree it was rendered from, so the text is known without parsing it again.
+    """
+    __slots__ = ("text",)
+
+    def __init__(self, html: str, text: str = None):
+        """
+        Args:
+            html (str): the rendered html, written as is
+            text (str, optional): node_text of the tree the html was rendered from. Defaults to None, unknown.
+        """
+        super().__init__(None, html)
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"RenderedNode({self.value}, {self.text})"
+
+def node_text(node: HTMLNode) -> str:
+    """the values of the leaves of an HTMLNode tree, one per line, without tags or attributes."""
+    if isinstance(node, RenderedNode):
+        return node.text or ""
+    if node.children is None:
+        return node.value or ""
+    return "\n".join([node_text(child) for child in node.children])
+
+
+_end_of_children = object()
 
+def iter_html(node: HTMLNode) -> Iterator[str]:
+    """walk an HTMLNode tree with an explicit stack and yield its html in chunks.
+    joining the chunks gives exactly node.to_html(), without recursing once per level
+    or building the whole document as one string.
+    children may be any iterable, so a tree can be produced lazily while it is rendered.
+
+    Args:
+        node (HTMLNode): root of the tree to render
+
+    Raises:
+        ValueError: raise an error if a parent node has no tag or no children
+
+    Yields:
+        str: consecutive pieces of the rendered html
+    """
+    stack = [iter((node,))]
+    closers = [None]
+    while stack:
+        child = next(stack[-1], _end_of_children)
+        if child is _end_of_children:
+            stack.pop()
+            closer = closers.pop()
+            if closer:
+                yield closer
+            continue
+        if not isinstance(child, ParentNode):
+            yield child.to_html()
+            continue
+        if child.tag is None:
+            raise ValueError("Tag value required")
+        if child.children is None:
+            raise ValueError("Parent node requires children")
+        if child.tag == '' and child.children == []:
+            yield "<></>"
+            continue
+        if child.tag != '':
+            yield f"<{child.tag}{child.props_to_html()}>"
+        stack.append(iter(child.children))
+        closers.append(f"</{child.tag}>" if child.tag != '' else None)
+
+def write_chunks(chunks: Iterable[str], stream: IO, buffer_size: int = 1 << 16, encoding: str = "utf-8") -> int:
+    """write chunks of text to a text or binary stream,
+    batching small chunks so the stream sees few large writes.
+
+    Args:
+        chunks (Iterable[str]): pieces of text to write, in order
+        stream (IO): a text stream, or a binary stream the text is encoded for
+        buffer_size (int, optional): number of characters batched before each write. Defaults to 64Ki.
+        encoding (str, optional): encoding used for binary streams. Defaults to "utf-8".
+
+    Returns:
+        int: number of characters written
+    """
+    binary = not isinstance(stream, io.TextIOBase)
+    buffer = []
+    buffered = 0
+    written = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            text = "".join(buffer)
+            stream.write(text.encode(encoding) if binary else text)
+            written += buffered
+            buffer = []
+            buffered = 0
+    if buffer:
+        text = "".join(buffer)
+        stream.write(text.encode(encoding) if binary else text)
+        written += buffered
+    return written
+
+def write_html(node: HTMLNode, stream: IO, buffer_size: int = 1 << 16, encoding: str = "utf-8") -> int:
+    """render an HTMLNode tree straight into a text or binary stream.
+    the output is identical to node.to_html().
+
+    Args:
+        node (HTMLNode): root of the tree to render
+        stream (IO): a text stream, or a binary stream the html is encoded for
+        buffer_size (int, optional): number of characters batched before each write. Defaults to 64Ki.
+        encoding (str, optional): encoding used for binary streams. Defaults to "utf-8".
+
+    Returns:
+        int: number of characters written
+    """
+    return write_chunks(iter_html(node), stream, buffer_size, encoding)
@@ -0,0 +1,221 @@
+import os
+import json
+import math
+import time
+import threading
+from typing import Dict, List
+
+
+class _NullSpan:
+    """shared span handed out while instrumentation is off, entering and leaving it does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_null_span = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: 'Tracer', name: str, args: Dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+class _PageSpan(_Span):
+    __slots__ = ("stages", "previous")
+
+    def __enter__(self):
+        self.stages = {}
+        self.previous = self.tracer.current_page
+        self.tracer.current_page = self.stages
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter_ns() - self.start
+        self.tracer.current_page = self.previous
+        self.tracer.pages.append({"path": self.args["path"], "ns": duration, "stages": self.stages})
+        args = dict(self.args)
+        args.update({stage: ns / 1000 for stage, ns in self.stages.items()})
+        self.tracer.record(self.name, self.start, duration, args, stage=False)
+        return False
+
+
+class Tracer:
+    """collects timing spans for a build.
+    while disabled span() returns a shared no-op context manager, so instrumented code costs one call.
+    spans inside a page() span also add their time to that page's per stage breakdown.
+    """
+    def __init__(self) -> None:
+        self.enabled = False
+        self.keep_events = False
+        self.origin = time.perf_counter_ns()
+        self.reset()
+
+    def reset(self) -> None:
+        self.events: List[Dict] = []
+        self.pages: List[Dict] = []
+        self.files: List[Dict] = []
+        self.totals: Dict[str, int] = {}
+        self.current_page = None
+
+    def enable(self, keep_events: bool = False) -> None:
+        """turn instrumentation on.
+
+        Args:
+            keep_events (bool, optional): keep every span for a chrome trace. Defaults to False.
+        """
+        self.enabled = True
+        self.keep_events = keep_events
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def span(self, name: str, **args):
+        """time a stage of the build.
+
+        Args:
+            name (str): stage name, e.g. "read" or "write"
+            **args: extra details kept with the span, a "path" marks the span as work on a single file
+
+        Returns:
+            context manager timing the enclosed code
+        """
+        if not self.enabled:
+            return _null_span
+        return _Span(self, name, args)
+
+    def page(self, path: str):
+        """time the generation of a single page, collecting the stages run inside it."""
+        if not self.enabled:
+            return _null_span
+        return _PageSpan(self, "page", {"path": path})
+
+    def add(self, stage: str, ns: int) -> None:
+        """add time measured by hand to a stage, for loops too hot to wrap in spans."""
+        self.totals[stage] = self.totals.get(stage, 0) + ns
+        if self.current_page is not None:
+            self.current_page[stage] = self.current_page.get(stage, 0) + ns
+
+    def record(self, name: str, start: int, duration: int, args: Dict, stage: bool = True) -> None:
+        if stage:
+            self.add(name, duration)
+            if "path" in args and self.current_page is None:
+                self.files.append({"path": args["path"], "stage": name, "ns": duration})
+        if self.keep_events:
+            self.events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.origin) / 1000,
+                "dur": duration / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            })
+
+    def drain(self) -> Dict:
+        """hand over everything collected so far and start again, used to ship worker results to the parent."""
+        collected = {
+            "events": self.events,
+            "pages": self.pages,
+            "files": self.files,
+            "totals": self.totals,
+        }
+        self.reset()
+        return collected
+
+    def merge(self, collected: Dict) -> None:
+        """add the results drained from another tracer, e.g. a worker process."""
+        self.events.extend(collected["events"])
+        self.pages.extend(collected["pages"])
+        self.files.extend(collected["files"])
+        for stage, ns in collected["totals"].items():
+            self.totals[stage] = self.totals.get(stage, 0) + ns
+
+
+tracer = Tracer()
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """nearest rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def build_report(tracer: Tracer, wall_seconds: float = None, top: int = 10) -> Dict:
+    """summarise a traced build.
+
+    Args:
+        tracer (Tracer): the tracer that collected the build
+        wall_seconds (float, optional): wall clock time of the whole build. Defaults to None.
+        top (int, optional): number of slowest pages and files to list. Defaults to 10.
+
+    Returns:
+        Dict: json serialisable report with stage totals, per page percentiles and the slowest pages and files
+    """
+    page_totals = [page["ns"] / 1e9 for page in tracer.pages]
+    stages = sorted({stage for page in tracer.pages for stage in page["stages"]})
+    percentiles = {"page": _percentiles(page_totals)}
+    for stage in stages:
+        percentiles[stage] = _percentiles([page["stages"].get(stage, 0) / 1e9 for page in tracer.pages])
+    slowest_pages = sorted(tracer.pages, key=lambda page: page["ns"], reverse=True)[:top]
+    slowest_files = sorted(tracer.files, key=lambda file: file["ns"], reverse=True)[:top]
+    return {
+        "wall_seconds": wall_seconds,
+        "pages": len(tracer.pages),
+        "files": len(tracer.files),
+        "totals": {stage: ns / 1e9 for stage, ns in sorted(tracer.totals.items())},
+        "percentiles": percentiles,
+        "slowest_pages": [
+            {
+                "path": page["path"],
+                "seconds": page["ns"] / 1e9,
+                "stages": {stage: ns / 1e9 for stage, ns in page["stages"].items()},
+            }
+            for page in slowest_pages
+        ],
+        "slowest_files": [
+            {"path": file["path"], "stage": file["stage"], "seconds": file["ns"] / 1e9}
+            for file in slowest_files
+        ],
+    }
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": percentile(values, 0.50),
+        "p90": percentile(values, 0.90),
+        "p99": percentile(values, 0.99),
+        "max": max(values) if values else 0.0,
+    }
+
+def write_report(report: Dict, path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+def write_chrome_trace(tracer: Tracer, path: str) -> None:
+    """write the collected spans in the chrome trace event format, viewable in chrome://tracing or perfetto."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump({"traceEvents": tracer.events, "displayTimeUnit": "ms"}, file)
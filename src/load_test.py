@@ -0,0 +1,151 @@
+"""load test the on demand render server over loopback.
+
+usage:
+    python3 src/load_test.py [--pages 200] [--connections 8] [--duration 5] [--revalidate]
+    python3 src/load_test.py --url http://127.0.0.1:8888 --path / --path /majesty/
+
+without --url a render server is started in its own process on a generated corpus,
+and every page is requested once to warm the cache before measuring.
+each connection runs in its own process and sends requests in a loop over a keep-alive connection,
+with --revalidate every request carries the page's ETag, so cache hits are answered with 304.
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import http.client
+import multiprocessing
+from contextlib import redirect_stdout
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+from corpus import generate_corpus
+from instrumentation import percentile
+from render_server import RenderServer
+
+
+def run_server(content: str, static: str, template: str, ports: multiprocessing.Queue) -> None:
+    server = RenderServer(("127.0.0.1", 0), content, static, template)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+def run_client(url: str, paths: List[str], duration: float, revalidate: bool) -> Dict:
+    """request paths round robin over one keep-alive connection for duration seconds.
+
+    Returns:
+        Dict: requests sent, count per status and the latency of every request in seconds
+    """
+    address = urlsplit(url)
+    connection = http.client.HTTPConnection(address.hostname, address.port or 80)
+    etags = {}
+    statuses: Dict[int, int] = {}
+    latencies = []
+    deadline = time.perf_counter() + duration
+    x = 0
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        path = paths[x % len(paths)]
+        x += 1
+        headers = {}
+        if revalidate and path in etags:
+            headers["If-None-Match"] = etags[path]
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        etag = response.getheader("ETag")
+        if etag is not None:
+            etags[path] = etag
+    connection.close()
+    return {"requests": len(latencies), "statuses": statuses, "latencies": latencies}
+
+def load_test(url: str, paths: List[str], connections: int = 8, duration: float = 5.0, revalidate: bool = False) -> Dict:
+    """hammer a server with concurrent keep-alive connections.
+
+    Args:
+        url (str): base url of the server, e.g. http://127.0.0.1:8888
+        paths (List[str]): request paths, requested round robin
+        connections (int, optional): concurrent connections, one process each. Defaults to 8.
+        duration (float, optional): seconds to send requests for. Defaults to 5.0.
+        revalidate (bool, optional): send If-None-Match with the last ETag seen. Defaults to False.
+
+    Returns:
+        Dict: total requests, requests per second, count per status and latency percentiles in milliseconds
+    """
+    with multiprocessing.Pool(connections) as pool:
+        results = pool.starmap(run_client, [(url, paths, duration, revalidate)] * connections)
+    statuses: Dict[int, int] = {}
+    latencies = []
+    for result in results:
+        latencies.extend(result["latencies"])
+        for status, count in result["statuses"].items():
+            statuses[status] = statuses.get(status, 0) + count
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / duration,
+        "statuses": statuses,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p90": percentile(latencies, 0.90) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+        },
+    }
+
+def print_results(results: Dict) -> None:
+    latency = results["latency_ms"]
+    print(f"{results['requests']} requests, {results['requests_per_second']:.0f} requests/s")
+    print(f"statuses: {', '.join(f'{status}: {count}' for status, count in sorted(results['statuses'].items()))}")
+    print(f"latency p50 {latency['p50']:.2f}ms, p90 {latency['p90']:.2f}ms, p99 {latency['p99']:.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="server to test, by default one is started on a generated corpus")
+    parser.add_argument("--path", action="append", dest="paths", help="path to request, may be repeated")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--blocks", type=int, default=40)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match and measure 304 responses")
+    args = parser.parse_args()
+
+    if args.url:
+        results = load_test(args.url, args.paths or ["/"], args.connections, args.duration, args.revalidate)
+        print_results(results)
+        return
+
+    root = tempfile.mkdtemp()
+    server = None
+    try:
+        content = os.path.join(root, "content")
+        static = os.path.join(root, "static")
+        template = os.path.join(root, "template.html")
+        os.makedirs(static)
+        with open(template, 'w') as file:
+            file.write("<html><head><title> {{ Title }} </title></head><body><article>{{ Content }}</article></body></html>")
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            sources = generate_corpus(content, args.pages, args.blocks)
+        paths = args.paths or ["/" + os.path.relpath(source, content)[:-len(".md")] + ".html" for source in sources]
+        ports = multiprocessing.Queue()
+        server = multiprocessing.Process(target=run_server, args=(content, static, template, ports), daemon=True)
+        server.start()
+        url = f"http://127.0.0.1:{ports.get(timeout=30)}"
+        start = time.perf_counter()
+        for path in paths:
+            connection = http.client.HTTPConnection("127.0.0.1", urlsplit(url).port)
+            connection.request("GET", path)
+            connection.getresponse().read()
+            connection.close()
+        print(f"Warmed {len(paths)} pages in {time.perf_counter() - start:.2f}s")
+        print_results(load_test(url, paths, args.connections, args.duration, args.revalidate))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,189 @@
+import os
+import time
+import shutil
+import argparse
 from site_gen import generate_page, generate_pages_recursive
-from file_system_utilities import copy_static_dir
+from file_system_utilities import sync_static_dir
+from watch import watch
+from async_pipeline import parse_pipeline_options
+from split_page import parse_split_options
+from precompress import precompress_dir, available_codecs
+from render_server import serve
+from assets import write_headers_file
+from dependency_graph import DependencyGraph
+from search_index import SearchIndex
+from shard_build import merge_shards, parse_shard, shard_paths, write_shard_info
+from instrumentation import tracer, build_report, write_report, write_chrome_trace
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="generate a static site from markdown content")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only regenerate pages whose source, template or generator changed")
+    parser.add_argument("--manifest", default=r"./.build/manifest.json",
+                        help="path to the build manifest used by incremental builds")
+    parser.add_argument("--clean", action="store_true",
+                        help="delete the output directory before building")
+    parser.add_argument("--static-manifest", default=r"./.build/static_manifest.json",
+                        help="path to the manifest of synced static files")
+    parser.add_argument("--hash-assets", action="store_true",
+                        help="compare static file contents when size or mtime changed")
+    parser.add_argument("--link-assets", action="store_true",
+                        help="hard link static files into the output instead of copying them")
+    parser.add_argument("--fingerprint-assets", action="store_true",
+                        help="publish static files under content hashed names too, reference those from pages "
+                             "and mark them immutable in a _headers file")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="leave pages whose html is identical untouched so their mtime is kept, "
+                             "write changed pages atomically")
+    parser.add_argument("--dependencies", default=r"./.build/dependencies.json",
+                        help="path to the graph recording the source, template and static files of every page")
+    parser.add_argument("--affected", nargs="+", metavar="PATH", default=None,
+                        help="print the outputs the given changed files affect according to the last build and exit")
+    parser.add_argument("--pipeline", nargs="?", const="", default=None, type=parse_pipeline_options,
+                        metavar="LIMITS",
+                        help="overlap reads, rendering and writes with asyncio, optionally with limits such as "
+                             "readers=8,renderers=1,writers=8,queue_size=16")
+    parser.add_argument("--constant-memory", action="store_true",
+                        help="generate pages one at a time as the content tree is scanned, keeping no per page state")
+    parser.add_argument("--split-pages", nargs="?", const="", default=None, type=parse_split_options,
+                        metavar="LIMITS",
+                        help="parse and render giant pages in chunks across worker processes, optionally with limits "
+                             "such as threshold=64M,workers=0,chunk_bytes=1M,in_flight=8")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes generating pages, 0 uses every cpu")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="pages handed to a worker at a time in a parallel build")
+    parser.add_argument("--watch", action="store_true",
+                        help="after building, serve the site and rebuild whatever changes with live reload")
+    parser.add_argument("--port", type=int, default=8888,
+                        help="port the watch mode server listens on")
+    parser.add_argument("--serve", action="store_true",
+                        help="instead of building, serve the site by rendering pages when they are requested")
+    parser.add_argument("--cache-mb", type=int, default=64,
+                        help="memory budget of the rendered page cache in serve mode, in megabytes")
+    parser.add_argument("--poll", action="store_true",
+                        help="poll for changes in watch mode instead of using inotify")
+    parser.add_argument("--block-cache", nargs="?", const=r"./.build/block_cache.sqlite3", default=None,
+                        help="cache rendered markdown blocks on disk across builds, optionally at this path")
+    parser.add_argument("--search-index", nargs="?", const=r"./.build/search_index.json", default=None,
+                        help="publish a sharded client side search index under public/search, "
+                             "keeping the terms of every page at this path so unchanged pages are not tokenized again")
+    parser.add_argument("--shard", type=parse_shard, default=None, metavar="INDEX/COUNT",
+                        help="build only the pages of this shard of the content tree, picked by a hash of their path, "
+                             "into --shard-dir, which then also holds the manifest, dependency graph and search index "
+                             "state of the shard")
+    parser.add_argument("--shard-dir", default=None,
+                        help="directory of a shard build, defaults to ./shards/INDEX-of-COUNT")
+    parser.add_argument("--merge-shards", nargs="+", metavar="SHARD_DIR", default=None,
+                        help="instead of building, merge the outputs, manifests, dependency graphs and search indexes "
+                             "of every shard directory into public and the usual state paths")
+    parser.add_argument("--precompress", action="store_true",
+                        help="write gzip (and brotli or zstd when installed) variants of text files next to them")
+    parser.add_argument("--precompress-manifest", default=r"./.build/precompress_manifest.json",
+                        help="path to the manifest of precompressed files")
+    parser.add_argument("--report", default=None,
+                        help="instrument the build and write a json timing report to this path")
+    parser.add_argument("--trace", default=None,
+                        help="instrument the build and write a chrome trace event file to this path")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of slowest pages and files listed in the report")
+    args = parser.parse_args()
+    if args.pipeline is not None and (args.block_cache or args.workers != 1):
+        parser.error("--pipeline can not be combined with --block-cache or --workers, "
+                     "it renders with its own renderers limit")
+    if args.constant_memory and (args.incremental or args.watch or args.pipeline is not None or args.workers != 1
+                                 or args.search_index):
+        parser.error("--constant-memory can not be combined with --incremental, --watch, --pipeline, --workers "
+                     "or --search-index")
+    if args.split_pages is not None and (args.pipeline is not None or args.workers != 1):
+        parser.error("--split-pages can not be combined with --pipeline or --workers")
+    if args.shard is not None and (args.constant_memory or args.watch or args.merge_shards):
+        parser.error("--shard can not be combined with --constant-memory, --watch or --merge-shards")
+    if args.merge_shards and args.watch:
+        parser.error("--merge-shards can not be combined with --watch, the shards are built elsewhere")
+    return args
 
 def main():
+    args = parse_args()
     source = r"./static/"
     destination = r"./public/"
     markdown_path = r"./content/"
     template_path = r"./template.html"
     gen_dest_path = r"./public/"
-    
-    copy_static_dir(source, destination) 
-    generate_pages_recursive(markdown_path,template_path,gen_dest_path)
 
-main()
+    if args.affected:
+        dependencies = DependencyGraph.load(args.dependencies, source)
+        for output in sorted(dependencies.affected(args.affected)):
+            print(output)
+        return
+
+    if args.serve:
+        serve(markdown_path, source, template_path, args.port, args.cache_mb * 1024 * 1024)
+        return
+
+    if args.shard is not None:
+        # every shard keeps its own output and state, so shard builds can run side by side
+        shard_dir = args.shard_dir or os.path.join(".", "shards", args.shard.name)
+        paths = shard_paths(shard_dir)
+        destination = gen_dest_path = paths["output"]
+        args.manifest = paths["manifest"]
+        args.static_manifest = paths["static_manifest"]
+        args.dependencies = paths["dependencies"]
+        args.precompress_manifest = paths["precompress_manifest"]
+        if args.search_index:
+            args.search_index = paths["search_index"]
+
+    if args.report or args.trace:
+        tracer.enable(keep_events=args.trace is not None)
+    start = time.perf_counter()
+
+    if args.clean and os.path.exists(destination):
+        shutil.rmtree(destination)
+    if args.merge_shards:
+        with tracer.span("merge"):
+            merge_stats = merge_shards(args.merge_shards, destination, args.manifest, args.dependencies,
+                                       args.search_index or r"./.build/search_index.json")
+        print(f"Merged {len(args.merge_shards)} shards, {merge_stats.pages} pages: copied {merge_stats.copied}, "
+              f"unchanged {merge_stats.unchanged}, removed {merge_stats.removed}")
+        caches = {}
+    else:
+        with tracer.span("static"):
+            sync_stats = sync_static_dir(source, destination, args.static_manifest, args.hash_assets, args.link_assets,
+                                         args.fingerprint_assets)
+        print(f"Synced static files: copied {sync_stats.copied}, unchanged {sync_stats.unchanged}, removed {sync_stats.removed}")
+        if args.fingerprint_assets and write_headers_file(os.path.join(destination, "_headers"), sync_stats.assets):
+            print(f"Wrote headers for {len(sync_stats.assets)} fingerprinted assets")
+        # the merge reads the manifest of a shard, so a shard build always keeps one
+        manifest_path = args.manifest if args.incremental or args.watch or args.shard is not None else None
+        # the dependency graph holds a record for every page, a constant memory build goes without
+        dependencies = None if args.constant_memory else DependencyGraph.load(args.dependencies, source)
+        search_index = SearchIndex.load(args.search_index) if args.search_index else None
+        build_stats = generate_pages_recursive(markdown_path,template_path,gen_dest_path,manifest_path,
+                                               args.workers,args.chunk_size,args.block_cache,sync_stats.assets,
+                                               args.skip_unchanged,dependencies,args.pipeline,args.constant_memory,
+                                               args.split_pages,search_index,args.shard)
+        caches = build_stats.caches
+        if args.shard is not None:
+            write_shard_info(shard_dir, args.shard, search_index is not None)
+    if args.precompress:
+        with tracer.span("precompress"):
+            compress_stats = precompress_dir(destination, args.precompress_manifest)
+        print(f"Precompressed ({', '.join(available_codecs())}): compressed {compress_stats.compressed}, "
+              f"unchanged {compress_stats.unchanged}, skipped {compress_stats.skipped}, removed {compress_stats.removed}")
+
+    if args.report:
+        report = build_report(tracer, time.perf_counter() - start, args.top)
+        report["caches"] = caches
+        write_report(report, args.report)
+        print(f"Wrote build report to {args.report}")
+    if args.trace:
+        write_chrome_trace(tracer, args.trace)
+        print(f"Wrote chrome trace to {args.trace}")
+    tracer.disable()
+    if args.watch:
+        watch(markdown_path, source, template_path, gen_dest_path,
+              args.manifest, args.static_manifest, args.port, args.poll, args.dependencies,
+              args.hash_assets, args.link_assets, args.fingerprint_assets, sync_stats.assets)
+
+if __name__ == "__main__":
+    main()
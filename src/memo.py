@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, Set
+
+# every memo created, by name, so build stats can report all of them
+memos: Dict[str, 'LRUMemo'] = {}
+
+
+class LRUMemo:
+    """bounded least recently used memo of function results.
+    values are stored as given, so callers must only store immutable values (e.g. tuples)
+    and build fresh objects from them on every hit, a hit can then never be corrupted by another.
+
+    a key is only admitted when it misses twice within a window of recent misses, so text that never repeats
+    costs a set lookup instead of building a value and churning the memo.
+    """
+    def __init__(self, name: str, maxsize: int = 4096, max_key_length: int = 512, window: int = 1024) -> None:
+        """
+        Args:
+            name (str): name the memo is reported under
+            maxsize (int, optional): maximum number of entries. Defaults to 4096.
+            max_key_length (int, optional): longer keys are never memoized,
+                long text rarely repeats and would only push out what does. Defaults to 512.
+            window (int, optional): number of recent misses a key must repeat within to be admitted. Defaults to 1024.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.max_key_length = max_key_length
+        self.window = window
+        self.entries: OrderedDict = OrderedDict()
+        self.seen: Set[int] = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        memos[name] = self
+
+    def get(self, key: str):
+        """the memoized value of key, or None on a miss.
+
+        Args:
+            key (str): text the value was computed from
+
+        Returns:
+            the stored immutable value, or None
+        """
+        value = self.entries.get(key)
+        if value is None:
+            if len(key) <= self.max_key_length:
+                self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def admit(self, key: str) -> bool:
+        """whether a missed key should be stored with put, true from its second miss on.
+        keys longer than max_key_length are never admitted.
+        """
+        if len(key) > self.max_key_length:
+            return False
+        # only hashes are remembered, so streaming never repeated text costs little memory
+        seen = self.seen
+        key_hash = hash(key)
+        if key_hash in seen:
+            seen.discard(key_hash)
+            return True
+        if len(seen) >= self.window:
+            seen.clear()
+        seen.add(key_hash)
+        return False
+
+    def put(self, key: str, value: Hashable) -> None:
+        """memoize the immutable value of key, evicting the least recently used entry when full."""
+        entries = self.entries
+        entries[key] = value
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.seen.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def clear_memos() -> None:
+    """empty every memo in this process, their counters are kept."""
+    for memo in memos.values():
+        memo.clear()
+
+def memo_stats() -> Dict[str, Dict[str, int]]:
+    """counters of every memo in this process, by memo name."""
+    return {name: memo.stats() for name, memo in memos.items()}
+
+def stats_delta(before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    """counters gained between two memo_stats snapshots."""
+    delta = {}
+    for name, counters in after.items():
+        previous = before.get(name, {})
+        delta[name] = {counter: value - previous.get(counter, 0) for counter, value in counters.items()}
+    return delta
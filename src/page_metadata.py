@@ -0,0 +1,243 @@
+import re
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Union
+from htmlnode import HTMLNode, LeafNode, ParentNode
+from inline_markdown import tokenize_inline
+from textnode import text_type_image
+
+if TYPE_CHECKING:
+    from template_engine import Template
+
+# a whitespace separated token counts as a word when it holds at least one letter or digit,
+# so list markers, heading hashes and code fences are not counted
+word_regex = re.compile(r"\S*[^\W_]\S*")
+front_matter_line_regex = re.compile(r"^(\w+)\s*:\s*(.*)$")
+slug_strip_regex = re.compile(r"[^\w\s-]")
+slug_space_regex = re.compile(r"\s+")
+
+
+class Heading:
+    """one entry of a page's heading outline."""
+    __slots__ = ("level", "text", "slug")
+
+    def __init__(self, level: int, text: str, slug: str) -> None:
+        """
+        Args:
+            level (int): 1 for an h1 up to 6 for an h6
+            text (str): the heading text without inline markdown
+            slug (str): id of the heading, unique within the page
+        """
+        self.level = level
+        self.text = text
+        self.slug = slug
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Heading):
+            return False
+        return (self.level, self.text, self.slug) == (other.level, other.text, other.slug)
+
+    def __repr__(self) -> str:
+        return f"Heading({self.level}, {self.text}, {self.slug})"
+
+
+class PageMetadata:
+    """what the block parser learns about a page while converting it to html:
+    the title, front matter fields, the heading outline and the word count.
+    filled in block by block by blocks_to_html_nodes, so nothing has to scan the document again.
+    """
+    def __init__(self, toc: bool = False, word_count: bool = False) -> None:
+        """
+        Args:
+            toc (bool, optional): give headings an id attribute with their slug and offer a Toc value,
+                so a table of contents can link to them. Defaults to False.
+            word_count (bool, optional): count the words of the page. Defaults to False.
+        """
+        self.toc = toc
+        self.count_words = word_count
+        self.title: Optional[str] = None
+        self.front_matter: Dict[str, Union[str, List[str]]] = {}
+        self.headings: List[Heading] = []
+        self.word_count = 0
+        # how often each slug was handed out, repeated headings get -1, -2, ... appended
+        self._slugs: Dict[str, int] = {}
+
+    @classmethod
+    def for_template(cls, template: 'Template') -> 'PageMetadata':
+        """metadata collecting only what the template has placeholders for."""
+        return cls(toc="Toc" in template.placeholders, word_count="WordCount" in template.placeholders)
+
+    def add_block(self, block: str, block_type: str = None, node: HTMLNode = None) -> Optional[str]:
+        """take in the next block of the page.
+
+        Args:
+            block (str): a block of markdown, as produced by iter_blocks
+            block_type (str, optional): the block's type when it is already known. Defaults to None.
+            node (HTMLNode, optional): the block's html node when it was already built,
+                saves parsing a heading's inline markdown again. Defaults to None.
+
+        Returns:
+            Optional[str]: the id the block's html node should carry, None for no id
+        """
+        if self.title is None and "# " in block:
+            # the first line starting with "# ", like extract_title
+            for line in block.split("\n"):
+                line = line.strip()
+                if line.startswith("# "):
+                    self.title = line[2:]
+                    break
+        if self.count_words:
+            self.word_count += len(word_regex.findall(block))
+        if block_type != "heading" and (block_type is not None or not block.startswith("#")):
+            return None
+        level = len(block) - len(block.lstrip("#"))
+        if not 1 <= level <= 6 or block[level:level + 1] != " ":
+            return None
+        if node is not None:
+            # images are leaves without text, so this is the text of the inline markdown
+            text = "".join([child.value for child in node.children])
+        else:
+            text = "".join([child.text for child in tokenize_inline(block[level + 1:]) if child.text_type != text_type_image])
+        slug = self._unique_slug(slugify(text))
+        self.headings.append(Heading(level, text, slug))
+        return slug if self.toc else None
+
+    def _unique_slug(self, slug: str) -> str:
+        count = self._slugs.get(slug)
+        if count is None:
+            self._slugs[slug] = 0
+            return slug
+        candidate = slug
+        while candidate in self._slugs:
+            count += 1
+            candidate = f"{slug}-{count}"
+        self._slugs[slug] = count
+        self._slugs[candidate] = 0
+        return candidate
+
+    def page_title(self) -> str:
+        """the title field of the front matter, otherwise the first h1 header.
+
+        Raises:
+            ValueError: the page has neither.
+
+        Returns:
+            str: the page title
+        """
+        title = self.front_matter.get("title")
+        if isinstance(title, str):
+            return title
+        if self.title is None:
+            raise ValueError("Error: No title header found.")
+        return self.title
+
+    def toc_node(self, min_level: int = 2, max_level: int = 6) -> Optional[HTMLNode]:
+        """a table of contents linking to the page's headings, as nested lists.
+
+        Args:
+            min_level (int, optional): smallest heading level listed, the h1 is normally the title. Defaults to 2.
+            max_level (int, optional): largest heading level listed. Defaults to 6.
+
+        Returns:
+            Optional[HTMLNode]: a <nav class="toc"> node, or None when no heading is listed
+        """
+        entries = [heading for heading in self.headings if min_level <= heading.level <= max_level]
+        if not entries:
+            return None
+        items: List[HTMLNode] = []
+        # the open lists, each with the level of the headings it holds
+        stack = [(entries[0].level, items)]
+        for heading in entries:
+            while heading.level < stack[-1][0] and len(stack) > 1:
+                stack.pop()
+            level, current = stack[-1]
+            if heading.level > level and current:
+                nested: List[HTMLNode] = []
+                current[-1].children.append(ParentNode("ul", nested))
+                stack.append((heading.level, nested))
+                current = nested
+            current.append(ParentNode("li", [LeafNode("a", heading.text, {"href": f"#{heading.slug}"})]))
+        return ParentNode("nav", [ParentNode("ul", items)], {"class": "toc"})
+
+    def template_values(self) -> Dict[str, Union[str, HTMLNode]]:
+        """placeholder values for the page template: every front matter field under its own name,
+        Title, and Toc and WordCount when they were asked for.
+
+        Raises:
+            ValueError: the page has no title.
+        """
+        values: Dict[str, Union[str, HTMLNode]] = {
+            key: ", ".join(value) if isinstance(value, list) else value for key, value in self.front_matter.items()
+        }
+        values["Title"] = self.page_title()
+        if self.toc:
+            values["Toc"] = self.toc_node() or ""
+        if self.count_words:
+            values["WordCount"] = str(self.word_count)
+        return values
+
+    def __repr__(self) -> str:
+        return (f"PageMetadata(title: {self.title}, front_matter: {self.front_matter}, "
+                f"headings: {self.headings}, word_count: {self.word_count})")
+
+
+def slugify(text: str) -> str:
+    """an id for a heading: lowercase, punctuation removed and whitespace replaced by hyphens.
+
+    Args:
+        text (str): heading text
+
+    Returns:
+        str: e.g. "getting-started" for "Getting Started!", "section" when nothing is left
+    """
+    slug = slug_space_regex.sub("-", slug_strip_regex.sub("", text.lower()).strip())
+    return slug or "section"
+
+def parse_front_matter(block: str) -> Optional[Dict[str, Union[str, List[str]]]]:
+    """read a YAML-style front matter block: "key: value" lines between two "---" lines.
+    values may be quoted, and lists are written as [a, b] or as "- item" lines under a key without a value.
+    the block can not hold blank lines, as those end a block.
+
+    Args:
+        block (str): the first block of a document
+
+    Returns:
+        Optional[Dict[str, Union[str, List[str]]]]: the fields, or None when the block is not front matter
+    """
+    if not block.startswith("---\n") or not block.endswith("\n---"):
+        return None
+    fields: Dict[str, Union[str, List[str]]] = {}
+    key = None
+    for line in block.split("\n")[1:-1]:
+        line = line.strip()
+        if line.startswith("#"):
+            continue
+        if line.startswith("- ") and key is not None and isinstance(fields[key], list):
+            fields[key].append(_unquote(line[2:].strip()))
+            continue
+        match = front_matter_line_regex.match(line)
+        if match is None:
+            return None
+        key, value = match.group(1), match.group(2).strip()
+        if value == "":
+            fields[key] = []
+        elif value.startswith("[") and value.endswith("]"):
+            fields[key] = [_unquote(item.strip()) for item in value[1:-1].split(",") if item.strip()]
+        else:
+            fields[key] = _unquote(value)
+    return fields or None
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+def without_front_matter(blocks: Iterable[str], metadata: PageMetadata = None) -> Iterator[str]:
+    """the blocks of a document without its front matter, which is stored in metadata when given."""
+    blocks = iter(blocks)
+    for block in blocks:
+        front_matter = parse_front_matter(block)
+        if front_matter is None:
+            yield block
+        elif metadata is not None:
+            metadata.front_matter = front_matter
+        break
+    yield from blocks
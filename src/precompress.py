@@ -0,0 +1,179 @@
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from build_manifest import hash_bytes
+from file_system_utilities import scan_files, load_file_manifest, save_file_manifest
+
+try:
+    import brotli
+except ImportError:  # optional, pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, pip install zstandard
+    zstandard = None
+
+# text formats worth compressing, images and fonts are already compressed
+compressible_extensions = (".html", ".htm", ".css", ".js", ".mjs", ".json", ".svg", ".txt", ".xml", ".map")
+# smaller files fit in a single packet either way
+MIN_SIZE = 1024
+# variants that do not shrink the file below this fraction of its size are not worth serving
+MAX_RATIO = 0.9
+
+
+def gzip_compress(data: bytes) -> bytes:
+    """gzip data at the maximum level. the header carries no timestamp, so equal input gives equal output."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31, 9)
+    return compressor.compress(data) + compressor.flush()
+
+def brotli_compress(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+def zstd_compress(data: bytes) -> bytes:
+    # compressor objects are not thread safe, make one per call
+    return zstandard.ZstdCompressor(level=19).compress(data)
+
+def available_codecs() -> Dict[str, Callable[[bytes], bytes]]:
+    """variant extension to compress function, for every codec that can be imported.
+
+    Returns:
+        Dict[str, Callable[[bytes], bytes]]: always holds ".gz", plus ".br" and ".zst" when installed
+    """
+    codecs = {".gz": gzip_compress}
+    if brotli is not None:
+        codecs[".br"] = brotli_compress
+    if zstandard is not None:
+        codecs[".zst"] = zstd_compress
+    return codecs
+
+class PrecompressStats:
+    """counts of what precompression did with each compressible file."""
+    def __init__(self) -> None:
+        self.compressed = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.removed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __repr__(self) -> str:
+        return (f"PrecompressStats(compressed: {self.compressed}, unchanged: {self.unchanged}, "
+                f"skipped: {self.skipped}, removed: {self.removed})")
+
+def precompress_dir(root: str, manifest_path: str, workers: int = None, min_size: int = MIN_SIZE,
+                    max_ratio: float = MAX_RATIO, codecs: Dict[str, Callable[[bytes], bytes]] = None) -> PrecompressStats:
+    """write precompressed siblings (e.g. index.html.gz) of the text files under root,
+    for servers that send a .gz or .br file in place of the original.
+
+    every compressed file is recorded in a manifest with its size, mtime, content hash
+    and the variants written, so only files whose content changed are compressed again.
+    variants of files that were removed, shrank below min_size or stopped compressing well are deleted.
+
+    Args:
+        root (str): output directory, e.g. public/
+        manifest_path (str): path to the json manifest of compressed files
+        workers (int, optional): compression threads, zlib releases the GIL. Defaults to the cpu count.
+        min_size (int, optional): files smaller than this many bytes are not compressed. Defaults to MIN_SIZE.
+        max_ratio (float, optional): a variant is only kept when it is at most this fraction of the original size.
+            Defaults to MAX_RATIO.
+        codecs (Dict[str, Callable[[bytes], bytes]], optional): variant extension to compress function.
+            Defaults to available_codecs().
+
+    Returns:
+        PrecompressStats: how many files were compressed, unchanged, skipped and had their variants removed
+    """
+    codecs = codecs or available_codecs()
+    stats = PrecompressStats()
+    old_files = load_file_manifest(manifest_path)
+    new_files = {}
+    todo = []
+    for rel_path, stat in scan_files(root, ''):
+        if not rel_path.endswith(compressible_extensions):
+            continue
+        record = old_files.get(rel_path)
+        if stat.st_size < min_size:
+            stats.skipped += 1
+            continue
+        path = os.path.join(root, rel_path)
+        if (
+            record is not None
+            and record[0] == stat.st_size
+            and record[1] == stat.st_mtime_ns
+            and _variants_current(path, record, codecs)
+        ):
+            new_files[rel_path] = record
+            stats.unchanged += 1
+            continue
+        todo.append((path, stat, record))
+
+    def compress(job: Tuple[str, os.stat_result, List]) -> Tuple[List, int]:
+        return _compress_file(job[0], job[1], job[2], codecs, max_ratio)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        for (path, stat, _), (record, written) in zip(todo, executor.map(compress, todo)):
+            new_files[os.path.relpath(path, root)] = record
+            if written is None:
+                stats.unchanged += 1
+                continue
+            stats.compressed += 1
+            stats.bytes_in += stat.st_size
+            stats.bytes_out += written
+
+    for rel_path, record in old_files.items():
+        if rel_path in new_files:
+            continue
+        if _remove_variants(os.path.join(root, rel_path), record[3]):
+            stats.removed += 1
+
+    save_file_manifest(manifest_path, new_files)
+    return stats
+
+def _variants_current(path: str, record: List, codecs: Dict[str, Callable[[bytes], bytes]]) -> bool:
+    """whether a manifest record covers exactly these codecs and every variant it wrote still exists."""
+    variants = record[3]
+    if set(variants) != set(codecs):
+        return False
+    return all(os.path.exists(path + extension) for extension, written in variants.items() if written)
+
+def _compress_file(path: str, stat: os.stat_result, record: List, codecs: Dict[str, Callable[[bytes], bytes]],
+                   max_ratio: float) -> Tuple[List, int]:
+    """compress a single file with every codec, keeping only the variants that compress well.
+
+    Returns:
+        Tuple[List, int]: (manifest record, bytes of variants written or None when the content was unchanged)
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    content_hash = hash_bytes(data)
+    if record is not None and record[2] == content_hash and _variants_current(path, record, codecs):
+        # rewritten with the same content, only the mtime changed
+        return [stat.st_size, stat.st_mtime_ns, content_hash, record[3]], None
+    variants = {}
+    written = 0
+    for extension, compress_function in codecs.items():
+        variant_path = path + extension
+        compressed = compress_function(data)
+        if len(compressed) > len(data) * max_ratio:
+            variants[extension] = False
+            if os.path.exists(variant_path):
+                os.remove(variant_path)
+            continue
+        tmp_path = f"{variant_path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(compressed)
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, variant_path)
+        variants[extension] = True
+        written += len(compressed)
+    return [stat.st_size, stat.st_mtime_ns, content_hash, variants], written
+
+def _remove_variants(path: str, variants: Dict[str, bool]) -> bool:
+    removed = False
+    for extension, written in variants.items():
+        if written and os.path.exists(path + extension):
+            os.remove(path + extension)
+            removed = True
+    return removed
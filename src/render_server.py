@@ -0,0 +1,258 @@
+import os
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import unquote
+
+from build_manifest import hash_bytes
+from site_gen import page_values
+from template_engine import load_template
+
+# default memory budget of the rendered page cache
+CACHE_BYTES = 64 * 1024 * 1024
+
+
+class CachedPage:
+    """a rendered page along with what it was rendered from."""
+    __slots__ = ("source_stat", "template_stat", "source_hash", "body", "etag")
+
+    def __init__(self, source_stat: Tuple[int, int], template_stat: Tuple[int, int], source_hash: str, body: bytes) -> None:
+        self.source_stat = source_stat
+        self.template_stat = template_stat
+        self.source_hash = source_hash
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+class PageCache:
+    """least recently used cache of rendered pages, bounded by the total size of their html."""
+    def __init__(self, max_bytes: int = CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CachedPage]:
+        with self.lock:
+            page = self.entries.get(key)
+            if page is not None:
+                self.entries.move_to_end(key)
+            return page
+
+    def put(self, key: str, page: CachedPage) -> None:
+        """store a page, evicting the least recently used pages until the cache fits in max_bytes.
+        a page larger than the whole budget is not stored.
+        """
+        if len(page.body) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.body)
+            self.entries[key] = page
+            self.size += len(page.body)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.body)
+                self.evictions += 1
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def stat_key(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def render_page(markdown: str, template_path: str) -> bytes:
+    """render markdown into the template exactly like generate_page writes it."""
+    template = load_template(template_path)
+    return template.render(page_values(markdown, template)).encode()
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """whether an If-None-Match header matches etag."""
+    if header is None:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class RenderServer(ThreadingHTTPServer):
+    """serve a site straight from its sources without building it.
+    a request for an html page renders the matching markdown file on first request
+    and keeps the result in a memory bounded LRU cache.
+    a cached page is reused while the source and template stat the same,
+    or when a changed mtime turns out to hold the same content.
+    everything else is served from the static directory.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], content_dir: str, static_dir: str, template_path: str,
+                 max_bytes: int = CACHE_BYTES) -> None:
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.cache = PageCache(max_bytes)
+        # the inline parsing memos are module globals and not thread safe, so pages are rendered one at a time
+        self.render_lock = threading.Lock()
+        super().__init__(address, RenderHandler)
+
+    def page(self, source_path: str) -> CachedPage:
+        """the rendered page of a markdown file, from the cache when it is still current.
+        called from every request thread, the counters are only changed under the cache lock.
+        """
+        cache = self.cache
+        source_stat = stat_key(source_path)
+        template_stat = stat_key(self.template_path)
+        page = cache.get(source_path)
+        if page is not None and page.source_stat == source_stat and page.template_stat == template_stat:
+            with cache.lock:
+                cache.hits += 1
+            return page
+        with open(source_path, 'rb') as file:
+            data = file.read()
+        source_hash = hash_bytes(data)
+        if page is not None and page.source_hash == source_hash and page.template_stat == template_stat:
+            # touched but unchanged, only the mtime moved
+            with cache.lock:
+                page.source_stat = source_stat
+                cache.hits += 1
+            return page
+        with cache.lock:
+            cache.misses += 1
+        # the same universal newlines generate_page reads the source with, so a crlf file is served as it is built
+        markdown = data.decode().replace("\r\n", "\n").replace("\r", "\n")
+        with self.render_lock:
+            body = render_page(markdown, self.template_path)
+        page = CachedPage(source_stat, template_stat, source_hash, body)
+        cache.put(source_path, page)
+        return page
+
+    def resolve(self, request_path: str) -> Tuple[str, Optional[str]]:
+        """map a request path to what answers it.
+
+        Args:
+            request_path (str): path of the request, with any query string
+
+        Returns:
+            Tuple[str, Optional[str]]: ("page", markdown path), ("static", file path),
+                ("redirect", location) or ("missing", None)
+        """
+        path = unquote(request_path.split('?', 1)[0].split('#', 1)[0])
+        parts = [part for part in path.split('/') if part not in ('', '.')]
+        if '..' in parts:
+            return "missing", None
+        if path.endswith('/') or not parts:
+            parts.append("index.html")
+        rel_path = os.path.join(*parts)
+        if rel_path.endswith(".html"):
+            source_path = os.path.join(self.content_dir, rel_path[:-len(".html")] + ".md")
+            if os.path.isfile(source_path):
+                return "page", source_path
+        static_path = os.path.join(self.static_dir, rel_path)
+        if os.path.isfile(static_path):
+            return "static", static_path
+        if os.path.isfile(os.path.join(self.content_dir, rel_path, "index.md")):
+            return "redirect", path + "/"
+        return "missing", None
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, without this every keep-alive response waits on a delayed ack
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body: bool) -> None:
+        kind, path = self.server.resolve(self.path)
+        if kind == "page":
+            try:
+                page = self.server.page(path)
+            except (OSError, ValueError) as error:
+                self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, str(error))
+                return
+            self.send_body(page.body, page.etag, "text/html; charset=utf-8", send_body)
+        elif kind == "static":
+            self.send_static(path, send_body)
+        elif kind == "redirect":
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", path)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self.send_error(HTTPStatus.NOT_FOUND)
+
+    def send_not_modified(self, etag: str) -> None:
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_header("ETag", etag)
+        self.end_headers()
+
+    def send_body(self, body: bytes, etag: str, content_type: str, send_body: bool) -> None:
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_not_modified(etag)
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_static(self, path: str, send_body: bool) -> None:
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if etag_matches(self.headers.get("If-None-Match"), etag):
+                self.send_not_modified(etag)
+                return
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(stat.st_size))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            if send_body:
+                # the kernel copies the file straight to the socket
+                self.connection.sendfile(file)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(content_dir: str, static_dir: str, template_path: str, port: int = 8888, max_bytes: int = CACHE_BYTES) -> None:
+    """serve the site by rendering pages on request, nothing is written to disk. runs until interrupted.
+
+    Args:
+        content_dir (str): directory with markdown content
+        static_dir (str): directory with static assets
+        template_path (str): path to the template html file
+        port (int, optional): port to serve on. Defaults to 8888.
+        max_bytes (int, optional): memory budget of the rendered page cache. Defaults to CACHE_BYTES.
+    """
+    server = RenderServer(("", port), content_dir, static_dir, template_path, max_bytes)
+    print(f"Rendering {content_dir} on demand at http://localhost:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Page cache: {', '.join(f'{name} {value}' for name, value in server.cache.stats().items())}")
@@ -0,0 +1,312 @@
+import os
+import re
+import json
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from block_markdown import blocks_to_html_nodes, iter_file_blocks
+from file_system_utilities import write_file
+from htmlnode import HTMLNode, RenderedNode
+from page_metadata import PageMetadata
+
+INDEX_FORMAT = 1
+# directory under the output directory the published index is written to
+SEARCH_DIR = "search"
+# shards hold the terms sharing their first PREFIX_LENGTH characters
+PREFIX_LENGTH = 2
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 32
+
+term_regex = re.compile(r"[^\W_]+")
+
+
+def text_terms(text: str) -> Set[str]:
+    """the lowercase words of a text that are worth indexing."""
+    return {term for term in term_regex.findall(text.lower()) if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH}
+
+def page_terms(node: HTMLNode, terms: Set[str] = None) -> Set[str]:
+    """the terms of the text in an html node tree, as built from markdown, without tags or urls.
+
+    Args:
+        node (HTMLNode): a rendered page's content node, its children must be a list
+        terms (Set[str], optional): set the terms are added to. Defaults to a new set.
+
+    Returns:
+        Set[str]: the terms
+    """
+    if terms is None:
+        terms = set()
+    if isinstance(node, RenderedNode):
+        # rendered ahead of time, its html would index tags and urls
+        if node.text:
+            terms |= text_terms(node.text)
+        return terms
+    if node.children is None:
+        if node.value:
+            terms |= text_terms(node.value)
+        return terms
+    for child in node.children:
+        page_terms(child, terms)
+    return terms
+
+def index_page(path: str) -> Tuple[str, Set[str]]:
+    """the title and terms of a markdown file that was not indexed while it was rendered.
+    reads the file one block at a time, so streamed pages are indexed in bounded memory too.
+
+    Raises:
+        ValueError: the file has no title.
+    """
+    metadata = PageMetadata()
+    terms: Set[str] = set()
+    for node in blocks_to_html_nodes(iter_file_blocks(path), metadata):
+        page_terms(node, terms)
+    return metadata.page_title(), terms
+
+def collect_page_terms(from_path: str, title: str, content: HTMLNode) -> None:
+    """hand the title and content node of a page rendered in this process to the collector, if one is in use."""
+    if search_terms is not None:
+        search_terms[from_path] = (title, page_terms(content))
+
+def lazy_page_terms(content: HTMLNode) -> Optional[Set[str]]:
+    """when a collector is in use, have the lazily produced children of a content node add their terms
+    to the returned set while the page is written, hand it to add_page_terms afterwards. None otherwise.
+    """
+    if search_terms is None:
+        return None
+    terms: Set[str] = set()
+    content.children = _with_terms(content.children, terms)
+    return terms
+
+def _with_terms(nodes: Iterable[HTMLNode], terms: Set[str]) -> Iterable[HTMLNode]:
+    for node in nodes:
+        page_terms(node, terms)
+        yield node
+
+def add_page_terms(from_path: str, title: str, terms: Optional[Set[str]]) -> None:
+    """hand the title and terms of a page rendered in this process to the collector, if one is in use."""
+    if search_terms is not None and terms is not None:
+        search_terms[from_path] = (title, terms)
+
+def take_page_terms(from_path: str) -> Optional[Tuple[str, Set[str]]]:
+    """remove and return the title and terms collected for a page, for a worker to send them to its parent.
+    None when no collector is in use or the page was not collected.
+    """
+    if search_terms is None:
+        return None
+    return search_terms.pop(from_path, None)
+
+def collecting_terms() -> bool:
+    """whether generate_page hands the terms of the pages it renders to a collector."""
+    return search_terms is not None
+
+def use_search_terms(collector: Optional[Dict[str, Tuple[str, Set[str]]]]) -> None:
+    """have generate_page add the title and terms of every page it renders in this process to collector,
+    keyed by source path, taken from the node tree the page was rendered from. None stops collecting.
+    """
+    global search_terms
+    search_terms = collector
+
+search_terms: Optional[Dict[str, Tuple[str, Set[str]]]] = None
+
+def page_url(dest_path: str, dest_dir_path: str) -> str:
+    """the url a generated page is served at, index.html pages at their directory."""
+    rel_path = os.path.relpath(dest_path, dest_dir_path).replace(os.sep, "/")
+    if rel_path == "index.html":
+        return "/"
+    if rel_path.endswith("/index.html"):
+        return "/" + rel_path[:-len("index.html")]
+    return "/" + rel_path
+
+def shard_name(prefix: str) -> str:
+    """file name of the shard holding terms starting with prefix, non ascii prefixes are hex encoded."""
+    if prefix.isascii() and prefix.isalnum():
+        return f"terms-{prefix}.json"
+    return f"terms-x{prefix.encode().hex()}.json"
+
+def delta_encode(ids: List[int]) -> List[int]:
+    """sorted page ids as the first id followed by the gaps between consecutive ids."""
+    return [ids[0]] + [ids[x] - ids[x - 1] for x in range(1, len(ids))] if ids else []
+
+def delta_decode(gaps: List[int]) -> List[int]:
+    ids = []
+    total = 0
+    for gap in gaps:
+        total += gap
+        ids.append(total)
+    return ids
+
+
+class SearchIndex:
+    """inverted index of the site's pages for client side search, built incrementally with the pages.
+    the terms of every page are kept in a state file with the source hash they were taken from,
+    so unchanged pages are never tokenized again. the published index is written to a directory:
+    index.json lists the shards, pages.json holds the [url, title] of every page id (null for free ids),
+    and each shard maps the terms sharing a prefix to delta encoded page ids.
+    page ids are kept across builds, so a changed page only rewrites the shards of the terms it gained or lost.
+    """
+    def __init__(self, path: str = None, prefix_length: int = PREFIX_LENGTH) -> None:
+        """
+        Args:
+            path (str, optional): where the state is saved. Defaults to None, not saved.
+            prefix_length (int, optional): characters of a term that pick its shard. Defaults to PREFIX_LENGTH.
+        """
+        self.path = path
+        self.prefix_length = prefix_length
+        # source path to {"id", "hash", "url", "title", "terms"}
+        self.pages: Dict[str, Dict] = {}
+        self._free_ids: List[int] = []
+        self._next_id = 0
+        # shard prefixes whose postings changed since the last write, and whether pages.json did
+        self._dirty: Set[str] = set()
+        self._pages_dirty = False
+        # set when the state did not match the published index, everything is rewritten
+        self._rewrite = True
+
+    @classmethod
+    def load(cls, path: str, prefix_length: int = PREFIX_LENGTH) -> 'SearchIndex':
+        """load the index state at path, an index that can not be read or used a different format starts empty."""
+        index = cls(path, prefix_length)
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return index
+        if data.get("format") != INDEX_FORMAT or data.get("prefix_length") != prefix_length:
+            return index
+        index.pages = data.get("pages", {})
+        used = {page["id"] for page in index.pages.values()}
+        index._next_id = max(used, default=-1) + 1
+        index._free_ids = [page_id for page_id in range(index._next_id) if page_id not in used]
+        index._rewrite = False
+        return index
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        data = {"format": INDEX_FORMAT, "prefix_length": self.prefix_length, "pages": self.pages}
+        write_file(json.dumps(data, separators=(",", ":")), self.path)
+
+    def page_unchanged(self, source: str, source_hash: str) -> bool:
+        page = self.pages.get(source)
+        return page is not None and page["hash"] == source_hash
+
+    def update(self, source: str, source_hash: str, url: str, title: str, terms: Iterable[str]) -> None:
+        """record the current url, title and terms of a page."""
+        terms = sorted(terms)
+        page = self.pages.get(source)
+        if page is None:
+            page_id = heapq.heappop(self._free_ids) if self._free_ids else self._allocate_id()
+            self.pages[source] = {"id": page_id, "hash": source_hash, "url": url, "title": title, "terms": terms}
+            self._touch(terms)
+            self._pages_dirty = True
+            return
+        if page["terms"] != terms:
+            self._touch(set(page["terms"]).symmetric_difference(terms))
+            page["terms"] = terms
+        if page["url"] != url or page["title"] != title:
+            page["url"] = url
+            page["title"] = title
+            self._pages_dirty = True
+        page["hash"] = source_hash
+
+    def _allocate_id(self) -> int:
+        self._next_id += 1
+        return self._next_id - 1
+
+    def _touch(self, terms: Iterable[str]) -> None:
+        self._dirty.update(term[:self.prefix_length] for term in terms)
+
+    def remove(self, source: str) -> None:
+        page = self.pages.pop(source, None)
+        if page is not None:
+            self._touch(page["terms"])
+            heapq.heappush(self._free_ids, page["id"])
+            self._pages_dirty = True
+
+    def prune(self, sources: Iterable[str]) -> None:
+        """forget every page whose source is not among sources."""
+        keep = set(sources)
+        for source in [source for source in self.pages if source not in keep]:
+            self.remove(source)
+
+    def postings(self, prefixes: Set[str] = None) -> Dict[str, List[int]]:
+        """sorted page ids of every term, only of the terms starting with one of prefixes when given."""
+        postings: Dict[str, List[int]] = {}
+        for page in self.pages.values():
+            for term in page["terms"]:
+                if prefixes is None or term[:self.prefix_length] in prefixes:
+                    postings.setdefault(term, []).append(page["id"])
+        for ids in postings.values():
+            ids.sort()
+        return postings
+
+    def write(self, directory: str) -> int:
+        """publish the index into directory, rewriting only the shards and files that changed.
+
+        Args:
+            directory (str): output directory of the index, e.g. public/search
+
+        Returns:
+            int: number of shards written
+        """
+        listing = os.path.join(directory, "index.json")
+        rewrite = self._rewrite or not os.path.isfile(listing)
+        prefixes = None if rewrite else self._dirty
+        shards: Dict[str, Dict[str, List[int]]] = {}
+        for term, ids in self.postings(prefixes).items():
+            shards.setdefault(term[:self.prefix_length], {})[term] = delta_encode(ids)
+        all_prefixes = {term[:self.prefix_length] for page in self.pages.values() for term in page["terms"]}
+        os.makedirs(directory, exist_ok=True)
+        written = 0
+        for prefix in (all_prefixes if rewrite else self._dirty & all_prefixes):
+            shard = shards.get(prefix, {})
+            write_file(json.dumps(dict(sorted(shard.items())), separators=(",", ":")),
+                       os.path.join(directory, shard_name(prefix)), skip_unchanged=True)
+            written += 1
+        expected = {shard_name(prefix) for prefix in all_prefixes}
+        for entry in os.listdir(directory):
+            if entry.startswith("terms-") and entry.endswith(".json") and entry not in expected:
+                os.remove(os.path.join(directory, entry))
+        if rewrite or self._pages_dirty:
+            pages: List[Optional[List[str]]] = [None] * self._next_id
+            for page in self.pages.values():
+                pages[page["id"]] = [page["url"], page["title"]]
+            write_file(json.dumps(pages, separators=(",", ":")), os.path.join(directory, "pages.json"),
+                       skip_unchanged=True)
+        write_file(json.dumps({"format": INDEX_FORMAT, "prefix_length": self.prefix_length, "pages": "pages.json",
+                               "shards": {prefix: shard_name(prefix) for prefix in sorted(all_prefixes)}},
+                              separators=(",", ":")), listing, skip_unchanged=True)
+        self._dirty = set()
+        self._pages_dirty = False
+        self._rewrite = False
+        return written
+
+    def __repr__(self) -> str:
+        return f"SearchIndex({self.path}, pages: {len(self.pages)}, prefix_length: {self.prefix_length})"
+
+
+def search(directory: str, query: str) -> List[Tuple[str, str]]:
+    """look a query up in a published index like a browser would, pages holding every term of the query.
+
+    Args:
+        directory (str): output directory of the index
+        query (str): words to search for
+
+    Returns:
+        List[Tuple[str, str]]: (url, title) of the matching pages, in page id order
+    """
+    with open(os.path.join(directory, "index.json")) as file:
+        listing = json.load(file)
+    matches = None
+    for term in text_terms(query):
+        name = listing["shards"].get(term[:listing["prefix_length"]])
+        ids = set()
+        if name is not None:
+            with open(os.path.join(directory, name)) as file:
+                ids = set(delta_decode(json.load(file).get(term, [])))
+        matches = ids if matches is None else matches & ids
+    if not matches:
+        return []
+    with open(os.path.join(directory, listing["pages"])) as file:
+        pages = json.load(file)
+    return [tuple(pages[page_id]) for page_id in sorted(matches)]
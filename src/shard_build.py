@@ -0,0 +1,270 @@
+import os
+import json
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from build_manifest import BuildManifest, hash_file
+from dependency_graph import DependencyGraph, dependency_key
+from file_system_utilities import copy_file_fast, ensure_dir, scan_files, write_file
+from search_index import SEARCH_DIR, SearchIndex
+
+SHARD_FORMAT = 1
+# a shard directory holds the shard's output and, under STATE_DIR, its manifest, graph, index state and SHARD_INFO
+OUTPUT_DIR = "public"
+STATE_DIR = ".build"
+SHARD_INFO = "shard.json"
+MANIFEST = "manifest.json"
+DEPENDENCIES = "dependencies.json"
+SEARCH_STATE = "search_index.json"
+STATIC_MANIFEST = "static_manifest.json"
+PRECOMPRESS_MANIFEST = "precompress_manifest.json"
+
+
+class ShardSpec:
+    """one of count shards of a content tree, the pages it holds are picked by shard_of."""
+    def __init__(self, index: int, count: int) -> None:
+        """
+        Args:
+            index (int): this shard, from 0 to count - 1
+            count (int): number of shards the content tree is split into
+        """
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Shard {index} of {count} does not exist, expected 0 <= index < count")
+        self.index = index
+        self.count = count
+
+    @property
+    def name(self) -> str:
+        """e.g. 2-of-8, the default directory name of the shard."""
+        return f"{self.index}-of-{self.count}"
+
+    def owns(self, rel_path: str) -> bool:
+        return shard_of(rel_path, self.count) == self.index
+
+    def __repr__(self) -> str:
+        return f"ShardSpec({self.index}, {self.count})"
+
+
+def shard_of(rel_path: str, count: int) -> int:
+    """the shard a page belongs to, from a sha256 of its path under the content directory.
+    the path is hashed with / separators, so every machine and platform puts a page in the same shard,
+    and adding or removing a page never moves another one.
+
+    Args:
+        rel_path (str): markdown source path relative to the content directory
+        count (int): number of shards
+
+    Returns:
+        int: the shard index, from 0 to count - 1
+    """
+    digest = hashlib.sha256(rel_path.replace(os.sep, "/").encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+def parse_shard(text: str) -> ShardSpec:
+    """parse a shard written as INDEX/COUNT, e.g. 0/4 for the first of four shards.
+
+    Raises:
+        ValueError: not two integers separated by a slash, or no such shard
+    """
+    index, separator, count = text.partition("/")
+    if not separator:
+        raise ValueError(f"Invalid shard {text}, expected INDEX/COUNT")
+    return ShardSpec(int(index), int(count))
+
+def shard_pages(pages: Iterable[Tuple[str, str]], dir_path_content: str, shard: ShardSpec) -> Iterator[Tuple[str, str]]:
+    """pass on the (markdown source path, html destination path) pairs of the pages the shard owns."""
+    for from_path, dest_path in pages:
+        if shard.owns(os.path.relpath(from_path, dir_path_content)):
+            yield from_path, dest_path
+
+
+def shard_paths(shard_dir: str) -> Dict[str, str]:
+    """where a shard build writes its output and keeps its state, see the constants above.
+
+    Returns:
+        Dict[str, str]: paths under keys output, info, manifest, dependencies, search_index, static_manifest
+            and precompress_manifest
+    """
+    state = os.path.join(shard_dir, STATE_DIR)
+    return {
+        "output": os.path.join(shard_dir, OUTPUT_DIR),
+        "info": os.path.join(state, SHARD_INFO),
+        "manifest": os.path.join(state, MANIFEST),
+        "dependencies": os.path.join(state, DEPENDENCIES),
+        "search_index": os.path.join(state, SEARCH_STATE),
+        "static_manifest": os.path.join(state, STATIC_MANIFEST),
+        "precompress_manifest": os.path.join(state, PRECOMPRESS_MANIFEST),
+    }
+
+def write_shard_info(shard_dir: str, shard: ShardSpec, search_index: bool) -> None:
+    """record which shard a finished build produced, the merge reads it back.
+    the output path is kept as the build spelled it, that is how the manifest and graph record the pages in it.
+    """
+    paths = shard_paths(shard_dir)
+    info = {"format": SHARD_FORMAT, "index": shard.index, "count": shard.count, "output": paths["output"],
+            "search_index": search_index}
+    write_file(json.dumps(info, sort_keys=True), paths["info"])
+
+def load_shard_info(shard_dir: str) -> Dict:
+    """
+    Raises:
+        ValueError: the directory holds no finished shard build
+    """
+    path = shard_paths(shard_dir)["info"]
+    try:
+        with open(path) as file:
+            info = json.load(file)
+    except (OSError, ValueError):
+        raise ValueError(f"{shard_dir} holds no shard build, {path} is missing or unreadable")
+    if not isinstance(info, dict) or info.get("format") != SHARD_FORMAT:
+        raise ValueError(f"{path} was written by an incompatible generator")
+    return info
+
+
+class MergeStats:
+    """counts of what merging shard outputs did with each file."""
+    def __init__(self) -> None:
+        self.pages = 0
+        self.copied = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def __repr__(self) -> str:
+        return (f"MergeStats(pages: {self.pages}, copied: {self.copied}, unchanged: {self.unchanged}, "
+                f"removed: {self.removed})")
+
+
+def merge_shards(shard_dirs: List[str], dest_dir_path: str, manifest_path: str, dependencies_path: str = None,
+                 search_index_path: str = None) -> MergeStats:
+    """combine the outputs of every shard of a sharded build into dest_dir_path, along with their state:
+    the build manifests, the dependency graphs and the search indexes.
+    the result is what a single build of the whole content tree produces, and its manifest and graph
+    serve a later unsharded incremental build too.
+
+    files are copied only when their size or mtime differ from the merged copy, a file several shards hold,
+    like the static files every shard syncs, must be identical in all of them.
+    files no shard holds any more are removed, except the precompressed variants of merged files.
+    the search index is combined from the terms the shards kept, no page is tokenized again,
+    and published under dest_dir_path/search.
+
+    Args:
+        shard_dirs (List[str]): directory of every shard, as written by a --shard build, in any order
+        dest_dir_path (str): directory the merged site is written to
+        manifest_path (str): path the merged build manifest is saved to
+        dependencies_path (str, optional): path the merged dependency graph is saved to. Defaults to None, not merged.
+        search_index_path (str, optional): path of the merged search index state. Defaults to None, not merged.
+
+    Raises:
+        ValueError: a shard is missing or given twice, the shards were built with different counts, templates,
+            generators or static files, or two shards hold different files at the same path
+
+    Returns:
+        MergeStats: how many pages were merged and files copied, unchanged and removed
+    """
+    shards = sorted(((load_shard_info(shard_dir), shard_dir) for shard_dir in shard_dirs),
+                    key=lambda shard: shard[0]["index"])
+    counts = {info["count"] for info, _ in shards}
+    if len(counts) != 1:
+        raise ValueError(f"Shards of different builds can not be merged, counts: {sorted(counts)}")
+    count = counts.pop()
+    indexes = [info["index"] for info, _ in shards]
+    if indexes != list(range(count)):
+        missing = sorted(set(range(count)) - set(indexes))
+        raise ValueError(f"Every shard of {count} must be merged once, missing: {missing}, given: {indexes}")
+    stats = MergeStats()
+    # the partial indexes the shards published are never copied, their terms are merged into one index instead
+    shard_search = any(info.get("search_index") for info, _ in shards)
+    publish_search = shard_search and search_index_path is not None
+
+    manifest = BuildManifest(manifest_path)
+    dependencies = DependencyGraph(dependencies_path) if dependencies_path is not None else None
+    search_index = SearchIndex.load(search_index_path) if publish_search else None
+    for info, shard_dir in shards:
+        paths = shard_paths(shard_dir)
+        shard_manifest = BuildManifest.load(paths["manifest"])
+        if info["index"] == 0:
+            manifest.template_hash = shard_manifest.template_hash
+            manifest.generator = shard_manifest.generator
+            manifest.assets = shard_manifest.assets
+        elif ((shard_manifest.template_hash, shard_manifest.generator, shard_manifest.assets)
+              != (manifest.template_hash, manifest.generator, manifest.assets)):
+            raise ValueError(f"Shard {shard_dir} was built from a different template, generator or static files")
+        for from_path, record in shard_manifest.pages.items():
+            if from_path in manifest.pages:
+                raise ValueError(f"{from_path} was built by more than one shard")
+            dest_path = os.path.join(dest_dir_path, os.path.relpath(record["dest"], info["output"]))
+            manifest.pages[from_path] = {"hash": record["hash"], "dest": dest_path}
+        if dependencies is not None:
+            shard_output = dependency_key(info["output"])
+            for output, inputs in DependencyGraph.load(paths["dependencies"]).outputs.items():
+                output = dependency_key(os.path.join(dest_dir_path, os.path.relpath(output, shard_output)))
+                dependencies.outputs[output] = inputs
+        if search_index is not None:
+            shard_index = SearchIndex.load(paths["search_index"], search_index.prefix_length)
+            for source in sorted(shard_index.pages):
+                page = shard_index.pages[source]
+                search_index.update(source, page["hash"], page["url"], page["title"], page["terms"])
+    stats.pages = len(manifest.pages)
+
+    files = _merged_files(shards, shard_search)
+    for rel_path, (source_path, stat) in sorted(files.items()):
+        dest_path = os.path.join(dest_dir_path, rel_path)
+        try:
+            dest_stat = os.stat(dest_path)
+            if dest_stat.st_size == stat.st_size and dest_stat.st_mtime_ns == stat.st_mtime_ns:
+                stats.unchanged += 1
+                continue
+        except FileNotFoundError:
+            ensure_dir(os.path.dirname(dest_path))
+        copy_file_fast(source_path, dest_path)
+        stats.copied += 1
+    if os.path.isdir(dest_dir_path):
+        for rel_path, _ in list(scan_files(dest_dir_path, '')):
+            base, extension = os.path.splitext(rel_path)
+            if rel_path in files or (extension in (".gz", ".br", ".zst") and base in files):
+                continue
+            if publish_search and rel_path.startswith(SEARCH_DIR + os.sep):
+                continue
+            os.remove(os.path.join(dest_dir_path, rel_path))
+            stats.removed += 1
+        _remove_empty_dirs(dest_dir_path)
+
+    if search_index is not None:
+        search_index.prune(manifest.pages)
+        search_index.write(os.path.join(dest_dir_path, SEARCH_DIR))
+        search_index.save()
+    if dependencies is not None:
+        dependencies.save()
+    manifest.save()
+    return stats
+
+def _merged_files(shards: List[Tuple[Dict, str]], skip_search: bool) -> Dict[str, Tuple[str, os.stat_result]]:
+    """relative path to (source path, stat) of every file in the shard outputs,
+    checking that files found in several shards are identical.
+    with skip_search the shards' partial search indexes are left out.
+    """
+    files: Dict[str, Tuple[str, os.stat_result]] = {}
+    for _, shard_dir in shards:
+        output = shard_paths(shard_dir)["output"]
+        if not os.path.isdir(output):
+            continue
+        for rel_path, stat in scan_files(output, ''):
+            if skip_search and rel_path.startswith(SEARCH_DIR + os.sep):
+                continue
+            source_path = os.path.join(output, rel_path)
+            known = files.get(rel_path)
+            if known is None:
+                files[rel_path] = (source_path, stat)
+            elif known[1].st_size != stat.st_size or hash_file(known[0]) != hash_file(source_path):
+                raise ValueError(f"{rel_path} differs between {known[0]} and {source_path}")
+    return files
+
+def _remove_empty_dirs(root: str) -> None:
+    """remove the directories under root left empty by removed files."""
+    # bottom up, so a directory holding only empty directories goes too, rmdir refuses the others
+    for directory, _, _ in os.walk(root, topdown=False):
+        if directory != root:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
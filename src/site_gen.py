@@ -1,7 +1,30 @@
 import os
-import shutil
-from file_system_utilities import read_file, write_file
-from block_markdown import markdown_to_html_node
+import math
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Tuple
+from file_system_utilities import read_file, open_for_write, write_counts
+from build_manifest import BuildManifest, hash_file, generator_version
+from block_markdown import (iter_file_blocks, markdown_file_to_html_node, markdown_to_blocks, markdown_to_html_node,
+                            use_block_cache)
+from htmlnode import ParentNode
+from block_cache import BlockCache
+from memo import memo_stats, stats_delta
+from template_engine import Template, load_template
+from page_metadata import PageMetadata, without_front_matter
+from split_page import SplitOptions, render_blocks_parallel
+from search_index import (SEARCH_DIR, SearchIndex, add_page_terms, collect_page_terms, collecting_terms, index_page,
+                          lazy_page_terms, page_url, use_search_terms)
+from shard_build import ShardSpec, shard_pages
+from assets import template_with_assets, use_asset_map
+from dependency_graph import DependencyGraph, dependency_key, template_static_references
+from instrumentation import tracer
+
+if TYPE_CHECKING:
+    from async_pipeline import PipelineOptions
+
+# markdown files of at least this many bytes are parsed and written one block at a time
+STREAM_THRESHOLD = 8 * 1024 * 1024
 
 def extract_title(markdown: str) -> str:
     """pulls the h1 header from the markdown passed to the function.
@@ -16,54 +39,668 @@ def extract_title(markdown: str) -> str:
     Returns:
         str: the h1 header text without the #  or leading white space.
     """
-    lines = markdown.split('\n')
+    return extract_title_from_lines(markdown.split('\n'))
+
+def extract_title_from_file(path: str) -> str:
+    """pulls the h1 header from a markdown file, reading only up to the header.
+
+    Args:
+        path (str): path to a markdown file
+
+    Raises:
+        ValueError: No title header found in the file.
+
+    Returns:
+        str: the h1 header text without the #  or leading white space.
+    """
+    with open(path) as file:
+        return extract_title_from_lines(file)
+
+def extract_title_from_lines(lines: Iterable[str]) -> str:
     for line in lines:
         line = line.strip()
         if line.startswith("# "):
             return line[2:]
     raise ValueError("Error: No title header found.")
 
-def generate_page(from_path: str, template_path: str, dest_path: str) -> None:
+def page_values(markdown: str, template: Template) -> Dict[str, object]:
+    """the placeholder values of a page, Content and everything the template uses from the page's metadata,
+    collected while the markdown is converted instead of scanning the document again.
+
+    Args:
+        markdown (str): markdown document
+        template (Template): the template the page is rendered with
+
+    Raises:
+        ValueError: the document has neither a title field in its front matter nor an h1 header.
+
+    Returns:
+        Dict[str, object]: Title, Content, front matter fields, and Toc and WordCount when the template uses them
+    """
+    metadata = PageMetadata.for_template(template)
+    html_node = markdown_to_html_node(markdown, metadata)
+    with tracer.span("title"):
+        values = metadata.template_values()
+    values["Content"] = html_node
+    return values
+
+def file_page_metadata(from_path: str, template: Template) -> PageMetadata:
+    """the metadata of a markdown file too large to load whole, from a first pass over its blocks.
+    the pass stops at the title unless the template uses Toc or WordCount, which need every block.
+
+    Args:
+        from_path (str): source path to markdown file
+        template (Template): the template the page is rendered with
+
+    Returns:
+        PageMetadata: the front matter, title and, when the template asks for them, the outline and word count
+    """
+    metadata = PageMetadata.for_template(template)
+    complete = metadata.toc or metadata.count_words
+    for block in without_front_matter(iter_file_blocks(from_path), metadata):
+        if not complete and isinstance(metadata.front_matter.get("title"), str):
+            break
+        metadata.add_block(block)
+        if not complete and metadata.title is not None:
+            break
+    return metadata
+
+def generate_page(from_path: str, template_path: str, dest_path: str, stream_threshold: int = None,
+                  skip_unchanged: bool = False, split: SplitOptions = None) -> None:
     """Generate an HTML page from markdown using a template html and a markdown file. 
     write the resulting file to destination.
+    markdown files of at least stream_threshold bytes are never loaded whole,
+    they are parsed one block at a time while the page is being written.
 
     Args:
         from_path (str): source path to markdown file
         template_path (str): path to template html file
         dest_path (str): path to destination html file
+        stream_threshold (int, optional): file size in bytes from which the markdown is streamed.
+            Defaults to STREAM_THRESHOLD.
+        skip_unchanged (bool, optional): leave the destination untouched when it already holds the same html,
+            and replace it atomically otherwise. Defaults to False.
+        split (SplitOptions, optional): parse and render files of at least split.threshold bytes in chunks
+            across worker processes, the html is the same. Defaults to None.
     """    
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
     
-    markdown = read_file(from_path)
-    template_html = read_file(template_path)
-    
-    html_string = markdown_to_html_node(markdown).to_html()  
-    title = extract_title(markdown)
-    
-    new_html = template_html.replace("{{ Title }}", title).replace("{{ Content }}", html_string)
-    
-    write_file(new_html, dest_path)
+    if stream_threshold is None:
+        stream_threshold = STREAM_THRESHOLD
+    with tracer.page(from_path):
+        template = template_with_assets(load_template(template_path))
+        size = os.path.getsize(from_path) if os.path.isfile(from_path) else None
+        streamed = size is not None and size >= stream_threshold
+        if split is not None and size is not None and size >= split.threshold:
+            executor = split.executor()
+            try:
+                values = split_page_values(from_path, template, split, executor, streamed)
+                terms = lazy_page_terms(values["Content"])
+                _write_page(template, values, dest_path, skip_unchanged)
+            finally:
+                executor.shutdown(cancel_futures=True)
+            add_page_terms(from_path, values["Title"], terms)
+            return
+        if streamed:
+            with tracer.span("title"):
+                metadata = file_page_metadata(from_path, template)
+                values = metadata.template_values()
+            # converted while it is written, a second pass over the file handing out the same heading ids
+            values["Content"] = markdown_file_to_html_node(from_path, PageMetadata(toc=metadata.toc))
+            terms = lazy_page_terms(values["Content"])
+            _write_page(template, values, dest_path, skip_unchanged)
+            add_page_terms(from_path, values["Title"], terms)
+            return
+        with tracer.span("read"):
+            markdown = read_file(from_path)
+        values = page_values(markdown, template)
+        collect_page_terms(from_path, values["Title"], values["Content"])
+        _write_page(template, values, dest_path, skip_unchanged)
+
+def _write_page(template: Template, values: Dict[str, object], dest_path: str, skip_unchanged: bool) -> None:
+    html_node = values["Content"]
+    if tracer.enabled and isinstance(html_node.children, list):
+        # rendered in separate steps so each one can be timed, the output is the same
+        with tracer.span("render"):
+            values["Content"] = html_node.to_html()
+        with tracer.span("template"):
+            page = template.render(values)
+        with tracer.span("write"):
+            with open_for_write(dest_path, skip_unchanged) as file:
+                file.write(page)
+        return
+    with tracer.span("render"):
+        with open_for_write(dest_path, skip_unchanged) as file:
+            template.render_to(file, values)
     
-def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str) -> None:
+def split_page_values(from_path: str, template: Template, options: SplitOptions, executor: Executor,
+                      streamed: bool) -> Dict[str, object]:
+    """page_values for a page whose blocks are parsed and rendered in chunks across worker processes.
+    the metadata is collected here, block by block, and the heading ids handed to the workers,
+    so the html is the same as a serial build of the page.
+
+    Args:
+        from_path (str): source path to markdown file
+        template (Template): the template the page is rendered with
+        options (SplitOptions): chunk size and chunks in flight
+        executor (Executor): runs the chunks, see SplitOptions.executor
+        streamed (bool): read the file one block at a time, with its metadata taken in a first pass,
+            like generate_page does for files above the stream threshold
+
+    Returns:
+        Dict[str, object]: the placeholder values, Content renders the chunks while it is written
+    """
+    if streamed:
+        with tracer.span("title"):
+            metadata = file_page_metadata(from_path, template)
+            values = metadata.template_values()
+        anchors = PageMetadata(toc=metadata.toc)
+        blocks = ((block, anchors.add_block(block)) for block in without_front_matter(iter_file_blocks(from_path)))
+    else:
+        with tracer.span("read"):
+            markdown = read_file(from_path)
+        metadata = PageMetadata.for_template(template)
+        with tracer.span("blocks"):
+            blocks = [(block, metadata.add_block(block))
+                      for block in without_front_matter(markdown_to_blocks(markdown), metadata)]
+        with tracer.span("title"):
+            values = metadata.template_values()
+    # the workers send the text of their chunks back only when the search index needs it
+    values["Content"] = ParentNode("div", render_blocks_parallel(blocks, options, executor, collecting_terms()))
+    return values
+
+def render_markdown_page(markdown: str, template_path: str, from_path: str = None) -> str:
+    """the html generate_page writes for a markdown document, returned instead of written.
+
+    Args:
+        markdown (str): markdown document
+        template_path (str): path to template html file
+        from_path (str, optional): source path of the document, its terms are then collected like
+            generate_page does. Defaults to None.
+
+    Returns:
+        str: the rendered page
+    """
+    template = template_with_assets(load_template(template_path))
+    values = page_values(markdown, template)
+    if from_path is not None:
+        collect_page_terms(from_path, values["Title"], values["Content"])
+    return template.render(values)
+
+class BuildStats:
+    """counts of what a build did with each page."""
+    def __init__(self) -> None:
+        self.generated = 0
+        self.skipped = 0
+        self.removed = 0
+        self.caches: Dict[str, Dict[str, int]] = {}
+
+    def add_cache_stats(self, name: str, counters: Dict[str, int]) -> None:
+        """add the hit, miss and eviction counters of a cache, e.g. reported by a worker."""
+        totals = self.caches.setdefault(name, {})
+        for counter, value in counters.items():
+            totals[counter] = totals.get(counter, 0) + value
+
+    def __repr__(self) -> str:
+        return f"BuildStats(generated: {self.generated}, skipped: {self.skipped}, removed: {self.removed})"
+
+def iter_pages(dir_path_content: str, dest_dir_path: str) -> Iterator[Tuple[str, str]]:
+    """recurse through a given directory and yield every markdown file
+    along with the html path it should be generated to.
+    maintains folder structure in destination.
+    directories are read with os.scandir, entries are yielded as they are read
+    and the file type comes with the entry, so a huge directory is never listed into memory or stat'ed file by file.
+
+    Args:
+        dir_path_content (str): directory with markdown content to be converted to html
+        dest_dir_path (str): directory where the html files will be served from.
+
+    Yields:
+        Tuple[str, str]: (markdown source path, html destination path)
+    """
+    with os.scandir(dir_path_content) as entries:
+        for entry in entries:
+            if entry.is_file():
+                if entry.name.endswith(".md"):
+                    yield entry.path, os.path.join(dest_dir_path,entry.name.replace(".md",".html"))
+
+            elif entry.is_dir():
+                new_dest_dir_path = os.path.join(dest_dir_path,entry.name)
+                yield from iter_pages(entry.path, new_dest_dir_path)
+
+class WorkerStats:
+    """throughput of a single worker process in a parallel build."""
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.pages = 0
+        self.chunks = 0
+        self.seconds = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        if self.seconds == 0:
+            return 0.0
+        return self.pages / self.seconds
+
+    def __repr__(self) -> str:
+        return f"WorkerStats({self.pid}, pages: {self.pages}, chunks: {self.chunks}, {self.seconds:.3f}s)"
+
+def chunk_pages(pages: List[Tuple[str, str]], chunk_size: int) -> List[List[Tuple[str, str]]]:
+    """split a list of pages into chunks of at most chunk_size pages.
+
+    Args:
+        pages (List[Tuple[str, str]]): (markdown source path, html destination path) pairs
+        chunk_size (int): maximum number of pages per chunk
+
+    Returns:
+        List[List[Tuple[str, str]]]: the pages split into chunks, in order
+    """
+    return [pages[x:x + chunk_size] for x in range(0, len(pages), chunk_size)]
+
+def default_chunk_size(page_count: int, workers: int) -> int:
+    """pick a chunk size that gives every worker a few chunks to balance load,
+    while keeping chunks big enough that pickling and IPC stay cheap.
+
+    Args:
+        page_count (int): number of pages to generate
+        workers (int): number of worker processes
+
+    Returns:
+        int: number of pages per chunk
+    """
+    return max(1, min(64, math.ceil(page_count / (workers * 4))))
+
+def generate_pages_serial(pages: List[Tuple[str, str]], template_path: str, block_cache_path: str = None,
+                          asset_map: Dict[str, str] = None, skip_unchanged: bool = False,
+                          split: SplitOptions = None) -> Dict[str, Dict[str, int]]:
+    """generate pages one after another in this process.
+
+    Args:
+        pages (List[Tuple[str, str]]): (markdown source path, html destination path) pairs
+        template_path (str): path to the template html file
+        block_cache_path (str, optional): path to a persistent block render cache. Defaults to None.
+        asset_map (Dict[str, str], optional): static file url to fingerprinted url,
+            references in the template and images are rewritten with it. Defaults to None.
+        skip_unchanged (bool, optional): leave pages that already hold the same html untouched. Defaults to False.
+        split (SplitOptions, optional): render large pages in chunks across worker processes. Defaults to None.
+
+    Returns:
+        Dict[str, Dict[str, int]]: hit, miss and eviction counters of every cache used, by cache name,
+            and with skip_unchanged how many pages were written or left alone under "writes"
+    """
+    use_asset_map(asset_map)
+    before = memo_stats()
+    writes_before = dict(write_counts)
+    cache = BlockCache(block_cache_path) if block_cache_path else None
+    use_block_cache(cache)
+    try:
+        for from_path, dest_path in pages:
+            generate_page(from_path, template_path, dest_path, skip_unchanged=skip_unchanged, split=split)
+    finally:
+        use_block_cache(None)
+        if cache is not None:
+            cache.close()
+    caches = stats_delta(before, memo_stats())
+    if cache is not None:
+        caches["block_cache"] = cache.stats()
+    if skip_unchanged:
+        caches["writes"] = {name: count - writes_before[name] for name, count in write_counts.items()}
+    return caches
+
+def _generate_chunk(chunk: List[Tuple[str, str]], template_path: str, instrument: bool = False,
+                    keep_events: bool = False, block_cache_path: str = None, asset_map: Dict[str, str] = None,
+                    skip_unchanged: bool = False, collect_terms: bool = False) -> Tuple[int, int, float, Dict, Dict, Dict]:
+    """worker entry point, generates every page of a chunk.
+    a forked worker must not share the parent's sqlite connection, so each chunk opens its own block cache.
+    instrument and keep_events come from the parent's tracer, a spawned worker's own tracer knows neither.
+    with collect_terms the title and terms of the pages are sent back for the parent's search index.
+
+    Returns:
+        Tuple[int, int, float, Dict, Dict, Dict]: (worker pid, pages generated, seconds spent,
+            drained instrumentation or None, cache counters, title and terms by source path or None)
+    """
+    terms = {} if collect_terms else None
+    use_search_terms(terms)
+    if instrument:
+        # a forked worker starts with a copy of the parent's spans, drop them
+        tracer.enable(keep_events)
+        tracer.drain()
+    start = time.perf_counter()
+    try:
+        caches = generate_pages_serial(chunk, template_path, block_cache_path, asset_map, skip_unchanged)
+    finally:
+        use_search_terms(None)
+    seconds = time.perf_counter() - start
+    return os.getpid(), len(chunk), seconds, tracer.drain() if instrument else None, caches, terms
+
+def generate_pages_parallel(pages: List[Tuple[str, str]], template_path: str, workers: int = None, chunk_size: int = None,
+                            block_cache_path: str = None, build_stats: BuildStats = None,
+                            asset_map: Dict[str, str] = None, skip_unchanged: bool = False) -> Dict[int, WorkerStats]:
+    """generate pages across a pool of worker processes.
+    pages are handed to the workers in chunks to keep IPC overhead low,
+    each worker runs the same generate_page as a serial build so the output is identical.
+
+    Args:
+        pages (List[Tuple[str, str]]): (markdown source path, html destination path) pairs
+        template_path (str): path to the template html file
+        workers (int, optional): number of worker processes. Defaults to the cpu count.
+        chunk_size (int, optional): pages per chunk. Defaults to default_chunk_size.
+        block_cache_path (str, optional): path to the block render cache the workers share. Defaults to None.
+        build_stats (BuildStats, optional): collects the workers' cache counters. Defaults to None.
+        asset_map (Dict[str, str], optional): static file url to fingerprinted url. Defaults to None.
+        skip_unchanged (bool, optional): leave pages that already hold the same html untouched. Defaults to False.
+
+    Returns:
+        Dict[int, WorkerStats]: throughput stats keyed by worker pid
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or default_chunk_size(len(pages), workers)
+    worker_stats = {}
+    if not pages:
+        return worker_stats
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_generate_chunk, chunk, template_path, tracer.enabled, tracer.keep_events,
+                            block_cache_path, asset_map, skip_unchanged, collecting_terms())
+            for chunk in chunk_pages(pages, chunk_size)
+        ]
+        for future in as_completed(futures):
+            pid, count, seconds, collected, caches, terms = future.result()
+            if collected is not None:
+                tracer.merge(collected)
+            for from_path, (title, page_terms) in (terms or {}).items():
+                add_page_terms(from_path, title, page_terms)
+            if build_stats is not None:
+                for name, counters in caches.items():
+                    build_stats.add_cache_stats(name, counters)
+            stats = worker_stats.setdefault(pid, WorkerStats(pid))
+            stats.pages += count
+            stats.chunks += 1
+            stats.seconds += seconds
+    for stats in sorted(worker_stats.values(), key=lambda worker: worker.pid):
+        print(f"Worker {stats.pid}: {stats.pages} pages in {stats.chunks} chunks, {stats.seconds:.3f}s ({stats.pages_per_second:.1f} pages/s)")
+    return worker_stats
+
+def generate_pages(pages: List[Tuple[str, str]], template_path: str, workers: int = 1, chunk_size: int = None,
+                   block_cache_path: str = None, build_stats: BuildStats = None, asset_map: Dict[str, str] = None,
+                   skip_unchanged: bool = False, pipeline: 'PipelineOptions' = None, split: SplitOptions = None) -> None:
+    """generate the given pages, serially or with a process pool when more than one worker is requested,
+    or through the asyncio pipeline when pipeline options are given.
+
+    Args:
+        pages (List[Tuple[str, str]]): (markdown source path, html destination path) pairs
+        template_path (str): path to the template html file
+        workers (int, optional): number of worker processes, 0 for the cpu count. Defaults to 1.
+        chunk_size (int, optional): pages per chunk in a parallel build. Defaults to None.
+        block_cache_path (str, optional): path to a persistent block render cache. Defaults to None.
+        build_stats (BuildStats, optional): collects the cache counters. Defaults to None.
+        asset_map (Dict[str, str], optional): static file url to fingerprinted url. Defaults to None.
+        skip_unchanged (bool, optional): leave pages that already hold the same html untouched. Defaults to False.
+        pipeline (PipelineOptions, optional): overlap reads, rendering and writes within this process,
+            pages may then be any iterable. Defaults to None.
+        split (SplitOptions, optional): render large pages in chunks across worker processes,
+            only in a serial build. Defaults to None.
+
+    Raises:
+        ValueError: a block cache or more than one worker was requested along with the pipeline,
+            or split pages along with the pipeline or more than one worker
+    """
+    if split is not None and (pipeline is not None or workers != 1):
+        raise ValueError("Pages can only be split across processes in a serial build")
+    if pipeline is not None and workers != 1:
+        raise ValueError("The asyncio pipeline renders with its own renderers limit, not with workers")
+    if pipeline is not None:
+        # imported here, the pipeline builds on this module
+        from async_pipeline import generate_pages_pipelined
+        if block_cache_path:
+            raise ValueError("The block cache can not be used with the asyncio pipeline")
+        before = memo_stats()
+        generate_pages_pipelined(pages, template_path, pipeline, asset_map, skip_unchanged)
+        if build_stats is not None:
+            for name, counters in stats_delta(before, memo_stats()).items():
+                build_stats.add_cache_stats(name, counters)
+        return
+    if workers == 1 or len(pages) <= 1:
+        caches = generate_pages_serial(pages, template_path, block_cache_path, asset_map, skip_unchanged, split)
+        if build_stats is not None:
+            for name, counters in caches.items():
+                build_stats.add_cache_stats(name, counters)
+        return
+    generate_pages_parallel(pages, template_path, workers, chunk_size, block_cache_path, build_stats, asset_map,
+                            skip_unchanged)
+
+def page_dest_path(from_path: str, dir_path_content: str, dest_dir_path: str) -> str:
+    """the html path iter_pages generates a markdown file under dir_path_content to.
+
+    Args:
+        from_path (str): path to a markdown file inside dir_path_content
+        dir_path_content (str): directory with markdown content
+        dest_dir_path (str): directory where the html files will be served from.
+
+    Returns:
+        str: html destination path
+    """
+    rel_dir, entry = os.path.split(os.path.relpath(from_path, dir_path_content))
+    return os.path.join(dest_dir_path, rel_dir, entry.replace(".md",".html"))
+
+def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str, manifest_path: str = None,
+                             workers: int = 1, chunk_size: int = None, block_cache_path: str = None,
+                             asset_map: Dict[str, str] = None, skip_unchanged: bool = False,
+                             dependencies: DependencyGraph = None, pipeline: 'PipelineOptions' = None,
+                             constant_memory: bool = False, split: SplitOptions = None,
+                             search_index: SearchIndex = None, shard: ShardSpec = None) -> BuildStats:
     """dynamicly recurse through a given directory converting any markdown files to 
     html in the given destination. maintains folder structure in destination.
     uses a template html at the given path in the conversion process.
+    
+    when a manifest path is given the build is incremental:
+    only pages whose source, template or generator changed since the last build are regenerated,
+    and pages whose source was deleted have their html removed.
+    with a dependency graph, a changed fingerprinted asset only regenerates the pages referencing it,
+    without one every page is regenerated.
 
     Args:
         dir_path_content (str): directory with markdown content to be converted to html
         template_path (str): path to the template html file
         dest_dir_path (str): directory where the html files will be served from.
-    """        
-    content_dirs = os.listdir(dir_path_content)
-    for entry in content_dirs:
-        full_path = os.path.join(dir_path_content,entry)
-        if os.path.isfile(full_path):
-            dest_path = os.path.join(dest_dir_path,entry.replace(".md",".html"))
-            if entry.endswith(".md"):
-                generate_page(full_path,template_path, dest_path)
-            
-        elif os.path.isdir(full_path):
-            new_dest_dir_path = os.path.join(dest_dir_path,entry)                
-            generate_pages_recursive(full_path, template_path, new_dest_dir_path)
+        manifest_path (str, optional): path to the build manifest used for incremental builds. Defaults to None.
+        workers (int, optional): number of worker processes, 0 for the cpu count. Defaults to 1.
+        chunk_size (int, optional): pages per chunk in a parallel build. Defaults to None.
+        block_cache_path (str, optional): path to a persistent cache of rendered blocks,
+            shared across builds and pages. Defaults to None.
+        asset_map (Dict[str, str], optional): static file url to fingerprinted url,
+            see sync_static_dir. Defaults to None.
+        skip_unchanged (bool, optional): leave pages whose html came out the same untouched, keeping their mtime,
+            and replace changed pages atomically. Defaults to False.
+        dependencies (DependencyGraph, optional): graph recording what every page was built from,
+            updated and saved by the build. Defaults to None.
+        pipeline (PipelineOptions, optional): generate through the asyncio pipeline with these limits,
+            a full build then reads sources while the content directory is still being scanned. Defaults to None.
+        constant_memory (bool, optional): generate each page as the scan finds it, one at a time,
+            keeping no per page state, so memory use does not grow with the size of the content tree.
+            only for full, serial builds. Defaults to False.
+        split (SplitOptions, optional): parse and render each page of at least split.threshold bytes in chunks
+            across worker processes, for giant single pages, only in a serial build. Defaults to None.
+        search_index (SearchIndex, optional): client side search index, updated with the pages, published under
+            dest_dir_path/search and saved. pages rendered by this build, in this process or a worker, are indexed
+            from the nodes they were rendered from, pages it skipped are tokenized once more,
+            unless their source is unchanged since they were indexed. Defaults to None.
+        shard (ShardSpec, optional): only build the pages of this shard of the content tree, the manifest, graph
+            and search index then hold those pages alone, see merge_shards. Defaults to None, every page.
 
-        
+    Raises:
+        ValueError: constant_memory combined with an option that keeps state for every page,
+            or split combined with the pipeline or more than one worker
+
+    Returns:
+        BuildStats: how many pages were generated, skipped and removed, and the cache counters
+    """
+    stats = BuildStats()
+    scan = iter_pages(dir_path_content, dest_dir_path)
+    if shard is not None:
+        scan = shard_pages(scan, dir_path_content, shard)
+    if constant_memory:
+        if (manifest_path is not None or dependencies is not None or pipeline is not None or workers != 1
+                or search_index is not None):
+            raise ValueError("A constant memory build can not be incremental, parallel, pipelined or record dependencies")
+        pages = _counted(scan, stats)
+        generate_pages(pages, template_path, 1, None, block_cache_path, stats, asset_map, skip_unchanged, split=split)
+        print(f"Generated {stats.generated} pages")
+        print_cache_stats(stats)
+        return stats
+    collected = {} if search_index is not None else None
+    if manifest_path is None:
+        use_search_terms(collected)
+        try:
+            if pipeline is not None:
+                todo = []
+                generate_pages(_collect(scan, todo), template_path, workers,
+                               chunk_size, block_cache_path, stats, asset_map, skip_unchanged, pipeline, split)
+            else:
+                todo = list(scan)
+                generate_pages(todo, template_path, workers, chunk_size, block_cache_path, stats, asset_map,
+                               skip_unchanged, split=split)
+        finally:
+            use_search_terms(None)
+        stats.generated = len(todo)
+        if search_index is not None:
+            update_search_index(search_index, [(from_path, dest_path, None) for from_path, dest_path in todo],
+                                collected, dest_dir_path)
+        if dependencies is not None:
+            record_dependencies(dependencies, todo, dir_path_content, template_path)
+            dependencies.prune(dest_path for _, dest_path in todo)
+            dependencies.save()
+        print_cache_stats(stats)
+        return stats
+
+    manifest = BuildManifest.load(manifest_path)
+    template_hash = hash_file(template_path)
+    generator = generator_version()
+    full_build = manifest.is_stale(template_hash, generator)
+    asset_map = asset_map or {}
+    affected = set()
+    changed_assets = {url for url in set(asset_map) | set(manifest.assets) if asset_map.get(url) != manifest.assets.get(url)}
+    if changed_assets and not full_build:
+        if dependencies is None or dependencies.static_dir is None or not dependencies.covers(
+                record.get("dest", "") for record in manifest.pages.values()):
+            # no telling which pages reference the changed assets
+            full_build = True
+        else:
+            affected = dependencies.affected(dependencies.static_path(url) for url in changed_assets)
+    
+    pages = {}
+    todo = []
+    for from_path, dest_path in scan:
+        source_hash = hash_file(from_path)
+        if (not full_build and manifest.page_unchanged(from_path, source_hash, dest_path)
+                and (not affected or dependency_key(dest_path) not in affected)):
+            stats.skipped += 1
+        else:
+            todo.append((from_path, dest_path))
+        pages[from_path] = {"hash": source_hash, "dest": dest_path}
+    use_search_terms(collected)
+    try:
+        generate_pages(todo, template_path, workers, chunk_size, block_cache_path, stats, asset_map, skip_unchanged,
+                       pipeline, split)
+    finally:
+        use_search_terms(None)
+    stats.generated = len(todo)
+
+    dest_root = os.path.join(os.path.abspath(dest_dir_path), '')
+    new_dests = {page["dest"] for page in pages.values()}
+    for from_path, record in manifest.pages.items():
+        if from_path in pages:
+            continue
+        old_dest = record.get("dest")
+        if old_dest is None or old_dest in new_dests:
+            continue
+        if os.path.abspath(old_dest).startswith(dest_root) and os.path.isfile(old_dest):
+            print(f"Removing {old_dest}, source {from_path} was deleted")
+            os.remove(old_dest)
+            stats.removed += 1
+
+    if dependencies is not None:
+        # skipped pages missing from the graph, e.g. built before it existed, are recorded too
+        generated = set(todo)
+        record_dependencies(dependencies, [
+            (from_path, page["dest"]) for from_path, page in pages.items()
+            if (from_path, page["dest"]) in generated or not dependencies.covers([page["dest"]])
+        ], dir_path_content, template_path)
+        dependencies.prune(new_dests)
+        dependencies.save()
+
+    if search_index is not None:
+        update_search_index(search_index, [(from_path, page["dest"], page["hash"]) for from_path, page in pages.items()],
+                            collected, dest_dir_path)
+
+    manifest.template_hash = template_hash
+    manifest.generator = generator
+    manifest.pages = pages
+    manifest.assets = asset_map
+    manifest.save()
+    print(f"Generated {stats.generated} pages, skipped {stats.skipped} unchanged, removed {stats.removed}")
+    print_cache_stats(stats)
+    return stats
+
+def _counted(pages: Iterable[Tuple[str, str]], stats: BuildStats) -> Iterator[Tuple[str, str]]:
+    """pass pages through, counting them as generated."""
+    for page in pages:
+        stats.generated += 1
+        yield page
+
+def _collect(pages: Iterable[Tuple[str, str]], into: List[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+    """pass pages through, keeping a list of them."""
+    for page in pages:
+        into.append(page)
+        yield page
+
+def update_search_index(search_index: SearchIndex, pages: List[Tuple[str, str, str]],
+                        collected: Dict[str, Tuple[str, set]], dest_dir_path: str) -> None:
+    """bring the search index up to date with every page of the site, then publish and save it.
+
+    Args:
+        search_index (SearchIndex): the index
+        pages (List[Tuple[str, str, str]]): (markdown source path, html destination path, source hash or None)
+            of every page, pages missing from it are removed from the index
+        collected (Dict[str, Tuple[str, set]]): title and terms of the pages rendered by this build, or None
+        dest_dir_path (str): directory where the html files will be served from
+    """
+    tokenized = 0
+    for from_path, dest_path, source_hash in pages:
+        source_hash = source_hash or hash_file(from_path)
+        if collected and from_path in collected:
+            title, terms = collected[from_path]
+        elif search_index.page_unchanged(from_path, source_hash):
+            continue
+        else:
+            title, terms = index_page(from_path)
+            tokenized += 1
+        search_index.update(from_path, source_hash, page_url(dest_path, dest_dir_path), title, terms)
+    search_index.prune(from_path for from_path, _, _ in pages)
+    written = search_index.write(os.path.join(dest_dir_path, SEARCH_DIR))
+    search_index.save()
+    print(f"Search index: {len(search_index.pages)} pages, {tokenized} tokenized again, {written} shards written")
+
+def record_dependencies(dependencies: DependencyGraph, pages: List[Tuple[str, str]], dir_path_content: str,
+                        template_path: str) -> None:
+    """record the inputs of generated pages in a dependency graph.
+
+    Args:
+        dependencies (DependencyGraph): the graph to update
+        pages (List[Tuple[str, str]]): (markdown source path, html destination path) pairs
+        dir_path_content (str): directory with markdown content
+        template_path (str): path to the template html file
+    """
+    if not pages:
+        return
+    template_references = set()
+    if dependencies.static_dir is not None:
+        template_references = template_static_references(load_template(template_path), dependencies.static_dir)
+    for from_path, dest_path in pages:
+        dependencies.record_page(from_path, dest_path, template_path, dir_path_content, template_references)
+
+def print_cache_stats(stats: BuildStats) -> None:
+    for name, counters in sorted(stats.caches.items()):
+        if not any(counters.values()):
+            continue
+        print(f"Cache {name}: " + ", ".join(f"{counter} {value}" for counter, value in counters.items()))
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from typing import Dict, Union
+
+from site_gen import BuildStats, generate_pages_recursive
+
+
+class SiteTestCase(unittest.TestCase):
+    """base of the tests that build a small site in a temporary directory, which is removed after every test.
+    the paths follow the layout main builds: content, static, public, template.html and the state under .build.
+    setUp only writes the template, subclasses add their pages after calling it.
+    """
+    template_text = "<title>{{ Title }}</title>{{ Content }}"
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.public = os.path.join(self.root, "public")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest = os.path.join(self.root, ".build", "manifest.json")
+        self.static_manifest = os.path.join(self.root, ".build", "static_manifest.json")
+        self.write(self.template, self.template_text)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path: str, content: Union[str, bytes]) -> None:
+        """write text or bytes to path, creating its directory."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb' if isinstance(content, bytes) else 'w') as file:
+            file.write(content)
+
+    def read(self, path: str) -> str:
+        with open(path) as file:
+            return file.read()
+
+    def read_tree(self, directory: str) -> Dict[str, bytes]:
+        """the contents of every file under directory, by path relative to it."""
+        files = {}
+        for dir_path, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(dir_path, name)
+                with open(path, 'rb') as file:
+                    files[os.path.relpath(path, directory)] = file.read()
+        return files
+
+    def build(self, incremental: bool = True, **options) -> BuildStats:
+        """build the site into public without printing, incremental against the manifest unless told otherwise."""
+        with redirect_stdout(StringIO()):
+            return generate_pages_recursive(self.content, self.template, self.public,
+                                            self.manifest if incremental else None, **options)
@@ -0,0 +1,148 @@
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import assets
+from assets import use_asset_map
+from block_markdown import block_to_htmlnode, classify_block, use_block_cache
+from htmlnode import RenderedNode, node_text
+from instrumentation import tracer
+
+# sizes may be written with one of these suffixes, e.g. 64M
+size_suffixes = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+class SplitOptions:
+    """when and how a single large page is parsed and rendered across worker processes."""
+    def __init__(self, threshold: int = 64 * 1024 * 1024, workers: int = 0, chunk_bytes: int = 1024 * 1024,
+                 in_flight: int = None) -> None:
+        """
+        Args:
+            threshold (int, optional): markdown files of at least this many bytes are split. Defaults to 64MiB.
+            workers (int, optional): worker processes per page, 0 for the cpu count. Defaults to 0.
+            chunk_bytes (int, optional): markdown handed to a worker at a time,
+                chunks end at the first block boundary past this size. Defaults to 1MiB.
+            in_flight (int, optional): chunks submitted ahead of the one being written,
+                bounds the memory held by finished fragments. Defaults to twice the workers.
+        """
+        workers = workers or os.cpu_count() or 1
+        in_flight = in_flight or 2 * workers
+        if min(threshold, workers, chunk_bytes, in_flight) < 1:
+            raise ValueError("split page limits must be at least 1")
+        self.threshold = threshold
+        self.workers = workers
+        self.chunk_bytes = chunk_bytes
+        self.in_flight = in_flight
+
+    def executor(self) -> Executor:
+        """a pool of workers rendering chunks with the asset map of this process and no block cache."""
+        return ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(assets.asset_map,))
+
+    def __repr__(self) -> str:
+        return (f"SplitOptions(threshold: {self.threshold}, workers: {self.workers}, "
+                f"chunk_bytes: {self.chunk_bytes}, in_flight: {self.in_flight})")
+
+
+def parse_size(text: str) -> int:
+    """a byte count, optionally with a k, M or G suffix for KiB, MiB or GiB."""
+    text = text.strip()
+    multiplier = size_suffixes.get(text[-1:].lower())
+    if multiplier is not None:
+        return int(float(text[:-1]) * multiplier)
+    return int(text)
+
+def parse_split_options(text: str) -> SplitOptions:
+    """parse split page limits written as name=value pairs separated by commas, unnamed limits keep their default.
+
+    Args:
+        text (str): e.g. "threshold=16M,workers=4", empty for the defaults
+
+    Raises:
+        ValueError: unknown limit or invalid value
+
+    Returns:
+        SplitOptions: the parsed limits
+    """
+    limits = {}
+    for pair in filter(None, (pair.strip() for pair in text.split(","))):
+        name, _, value = pair.partition("=")
+        name = name.strip()
+        if name not in ("threshold", "workers", "chunk_bytes", "in_flight"):
+            raise ValueError(f"Unknown split page limit {name}, expected one of threshold, workers, chunk_bytes, in_flight")
+        limits[name] = parse_size(value)
+    return SplitOptions(**limits)
+
+
+def _init_worker(asset_map: Dict[str, str]) -> None:
+    # a forked worker must not use the parent's block cache connection
+    use_block_cache(None)
+    use_asset_map(asset_map)
+    tracer.disable()
+
+def render_chunk(blocks: List[str], anchors: List[Optional[str]], with_text: bool = False) -> RenderedNode:
+    """worker entry point, the html of consecutive blocks, as blocks_to_html_nodes would render them.
+
+    Args:
+        blocks (List[str]): blocks of markdown, without front matter
+        anchors (List[Optional[str]]): the id of each block's node, from PageMetadata.add_block
+        with_text (bool, optional): also return the node_text of the blocks, for the search index. Defaults to False.
+
+    Returns:
+        RenderedNode: the html of the blocks, concatenated, and their text when asked for
+    """
+    parts = []
+    texts = [] if with_text else None
+    for block, anchor in zip(blocks, anchors):
+        node = block_to_htmlnode(block, *classify_block(block))
+        if anchor is not None:
+            node.props = {"id": anchor}
+        parts.append(node.to_html())
+        if with_text:
+            texts.append(node_text(node))
+    return RenderedNode("".join(parts), "\n".join(texts) if with_text else None)
+
+def iter_chunks(blocks: Iterable[Tuple[str, Optional[str]]], chunk_bytes: int) -> Iterator[Tuple[List[str], List[Optional[str]]]]:
+    """group (block, anchor) pairs into chunks of at least chunk_bytes characters, the last one may be smaller.
+
+    Yields:
+        Tuple[List[str], List[Optional[str]]]: the blocks and anchors of a chunk, the arguments of render_chunk
+    """
+    chunk: List[str] = []
+    anchors: List[Optional[str]] = []
+    size = 0
+    for block, anchor in blocks:
+        chunk.append(block)
+        anchors.append(anchor)
+        size += len(block)
+        if size >= chunk_bytes:
+            yield chunk, anchors
+            chunk, anchors, size = [], [], 0
+    if chunk:
+        yield chunk, anchors
+
+def render_blocks_parallel(blocks: Iterable[Tuple[str, Optional[str]]], options: SplitOptions,
+                           executor: Executor, with_text: bool = False) -> Iterator[RenderedNode]:
+    """render the blocks of one document in chunks across the executor's workers.
+    fragments come back in document order, while up to options.in_flight later chunks are being rendered.
+
+    Args:
+        blocks (Iterable[Tuple[str, Optional[str]]]): (block, heading id or None) pairs, may be lazy
+        options (SplitOptions): chunk size and chunks in flight
+        executor (Executor): runs render_chunk, see SplitOptions.executor
+        with_text (bool, optional): have the workers return the text of each chunk too. Defaults to False.
+
+    Yields:
+        RenderedNode: the html of each chunk, in order
+    """
+    pending = deque()
+    try:
+        for chunk in iter_chunks(blocks, options.chunk_bytes):
+            pending.append(executor.submit(render_chunk, *chunk, with_text))
+            if len(pending) >= options.in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,117 @@
+import os
+import re
+from typing import Dict, IO, Iterator, List, Tuple, Union
+from htmlnode import HTMLNode, iter_html, write_chunks
+
+placeholder_regex = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class Template:
+    """a page template compiled into literal segments and named placeholders.
+    placeholders are written as {{ Name }}, rendering fills every placeholder
+    and joins the segments once, so the page is only copied a single time.
+    """
+    def __init__(self, source: str) -> None:
+        """compile template source text.
+
+        Args:
+            source (str): template text containing {{ Name }} placeholders
+        """
+        parts: List[str] = []
+        slots: List[Tuple[int, str]] = []
+        position = 0
+        for match in placeholder_regex.finditer(source):
+            parts.append(source[position:match.start()])
+            slots.append((len(parts), match.group(1)))
+            # keep the original placeholder text so unknown names render unchanged
+            parts.append(match.group(0))
+            position = match.end()
+        parts.append(source[position:])
+        self.parts = parts
+        self.slots = slots
+        self.slot_names = dict(slots)
+        self.placeholders = tuple(name for _, name in slots)
+
+    def render(self, values: Dict[str, str]) -> str:
+        """fill the placeholders with the given values.
+        placeholders without a value are left as they appear in the template.
+
+        Args:
+            values (Dict[str, str]): placeholder name to text or HTMLNode
+
+        Returns:
+            str: the rendered page
+        """
+        parts = self.parts[:]
+        for index, name in self.slots:
+            value = values.get(name)
+            if isinstance(value, HTMLNode):
+                value = value.to_html()
+            if value is not None:
+                parts[index] = value
+        return "".join(parts)
+
+    def render_chunks(self, values: Dict[str, Union[str, HTMLNode]]) -> Iterator[str]:
+        """yield the rendered page in pieces.
+        a value may be an HTMLNode, which is rendered in place with iter_html
+        instead of first being turned into one large string.
+
+        Args:
+            values (Dict[str, Union[str, HTMLNode]]): placeholder name to text or node
+
+        Yields:
+            str: consecutive pieces of the rendered page
+        """
+        for index, part in enumerate(self.parts):
+            name = self.slot_names.get(index)
+            value = None if name is None else values.get(name)
+            if value is None:
+                yield part
+            elif isinstance(value, HTMLNode):
+                yield from iter_html(value)
+            else:
+                yield value
+
+    def render_to(self, stream: IO, values: Dict[str, Union[str, HTMLNode]]) -> int:
+        """write the rendered page straight into a text or binary stream.
+
+        Args:
+            stream (IO): the stream to write to
+            values (Dict[str, Union[str, HTMLNode]]): placeholder name to text or node
+
+        Returns:
+            int: number of characters written
+        """
+        return write_chunks(self.render_chunks(values), stream)
+
+    def __repr__(self) -> str:
+        return f"Template(placeholders: {self.placeholders})"
+
+
+_template_cache: Dict[str, Tuple[Tuple[int, int], Template]] = {}
+
+def load_template(path: str) -> Template:
+    """load and compile the template at the given path.
+    compiled templates are cached per process and only recompiled when the file changes on disk.
+
+    Args:
+        path (str): path to the template html file
+
+    Raises:
+        ValueError: given path not found
+
+    Returns:
+        Template: the compiled template
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise ValueError(f"Given path {path} does not exist.")
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _template_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(path) as file:
+        template = Template(file.read())
+    _template_cache[path] = (signature, template)
+    return template
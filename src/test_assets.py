@@ -0,0 +1,83 @@
+import os
+import unittest
+
+from assets import (
+    asset_salt,
+    fingerprinted_path,
+    rewrite_asset_urls,
+    template_with_assets,
+    use_asset_map,
+    write_headers_file,
+)
+from block_markdown import text_to_children
+from htmlnode import LeafNode
+from site_test_case import SiteTestCase
+from template_engine import Template
+
+asset_map = {"/index.css": "/index.0123abcd.css", "/images/a.png": "/images/a.89abcdef.png"}
+
+
+class testAssets(SiteTestCase):
+    template_text = '<link href="/index.css">{{ Content }}'
+
+    def tearDown(self):
+        use_asset_map({})
+        super().tearDown()
+
+    def test_fingerprinted_path(self):
+        self.assertEqual(fingerprinted_path("index.css", "3f9a1c2b77"), "index.3f9a1c2b.css")
+        self.assertEqual(fingerprinted_path(os.path.join("images", "a.png"), "abcdef0123"),
+                         os.path.join("images", "a.abcdef01.png"))
+
+    def test_rewrite_asset_urls(self):
+        html = '<link href="/index.css" rel="stylesheet"><img src=\'/images/a.png\'><a href="/other.css">'
+        self.assertEqual(
+            rewrite_asset_urls(html, asset_map),
+            '<link href="/index.0123abcd.css" rel="stylesheet"><img src=\'/images/a.89abcdef.png\'><a href="/other.css">',
+        )
+
+    def test_template_with_assets(self):
+        template = Template('<link href="/index.css">{{ Title }}')
+        self.assertIs(template_with_assets(template), template)
+        use_asset_map(asset_map)
+        rewritten = template_with_assets(template)
+        self.assertIs(template_with_assets(template), rewritten)
+        self.assertEqual(rewritten.render({"Title": "t"}), '<link href="/index.0123abcd.css">t')
+
+    def test_image_sources_follow_the_asset_map(self):
+        text = "an ![image](/images/a.png) here"
+        self.assertEqual(text_to_children(text)[1], LeafNode("img", "", {"src": "/images/a.png", "alt": "image"}))
+        use_asset_map(asset_map)
+        self.assertEqual(text_to_children(text)[1].props["src"], "/images/a.89abcdef.png")
+        use_asset_map({})
+        self.assertEqual(text_to_children(text)[1].props["src"], "/images/a.png")
+
+    def test_asset_salt(self):
+        self.assertEqual(asset_salt("![a](/images/a.png)"), "")
+        use_asset_map(asset_map)
+        self.assertIn("/images/a.89abcdef.png", asset_salt("![a](/images/a.png)"))
+        self.assertEqual(asset_salt("no images, /images/a.png"), "")
+
+    def test_write_headers_file(self):
+        path = os.path.join(self.root, "_headers")
+        self.assertTrue(write_headers_file(path, asset_map))
+        self.assertFalse(write_headers_file(path, asset_map))
+        lines = self.read(path).splitlines()
+        self.assertEqual(lines[0], "/images/a.89abcdef.png")
+        self.assertEqual(lines[1], "  Cache-Control: public, max-age=31536000, immutable")
+
+    def test_build_references_fingerprinted_assets(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![logo](/images/a.png)")
+        self.build(asset_map=asset_map)
+        unchanged = self.build(asset_map=asset_map)
+        changed = self.build(asset_map=dict(asset_map, **{"/index.css": "/index.feedbeef.css"}))
+        self.assertEqual((unchanged.generated, changed.generated), (0, 1))
+        self.assertEqual(
+            self.read(os.path.join(self.public, "index.html")),
+            '<link href="/index.feedbeef.css"><div><h1>Home</h1>'
+            '<p><img src="/images/a.89abcdef.png" alt="logo"></img></p></div>',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import gc
+import os
+import threading
+import time
+import unittest
+import warnings
+from contextlib import redirect_stdout
+from io import StringIO
+
+from async_pipeline import PipelineOptions, generate_pages_pipelined, parse_pipeline_options
+from corpus import generate_corpus
+from file_system_utilities import write_file
+from site_gen import generate_pages, generate_pages_recursive, iter_pages
+from site_test_case import SiteTestCase
+
+
+class testAsyncPipeline(SiteTestCase):
+    template_text = "<title>{{ Title }}</title><main>{{ Content }}</main>"
+
+    def setUp(self):
+        super().setUp()
+        with redirect_stdout(StringIO()):
+            self.sources = generate_corpus(self.content, 12, blocks=8, pages_per_dir=5)
+
+    def test_output_matches_serial_build(self):
+        serial = os.path.join(self.root, "serial")
+        pipelined = os.path.join(self.root, "pipelined")
+        with redirect_stdout(StringIO()):
+            generate_pages_recursive(self.content, self.template, serial)
+            stats = generate_pages_recursive(self.content, self.template, pipelined,
+                                             pipeline=PipelineOptions(readers=3, writers=2, queue_size=2))
+        self.assertEqual(stats.generated, 12)
+        self.assertEqual(self.read_tree(serial), self.read_tree(pipelined))
+
+    def test_incremental_build_through_pipeline(self):
+        self.build(pipeline=PipelineOptions())
+        with open(self.sources[3], 'a') as file:
+            file.write("\n\nmore text")
+        stats = self.build(pipeline=PipelineOptions())
+        self.assertEqual((stats.generated, stats.skipped), (1, 11))
+
+    def test_backpressure_bounds_queued_pages(self):
+        scanned = []
+        lock = threading.Lock()
+
+        def pages():
+            for page in iter_pages(self.content, self.public):
+                scanned.append(page)
+                yield page
+
+        def slow_write(content, dest_path):
+            time.sleep(0.01)
+            with lock:
+                written = self.written
+                self.written += 1
+            # the scan may only run ahead of the writes by what the queues and workers hold
+            self.assertLessEqual(len(scanned) - written, 8)
+            write_file(content, dest_path)
+
+        self.written = 0
+        options = PipelineOptions(readers=1, renderers=1, writers=1, queue_size=1)
+        with redirect_stdout(StringIO()):
+            stats = generate_pages_pipelined(pages(), self.template, options, write=slow_write)
+        self.assertEqual(stats.pages, 12)
+        self.assertLessEqual(stats.peak_queued, 2)
+
+    def test_failed_write_stops_the_pipeline(self):
+        def failing_write(content, dest_path):
+            raise OSError("disk full")
+
+        pages = iter_pages(self.content, self.public)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            with redirect_stdout(StringIO()), self.assertRaises(OSError):
+                generate_pages_pipelined(pages, self.template, PipelineOptions(queue_size=1), write=failing_write)
+            gc.collect()
+        # the scan thread must not leave a queue.put coroutine behind that was never scheduled
+        self.assertEqual([str(warning.message) for warning in caught if warning.category is RuntimeWarning], [])
+
+    def test_parse_pipeline_options(self):
+        options = parse_pipeline_options("readers=2, queue_size=4")
+        self.assertEqual((options.readers, options.renderers, options.writers, options.queue_size), (2, 1, 8, 4))
+        self.assertEqual(parse_pipeline_options("").readers, 8)
+        with self.assertRaises(ValueError):
+            parse_pipeline_options("threads=2")
+        with self.assertRaises(ValueError):
+            parse_pipeline_options("writers=0")
+        with self.assertRaises(ValueError):
+            generate_pages([], self.template, workers=2, pipeline=PipelineOptions())
+
+
+if __name__ == "__main__":
+    unittest.main()
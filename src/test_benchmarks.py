@@ -0,0 +1,91 @@
+import os
+import random
+import tempfile
+import unittest
+
+from benchmarks import compare_results, run_benchmarks, time_stage
+from block_markdown import block_to_block_type, markdown_to_blocks, markdown_to_html_node
+from corpus import generate_corpus, generate_markdown, parse_inline_mix, parse_mix
+from inline_markdown import text_to_textnodes
+from memo import memos
+from site_gen import extract_title
+
+
+class testCorpus(unittest.TestCase):
+
+    def test_generate_corpus_is_reproducible(self):
+        with tempfile.TemporaryDirectory() as root:
+            first = generate_corpus(os.path.join(root, "a"), 5, blocks=10, seed=7, pages_per_dir=2)
+            second = generate_corpus(os.path.join(root, "b"), 5, blocks=10, seed=7, pages_per_dir=2)
+            self.assertEqual(len(first), 5)
+            self.assertEqual(len({os.path.dirname(path) for path in first}), 3)
+            for path_a, path_b in zip(first, second):
+                with open(path_a) as file_a, open(path_b) as file_b:
+                    self.assertEqual(file_a.read(), file_b.read())
+
+    def test_generated_markdown_parses(self):
+        markdown = generate_markdown(random.Random(1), 50, title="Title")
+        self.assertEqual(extract_title(markdown), "Title")
+        self.assertEqual(len(markdown_to_blocks(markdown)), 51)
+        markdown_to_html_node(markdown).to_html()
+
+    def test_mix_selects_block_kinds(self):
+        markdown = generate_markdown(random.Random(1), 20, parse_mix("code=1"))
+        types = {block_to_block_type(block) for block in markdown_to_blocks(markdown)[1:]}
+        self.assertEqual(types, {"code"})
+
+    def test_parse_mix_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            parse_mix("table=1")
+
+    def test_inline_mix_sets_construct_density(self):
+        markdown = generate_markdown(random.Random(1), 20, parse_mix("paragraph=1"),
+                                     inline_mix=parse_inline_mix("link=50,image=0"))
+        words = len(markdown.split())
+        types = [node.text_type for node in text_to_textnodes(" ".join(markdown_to_blocks(markdown)[1:]))]
+        self.assertNotIn("image", types)
+        self.assertGreater(types.count("link"), words * 0.4)
+        self.assertLess(types.count("bold"), words * 0.1)
+        plain = generate_markdown(random.Random(1), 20, parse_mix("paragraph=1"), title="Title",
+                                  inline_mix=parse_inline_mix("bold=0,italic=0,code=0,link=0,image=0"))
+        self.assertFalse(set("*`[!") & set(plain))
+
+    def test_parse_inline_mix_rejects_bad_rates(self):
+        for text in ("table=1", "link=-1", "link=60,bold=50"):
+            with self.assertRaises(ValueError):
+                parse_inline_mix(text)
+
+
+class testBenchmarks(unittest.TestCase):
+
+    def test_run_benchmarks_times_every_stage(self):
+        results = run_benchmarks(pages=3, blocks=5, repeat=1)
+        self.assertEqual(set(results["stages"]), {
+            "markdown_to_blocks", "block_to_block_type", "text_to_textnodes",
+            "markdown_to_html_node", "to_html", "generate_page", "generate_pages_recursive",
+        })
+        self.assertEqual(results["stages"]["generate_page"]["items"], 3)
+
+    def test_every_repeat_starts_with_empty_memos(self):
+        text = "repeated **bold** text"
+        filled = []
+
+        def parse():
+            filled.append(sum(len(memo.entries) for memo in memos.values()))
+            for _ in range(3):
+                text_to_textnodes(text)
+
+        time_stage(parse, 3)
+        self.assertEqual(filled, [0, 0, 0])
+
+    def test_compare_results_flags_regressions(self):
+        baseline = {"stages": {"a": {"us_per_item": 10.0}, "b": {"us_per_item": 10.0}}}
+        current = {"stages": {"a": {"us_per_item": 10.5}, "b": {"us_per_item": 12.0}, "c": {"us_per_item": 1.0}}}
+        rows = {row["stage"]: row for row in compare_results(baseline, current, threshold=0.1)}
+        self.assertEqual(set(rows), {"a", "b"})
+        self.assertFalse(rows["a"]["regression"])
+        self.assertTrue(rows["b"]["regression"])
+
+
+if __name__ == "__main__":
+    unittest.main()
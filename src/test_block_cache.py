@@ -0,0 +1,125 @@
+import os
+import shutil
+import sqlite3
+import unittest
+
+from assets import use_asset_map
+from block_cache import BlockCache
+from block_markdown import markdown_to_html_node, use_block_cache
+from htmlnode import node_text
+from site_test_case import SiteTestCase
+
+long_paragraph = "a paragraph with **bold** and *italic* text that is long enough to be worth caching " * 2
+markdown = f"# Title\n\n{long_paragraph}\n\n* first item of a list with a [link](/somewhere)\n* second item of the same list"
+
+
+class testBlockCache(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.root, ".build", "block_cache.sqlite3")
+
+    def tearDown(self):
+        use_block_cache(None)
+        use_asset_map({})
+        super().tearDown()
+
+    def test_entries_persist_across_instances(self):
+        with BlockCache(self.path, version="1") as cache:
+            self.assertIsNone(cache.get(long_paragraph))
+            cache.put(long_paragraph, "<p>html</p>")
+            self.assertEqual(cache.get(long_paragraph), "<p>html</p>")
+        with BlockCache(self.path, version="1") as cache:
+            self.assertEqual(cache.get(long_paragraph), "<p>html</p>")
+            self.assertEqual(cache.stats(), {"hits": 1, "misses": 0, "evictions": 0})
+
+    def test_generator_version_change_invalidates(self):
+        with BlockCache(self.path, version="1") as cache:
+            cache.put(long_paragraph, "<p>html</p>")
+        with BlockCache(self.path, version="2") as cache:
+            self.assertIsNone(cache.get(long_paragraph))
+
+    def test_short_blocks_are_not_cached(self):
+        with BlockCache(self.path, version="1") as cache:
+            cache.put("# Title", "<h1>Title</h1>")
+            self.assertIsNone(cache.get("# Title"))
+            self.assertEqual(cache.stats()["misses"], 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        blocks = [f"{x} {long_paragraph}" for x in range(3)]
+        with BlockCache(self.path, max_bytes=100, version="1") as cache:
+            cache.put(blocks[0], "x" * 40)
+            cache.flush()
+            cache.put(blocks[1], "y" * 40)
+            cache.flush()
+            cache.get(blocks[0])
+            cache.flush()
+            cache.put(blocks[2], "z" * 40)
+            cache.flush()
+            self.assertEqual(cache.evictions, 1)
+            self.assertIsNone(cache.get(blocks[1]))
+            self.assertEqual(cache.get(blocks[0]), "x" * 40)
+            self.assertEqual(cache.get(blocks[2]), "z" * 40)
+
+    def test_cached_render_matches_uncached(self):
+        expected = markdown_to_html_node(markdown).to_html()
+        with BlockCache(self.path) as cache:
+            use_block_cache(cache)
+            self.assertEqual(markdown_to_html_node(markdown).to_html(), expected)
+            self.assertEqual(markdown_to_html_node(markdown).to_html(), expected)
+            use_block_cache(None)
+            self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_cached_blocks_keep_their_text(self):
+        expected = [node_text(node) for node in markdown_to_html_node(markdown).children]
+        with BlockCache(self.path) as cache:
+            use_block_cache(cache)
+            markdown_to_html_node(markdown)
+            self.assertEqual([node_text(node) for node in markdown_to_html_node(markdown).children], expected)
+            use_block_cache(None)
+        self.assertIn("\nlink\n", expected[2])
+
+    def test_cache_with_an_old_layout_is_dropped(self):
+        os.makedirs(os.path.dirname(self.path))
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute("CREATE TABLE blocks (key BLOB PRIMARY KEY, html TEXT NOT NULL, size INTEGER NOT NULL, "
+                               "used REAL NOT NULL)")
+            connection.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            connection.execute("INSERT INTO meta (name, value) VALUES ('version', '1')")
+        connection.close()
+        with BlockCache(self.path, version="1") as cache:
+            cache.put(long_paragraph, "<p>html</p>", "text")
+            self.assertEqual(cache.get_entry(long_paragraph), ("<p>html</p>", "text"))
+        with BlockCache(self.path, version="1") as cache:
+            self.assertEqual(cache.get_entry(long_paragraph), ("<p>html</p>", "text"))
+
+    def test_image_blocks_follow_asset_fingerprints(self):
+        image_paragraph = long_paragraph + "![logo](/images/logo.png)"
+        with BlockCache(self.path) as cache:
+            use_block_cache(cache)
+            markdown_to_html_node(image_paragraph).to_html()
+            use_asset_map({"/images/logo.png": "/images/logo.0123abcd.png"})
+            self.assertIn('src="/images/logo.0123abcd.png"', markdown_to_html_node(image_paragraph).to_html())
+            use_asset_map({})
+            self.assertIn('src="/images/logo.png"', markdown_to_html_node(image_paragraph).to_html())
+
+    def test_build_reuses_cache_across_builds_and_workers(self):
+        for x in range(4):
+            self.write(os.path.join(self.content, f"page{x}.md"), markdown.replace("Title", f"Page {x}"))
+        self.build(incremental=False)
+        plain = self.read_tree(self.public)
+        shutil.rmtree(self.public)
+        first = self.build(incremental=False, block_cache_path=self.path)
+        cached = self.read_tree(self.public)
+        shutil.rmtree(self.public)
+        second = self.build(incremental=False, workers=2, chunk_size=1, block_cache_path=self.path)
+        self.assertEqual(first.caches["block_cache"]["misses"], 2)
+        self.assertEqual(second.caches["block_cache"]["hits"], 8)
+        self.assertEqual(len(plain), 4)
+        self.assertEqual(cached, plain)
+        self.assertEqual(self.read_tree(self.public), plain)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,8 @@
+import os
+import tempfile
 import unittest
 from block_markdown import *
+from htmlnode import iter_html
 
 class TestBlockMarkdown(unittest.TestCase):
     
@@ -353,5 +356,84 @@ Another line of paragraph text.""")])
         Windows. They use Vim, not VS Code. They use C, not HTML. Come to the """),
                             LeafNode("img",'',{'src': "https://www.boot.dev", 'alt': "backend"}),
                             LeafNode(None,""", where the real programming happens.""", None)], None)], None)
-        self.assertEqual(result,expected)   
-    
\ No newline at end of file
+        self.assertEqual(result,expected)
+
+    def test_iter_blocks_matches_markdown_to_blocks(self):
+        documents = [
+            "# heading\n\nparagraph\n\n* a\n* b",
+            " first line\n\n\nlast line",
+            "a\n\n\n\n\nb\n\n \n\nc\n",
+            "\n\n\n",
+            "```\ncode\n\nmore code\n```",
+            "",
+        ]
+        for markdown in documents:
+            expected = markdown.split("\n\n")
+            expected = [segment.strip() for segment in expected if segment != ""]
+            for size in (1, 2, 3, 5, 1000):
+                chunks = [markdown[x:x + size] for x in range(0, len(markdown), size)]
+                self.assertListEqual(list(iter_blocks(chunks)), expected, (markdown, size))
+
+    def test_iter_file_blocks(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "doc.md")
+            markdown = "\n\n".join(f"## heading {x}\n\nparagraph {x}\nline two" for x in range(50))
+            with open(path, 'w') as file:
+                file.write(markdown)
+            self.assertListEqual(list(iter_file_blocks(path, chunk_size=7)), markdown_to_blocks(markdown))
+            node = markdown_file_to_html_node(path)
+            self.assertEqual("".join(iter_html(node)), markdown_to_html_node(markdown).to_html())
+
+    def test_text_to_children_memo_hits_are_fresh_nodes(self):
+        text = "footer [link](/about) and ![logo](/logo.png)"
+        for _ in range(3):
+            children = text_to_children(text)
+        self.assertGreater(children_memo.hits, 0)
+        children[1].props["href"] = "/changed"
+        children[0].value = "changed"
+        self.assertEqual(text_to_children(text), [
+            LeafNode(None, "footer "),
+            LeafNode("a", "link", {"href": "/about"}),
+            LeafNode(None, " and "),
+            LeafNode("img", "", {"src": "/logo.png", "alt": "logo"}),
+        ])
+
+    def test_classify_block_splits_lines_once(self):
+        self.assertEqual(classify_block("> a\n> b"), (block_type_quote, ["> a", "> b"]))
+        self.assertEqual(classify_block("1. a\n3. b"), (block_type_paragraph, ["1. a", "3. b"]))
+        self.assertEqual(classify_block("####### seven"), (block_type_paragraph, None))
+        self.assertEqual(classify_block("plain text"), (block_type_paragraph, None))
+        self.assertEqual(classify_block(""), (block_type_paragraph, None))
+        block = "* one\n- two"
+        self.assertEqual(block_to_htmlnode(block, *classify_block(block)), block_to_htmlnode(block, block_type_ulist))
+
+    def test_register_block_type(self):
+        def is_table(block, lines):
+            return all(line.startswith("|") for line in lines)
+
+        def build_table(block, lines):
+            rows = [ParentNode("tr", [ParentNode("td", text_to_children(cell.strip()))
+                                      for cell in line.strip("|").split("|")]) for line in lines]
+            return ParentNode("table", rows)
+
+        def is_note(block, lines):
+            return lines[0] == "> [!NOTE]"
+
+        def build_note(block, lines):
+            return ParentNode("aside", text_to_children(get_quote_info(block, lines[1:])[1]))
+
+        register_block_type("table", "|", is_table, build_table)
+        register_block_type("note", ">", is_note, build_note)
+        try:
+            self.assertEqual(registered_block_types(), ("table", "note"))
+            markdown = "| a | **b** |\n| c | d |\n\n> [!NOTE]\n> careful\n\n> plain quote\n\n| not a table\nline"
+            self.assertEqual(markdown_to_html_node(markdown).to_html(),
+                "<div><table><tr><td>a</td><td><b>b</b></td></tr><tr><td>c</td><td>d</td></tr></table>"
+                "<aside>careful</aside><blockquote>plain quote</blockquote><p>| not a table\nline</p></div>")
+            with self.assertRaises(ValueError):
+                register_block_type(block_type_code, "~", is_table, build_table)
+        finally:
+            unregister_block_type("table")
+            unregister_block_type("note")
+        self.assertEqual(block_to_block_type("| a |"), block_type_paragraph)
+        self.assertEqual(block_to_block_type("> [!NOTE]\n> careful"), block_type_quote)
@@ -0,0 +1,97 @@
+import os
+import sys
+import subprocess
+import unittest
+
+from build_manifest import GENERATOR_MODULES, BuildManifest, hash_file
+from site_test_case import SiteTestCase
+
+
+class testBuildManifest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nwelcome")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nsome *text*")
+
+    def test_first_build_generates_everything(self):
+        stats = self.build()
+        self.assertEqual((stats.generated, stats.skipped, stats.removed), (2, 0, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+        manifest = BuildManifest.load(self.manifest)
+        self.assertEqual(len(manifest.pages), 2)
+        self.assertEqual(manifest.template_hash, hash_file(self.template))
+
+    def test_unchanged_build_skips_pages(self):
+        self.build()
+        stats = self.build()
+        self.assertEqual((stats.generated, stats.skipped, stats.removed), (0, 2, 0))
+
+    def test_full_rebuild_leaves_identical_pages_untouched(self):
+        self.build(incremental=False, skip_unchanged=True)
+        page = os.path.join(self.public, "index.html")
+        os.utime(page, ns=(0, 0))
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nother *text*")
+        stats = self.build(incremental=False, skip_unchanged=True)
+        self.assertEqual(stats.caches["writes"], {"written": 1, "unchanged": 1})
+        self.assertEqual(os.stat(page).st_mtime_ns, 0)
+
+    def test_changed_source_regenerates_only_that_page(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nwelcome back")
+        stats = self.build()
+        self.assertEqual((stats.generated, stats.skipped), (1, 1))
+        with open(os.path.join(self.public, "index.html")) as file:
+            self.assertIn("welcome back", file.read())
+
+    def test_missing_output_is_regenerated(self):
+        self.build()
+        os.remove(os.path.join(self.public, "index.html"))
+        stats = self.build()
+        self.assertEqual((stats.generated, stats.skipped), (1, 1))
+
+    def test_template_change_rebuilds_everything(self):
+        self.build()
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        stats = self.build()
+        self.assertEqual((stats.generated, stats.skipped), (2, 0))
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        stats = self.build()
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+        self.assertEqual(len(BuildManifest.load(self.manifest).pages), 1)
+
+    def test_corrupt_manifest_is_a_full_build(self):
+        self.write(self.manifest, "not json")
+        stats = self.build()
+        self.assertEqual(stats.generated, 2)
+
+    def test_incremental_main_skips_unchanged_pages(self):
+        # main syncs the static files into the output too, that must leave the generated pages alone
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        main = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+        for expected in ("Generated 2 pages, skipped 0", "Generated 0 pages, skipped 2"):
+            build = subprocess.run([sys.executable, main, "--incremental"], cwd=self.root, capture_output=True,
+                                   text=True, check=True)
+            self.assertIn(expected, build.stdout)
+        self.assertIn("copied 0, unchanged 1", build.stdout)
+
+    def test_generator_version_covers_the_modules_a_build_imports(self):
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        # a fresh interpreter, this one has imported the tests and the benchmarks they cover
+        script = (
+            "import os, sys, site_gen, async_pipeline\n"
+            "for name, module in list(sys.modules.items()):\n"
+            "    if os.path.dirname(os.path.abspath(getattr(module, '__file__', None) or '')) == os.getcwd():\n"
+            "        print(name)\n"
+        )
+        imported = subprocess.run([sys.executable, "-c", script], cwd=src_dir, capture_output=True, text=True,
+                                  check=True).stdout.split()
+        self.assertCountEqual(imported, GENERATOR_MODULES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import unittest
+
+from dependency_graph import DependencyGraph, dependency_key, resolve_static_url
+from file_system_utilities import sync_static_dir
+from site_test_case import SiteTestCase
+
+
+class testDependencyGraph(SiteTestCase):
+    template_text = '<link href="/index.css"><title>{{ Title }}</title>{{ Content }}'
+
+    def setUp(self):
+        super().setUp()
+        self.graph_path = os.path.join(self.root, ".build", "dependencies.json")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[about](/about) and [paper](/paper.pdf)")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n![logo](/images/logo.png)")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "paper.pdf"), "pdf")
+        self.write(os.path.join(self.static, "images", "logo.png"), "png")
+
+    def graph(self):
+        return DependencyGraph.load(self.graph_path, self.static)
+
+    def build(self, fingerprint=False):
+        self.assets = sync_static_dir(self.static, self.public, self.static_manifest, fingerprint=fingerprint).assets
+        return super().build(asset_map=self.assets, dependencies=self.graph())
+
+    def test_affected_outputs(self):
+        graph = DependencyGraph()
+        graph.record("public/a.html", "content/a.md", ["template.html", "static/a.png"])
+        graph.record("public/b.html", "./content/b.md", ["template.html"])
+        self.assertEqual(graph.affected(["template.html"]), {"public/a.html", "public/b.html"})
+        self.assertEqual(graph.affected([os.path.abspath("static/a.png")]), {"public/a.html"})
+        self.assertEqual(graph.affected(["content" + os.sep]), {"public/a.html", "public/b.html"})
+        self.assertEqual(graph.affected(["static/b.png"]), set())
+        self.assertEqual(graph.source("./public/b.html"), "content/b.md")
+        graph.remove("public/a.html")
+        self.assertEqual(graph.affected(["static/a.png"]), set())
+
+    def test_resolve_static_url(self):
+        self.assertEqual(resolve_static_url("/paper.pdf?v=1", self.static), os.path.join(self.static, "paper.pdf"))
+        self.assertEqual(resolve_static_url("../images/logo.png", self.static, "blog"),
+                         os.path.join(self.static, "images", "logo.png"))
+        self.assertIsNone(resolve_static_url("/about", self.static))
+        self.assertIsNone(resolve_static_url("https://example.com/paper.pdf", self.static))
+        self.assertIsNone(resolve_static_url("../../etc/passwd", self.static, "blog"))
+
+    def test_build_records_and_persists_graph(self):
+        self.build()
+        graph = self.graph()
+        index = os.path.join(self.public, "index.html")
+        post = os.path.join(self.public, "blog", "post.html")
+        source = os.path.join(self.content, "index.md")
+        self.assertEqual(graph.source(index), dependency_key(source))
+        self.assertEqual(set(graph.outputs[dependency_key(index)]), {dependency_key(path) for path in (
+            source, self.template, os.path.join(self.static, "index.css"), os.path.join(self.static, "paper.pdf"))})
+        self.assertEqual(graph.affected([os.path.join(self.static, "images", "logo.png")]), {dependency_key(post)})
+        self.assertEqual(graph.affected([self.template]), {dependency_key(index), dependency_key(post)})
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.build()
+        self.assertEqual(list(self.graph().outputs), [dependency_key(index)])
+
+    def test_changed_asset_regenerates_only_referencing_pages(self):
+        self.build(fingerprint=True)
+        self.write(os.path.join(self.static, "images", "logo.png"), "new png")
+        stats = self.build(fingerprint=True)
+        self.assertEqual((stats.generated, stats.skipped), (1, 1))
+        with open(os.path.join(self.public, "blog", "post.html")) as file:
+            self.assertIn(f'src="{self.assets["/images/logo.png"]}"', file.read())
+        self.write(os.path.join(self.static, "index.css"), "body { margin: 0; }")
+        stats = self.build(fingerprint=True)
+        self.assertEqual((stats.generated, stats.skipped), (2, 0))
+
+    def test_changed_asset_without_graph_regenerates_everything(self):
+        self.build(fingerprint=True)
+        os.remove(self.graph_path)
+        self.write(os.path.join(self.static, "images", "logo.png"), "new png")
+        stats = self.build(fingerprint=True)
+        self.assertEqual((stats.generated, stats.skipped), (2, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
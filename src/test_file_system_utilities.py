@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import file_system_utilities
+from build_manifest import hash_file
+from file_system_utilities import copy_file_fast, open_for_write, sync_static_dir, write_file
+from site_test_case import SiteTestCase
+
+
+class testSyncStaticDir(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png bytes")
+
+    def test_first_sync_copies_everything(self):
+        stats = sync_static_dir(self.static, self.public, self.static_manifest)
+        self.assertEqual((stats.copied, stats.unchanged, stats.removed), (2, 0, 0))
+        self.assertEqual(self.read(os.path.join(self.public, "images", "a.png")), "png bytes")
+
+    def test_unchanged_files_are_not_copied(self):
+        sync_static_dir(self.static, self.public, self.static_manifest)
+        stats = sync_static_dir(self.static, self.public, self.static_manifest)
+        self.assertEqual((stats.copied, stats.unchanged), (0, 2))
+
+    def test_changed_file_is_copied(self):
+        sync_static_dir(self.static, self.public, self.static_manifest)
+        path = os.path.join(self.static, "index.css")
+        self.write(path, "body { color: red; }")
+        stats = sync_static_dir(self.static, self.public, self.static_manifest)
+        self.assertEqual((stats.copied, stats.unchanged), (1, 1))
+        self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body { color: red; }")
+
+    def test_touched_file_with_hash_is_not_copied(self):
+        sync_static_dir(self.static, self.public, self.static_manifest, use_hash=True)
+        os.utime(os.path.join(self.static, "index.css"), ns=(1, 1))
+        stats = sync_static_dir(self.static, self.public, self.static_manifest, use_hash=True)
+        self.assertEqual((stats.copied, stats.unchanged), (0, 2))
+
+    def test_orphans_are_removed_but_generated_files_kept(self):
+        sync_static_dir(self.static, self.public, self.static_manifest)
+        self.write(os.path.join(self.public, "index.html"), "generated page")
+        shutil.rmtree(os.path.join(self.static, "images"))
+        stats = sync_static_dir(self.static, self.public, self.static_manifest)
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_missing_destination_is_a_full_sync(self):
+        sync_static_dir(self.static, self.public, self.static_manifest)
+        shutil.rmtree(self.public)
+        stats = sync_static_dir(self.static, self.public, self.static_manifest)
+        self.assertEqual(stats.copied, 2)
+
+    def test_deleted_copy_is_copied_again(self):
+        for use_hash in (False, True):
+            sync_static_dir(self.static, self.public, self.static_manifest, use_hash=use_hash)
+            os.remove(os.path.join(self.public, "index.css"))
+            stats = sync_static_dir(self.static, self.public, self.static_manifest, use_hash=use_hash)
+            self.assertEqual((stats.copied, stats.unchanged), (1, 1))
+            self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body {}")
+
+    def test_copy_file_fast_link(self):
+        source = os.path.join(self.static, "index.css")
+        destination = os.path.join(self.root, "linked.css")
+        self.assertEqual(copy_file_fast(source, destination, link=True), "link")
+        self.assertEqual(os.stat(source).st_ino, os.stat(destination).st_ino)
+
+    def test_copy_file_fast_replaces_existing_file(self):
+        source = os.path.join(self.static, "index.css")
+        destination = os.path.join(self.root, "copy.css")
+        self.write(destination, "old content that is longer")
+        method = copy_file_fast(source, destination)
+        self.assertIn(method, ("reflink", "copy_file_range", "copy"))
+        self.assertEqual(self.read(destination), "body {}")
+        self.assertEqual(os.stat(source).st_mtime_ns, os.stat(destination).st_mtime_ns)
+
+    def test_fingerprinted_copies(self):
+        stats = sync_static_dir(self.static, self.public, self.static_manifest, fingerprint=True)
+        css = "/index." + hash_file(os.path.join(self.static, "index.css"))[:8] + ".css"
+        self.assertEqual(stats.assets["/index.css"], css)
+        self.assertEqual(set(stats.assets), {"/index.css", "/images/a.png"})
+        self.assertEqual(self.read(self.public + css), "body {}")
+        self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body {}")
+
+    def test_unchanged_assets_are_not_hashed_again(self):
+        first = sync_static_dir(self.static, self.public, self.static_manifest, fingerprint=True)
+        with mock.patch.object(file_system_utilities, "hash_file", wraps=hash_file) as hashed:
+            stats = sync_static_dir(self.static, self.public, self.static_manifest, fingerprint=True)
+        self.assertEqual(hashed.call_count, 0)
+        self.assertEqual(stats.assets, first.assets)
+        self.assertEqual(stats.unchanged, 2)
+
+    def test_changed_asset_gets_a_new_fingerprint(self):
+        old = sync_static_dir(self.static, self.public, self.static_manifest, fingerprint=True).assets["/index.css"]
+        self.write(os.path.join(self.static, "index.css"), "body { margin: 0; }")
+        new = sync_static_dir(self.static, self.public, self.static_manifest, fingerprint=True).assets["/index.css"]
+        self.assertNotEqual(old, new)
+        self.assertFalse(os.path.exists(self.public + old))
+        self.assertEqual(self.read(self.public + new), "body { margin: 0; }")
+
+    def test_deleted_asset_removes_its_fingerprinted_copy(self):
+        fingerprinted = sync_static_dir(self.static, self.public, self.static_manifest, fingerprint=True).assets["/images/a.png"]
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        stats = sync_static_dir(self.static, self.public, self.static_manifest, fingerprint=True)
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(self.public + fingerprinted))
+        self.assertNotIn("/images/a.png", stats.assets)
+
+
+class testWriteFile(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "public", "blog", "index.html")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def read(self):
+        with open(self.path) as file:
+            return file.read()
+
+    def test_identical_content_is_left_untouched(self):
+        self.assertTrue(write_file("<p>page</p>", self.path, skip_unchanged=True))
+        os.utime(self.path, ns=(0, 0))
+        with mock.patch.object(file_system_utilities.os, "replace") as replace:
+            self.assertFalse(write_file("<p>page</p>", self.path, skip_unchanged=True))
+        replace.assert_not_called()
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+
+    def test_changed_content_of_same_size_is_replaced(self):
+        write_file("<p>page</p>", self.path, skip_unchanged=True)
+        self.assertTrue(write_file("<p>Page</p>", self.path, skip_unchanged=True))
+        self.assertEqual(self.read(), "<p>Page</p>")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+    def test_known_directories_are_not_created_again(self):
+        write_file("one", self.path)
+        with mock.patch.object(file_system_utilities.os, "makedirs") as makedirs:
+            write_file("two", os.path.join(os.path.dirname(self.path), "other.html"))
+        makedirs.assert_not_called()
+
+    def test_removed_known_directory_is_created_again(self):
+        write_file("one", self.path)
+        shutil.rmtree(os.path.join(self.root, "public"))
+        write_file("two", self.path, skip_unchanged=True)
+        self.assertEqual(self.read(), "two")
+
+    def test_open_for_write_skips_unchanged_and_discards_on_error(self):
+        with open_for_write(self.path, skip_unchanged=True) as file:
+            file.write("<p>page</p>")
+        os.utime(self.path, ns=(0, 0))
+        with open_for_write(self.path, skip_unchanged=True) as file:
+            file.write("<p>page</p>")
+        self.assertEqual((file.written, os.stat(self.path).st_mtime_ns), (False, 0))
+        with self.assertRaises(RuntimeError):
+            with open_for_write(self.path, skip_unchanged=True) as file:
+                file.write("<p>half")
+                raise RuntimeError("render failed")
+        self.assertEqual(self.read(), "<p>page</p>")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
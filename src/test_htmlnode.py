@@ -1,7 +1,8 @@
+import io
 import unittest
 
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, iter_html, write_html
 
 
 class testHTMLNode(unittest.TestCase):
@@ -39,5 +40,58 @@ class testHTMLNode(unittest.TestCase):
     #    self.assert
         
 
+    def test_iter_html_matches_to_html(self):
+        node = ParentNode("div", [
+            ParentNode("p", [LeafNode(None, "text "), LeafNode("b", "bold"), LeafNode("a", "link", {"href": "/x"})]),
+            ParentNode("ul", []),
+            ParentNode("", [LeafNode("i", "bare")]),
+            ParentNode("", []),
+        ], {"class": "page"})
+        self.assertEqual("".join(iter_html(node)), '<div class="page"><p>text <b>bold</b><a href="/x">link</a></p><ul></ul><i>bare</i><></></div>')
+        self.assertEqual(node.to_html(), "".join(iter_html(node)))
+
+    def test_iter_html_deep_tree(self):
+        node = LeafNode("span", "leaf")
+        for _ in range(5000):
+            node = ParentNode("div", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<div><div>"))
+        self.assertEqual(len(html), 5000 * len("<div></div>") + len("<span>leaf</span>"))
+
+    def test_iter_html_lazy_children(self):
+        node = ParentNode("div", (LeafNode("p", str(x)) for x in range(3)))
+        self.assertEqual("".join(iter_html(node)), "<div><p>0</p><p>1</p><p>2</p></div>")
+
+    def test_parent_to_html_errors(self):
+        with self.assertRaises(ValueError):
+            ParentNode(None, []).to_html()
+        with self.assertRaises(ValueError):
+            ParentNode("p", None).to_html()
+        with self.assertRaises(ValueError):
+            ParentNode("div", [LeafNode("p", None)]).to_html()
+
+    def test_write_html_text_and_binary_streams(self):
+        node = ParentNode("p", [LeafNode(None, "caf\u00e9 " * 10), LeafNode("b", "bold")])
+        text_stream = io.StringIO()
+        binary_stream = io.BytesIO()
+        written = write_html(node, text_stream, buffer_size=8)
+        write_html(node, binary_stream, buffer_size=8)
+        self.assertEqual(text_stream.getvalue(), node.to_html())
+        self.assertEqual(binary_stream.getvalue(), node.to_html().encode("utf-8"))
+        self.assertEqual(written, len(node.to_html()))
+
+
+    def test_nodes_are_slotted(self):
+        for node in (HTMLNode("p"), LeafNode("b", "bold"), ParentNode("div", [])):
+            self.assertFalse(hasattr(node, "__dict__"))
+            with self.assertRaises(AttributeError):
+                node.extra = 1
+
+    def test_empty_props_are_shared(self):
+        self.assertIsNone(LeafNode("b", "bold", {}).props)
+        self.assertEqual(LeafNode("b", "bold", {}), LeafNode("b", "bold"))
+        self.assertEqual(LeafNode("b", "bold", {}).to_html(), "<b>bold</b>")
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
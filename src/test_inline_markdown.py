@@ -1,4 +1,6 @@
+import itertools
 import unittest
+from benchmark_inline import text_to_textnodes_chained
 from inline_markdown import *
 
 from textnode import (
@@ -275,5 +277,70 @@ class TestInlineMarkdown(unittest.TestCase):
         self.assertListEqual(result,expected)  
         
                 
+    def test_tokenize_inline_matches_chained_passes(self):
+        fragments = [
+            "plain text",
+            "**bold**",
+            "*italic*",
+            "`code`",
+            "![image](/b.png)",
+            "[link](/a)",
+            "[![build](/badge.svg)](https://ci)",
+            "[a *b* link](/c)",
+            "![x *y*](/z.png)",
+            "`**not bold**`",
+            "[x](/a*b)",
+            "![](/empty-alt.png)",
+            "1. [ ] a list [item] with (parens)",
+            "a ! and a [ bracket ]",
+            "a****b",
+        ]
+        texts = [" ".join(parts) for parts in itertools.product(fragments, repeat=3)]
+        texts += ["".join(parts) for parts in itertools.product(fragments, repeat=2)]
+        for text in texts:
+            try:
+                expected = text_to_textnodes_chained(text)
+            except ValueError:
+                with self.assertRaises(ValueError, msg=text):
+                    tokenize_inline(text)
+                continue
+            self.assertListEqual(tokenize_inline(text), expected, text)
+
+    def test_tokenize_inline_image_inside_link(self):
+        self.assertListEqual(tokenize_inline("[![build](/badge.svg)](https://ci)"), [
+            TextNode("[", text_type_text),
+            TextNode("build", text_type_image, "/badge.svg"),
+            TextNode("](https://ci)", text_type_text),
+        ])
+
+    def test_tokenize_inline_unclosed_delimiter(self):
+        for text in ("a **bold", "an *italic", "some `code"):
+            with self.assertRaises(ValueError):
+                tokenize_inline(text)
+
+    def test_tokenize_inline_many_links(self):
+        text = " ".join(f"[page {x}](/pages/{x})" for x in range(500))
+        result = tokenize_inline(text)
+        self.assertEqual(len(result), 999)
+        self.assertEqual(result[-1], TextNode("page 499", text_type_link, "/pages/499"))
+
+    def test_text_to_textnodes_memo_hits_are_fresh_nodes(self):
+        text = "a repeated **nav** [link](/home)"
+        first = text_to_textnodes(text)
+        second = text_to_textnodes(text)
+        hits = textnodes_memo.hits
+        third = text_to_textnodes(text)
+        self.assertEqual(textnodes_memo.hits, hits + 1)
+        self.assertEqual(first, third)
+        self.assertIsNot(second[1], third[1])
+        third[1].text = "changed"
+        self.assertEqual(text_to_textnodes(text)[1], TextNode("nav", text_type_bold))
+
+    def test_text_to_textnodes_memo_does_not_hide_errors(self):
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                text_to_textnodes("an **unclosed delimiter")
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
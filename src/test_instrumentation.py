@@ -0,0 +1,98 @@
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from instrumentation import Tracer, build_report, percentile, tracer, write_chrome_trace
+from site_gen import _generate_chunk, generate_page
+from site_test_case import SiteTestCase
+
+
+class testInstrumentation(SiteTestCase):
+
+    def test_disabled_tracer_hands_out_shared_null_span(self):
+        disabled = Tracer()
+        self.assertIs(disabled.span("read"), disabled.span("write", path="x"))
+        self.assertIs(disabled.page("x"), disabled.span("read"))
+        with disabled.span("read"):
+            pass
+        self.assertEqual(disabled.totals, {})
+
+    def test_page_collects_stages(self):
+        enabled = Tracer()
+        enabled.enable(keep_events=True)
+        with enabled.page("a.md"):
+            with enabled.span("read"):
+                pass
+            enabled.add("inline", 500)
+        with enabled.span("static_copy", path="a.png"):
+            pass
+        self.assertEqual(len(enabled.pages), 1)
+        self.assertEqual(set(enabled.pages[0]["stages"]), {"read", "inline"})
+        self.assertEqual(enabled.files[0]["path"], "a.png")
+        self.assertEqual([event["name"] for event in enabled.events], ["read", "page", "static_copy"])
+
+    def test_drain_and_merge(self):
+        worker = Tracer()
+        worker.enable()
+        with worker.page("a.md"):
+            worker.add("inline", 10)
+        parent = Tracer()
+        parent.merge(worker.drain())
+        self.assertEqual(worker.pages, [])
+        self.assertEqual(parent.totals["inline"], 10)
+        self.assertEqual(len(parent.pages), 1)
+
+    def test_report_lists_slowest_pages(self):
+        traced = Tracer()
+        traced.pages = [{"path": f"{x}.md", "ns": x * 1000, "stages": {"read": x}} for x in range(20)]
+        traced.totals = {"read": 190}
+        report = build_report(traced, 1.0, top=3)
+        self.assertEqual([page["path"] for page in report["slowest_pages"]], ["19.md", "18.md", "17.md"])
+        self.assertEqual(report["pages"], 20)
+        self.assertEqual(report["percentiles"]["page"]["max"], 19000 / 1e9)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_instrumented_page_matches_uninstrumented(self):
+        source = os.path.join(self.content, "page.md")
+        self.write(source, "# Title\n\nsome **bold** text\n\n* a\n* [b](/b)")
+        plain = os.path.join(self.public, "plain.html")
+        traced = os.path.join(self.public, "traced.html")
+        trace_path = os.path.join(self.root, "trace.json")
+        with redirect_stdout(StringIO()):
+            generate_page(source, self.template, plain)
+            tracer.enable(keep_events=True)
+            try:
+                generate_page(source, self.template, traced)
+                stages = set(tracer.pages[-1]["stages"])
+                write_chrome_trace(tracer, trace_path)
+            finally:
+                tracer.disable()
+                tracer.reset()
+        self.assertEqual(self.read(plain), self.read(traced))
+        self.assertEqual(stages, {"read", "blocks", "classify", "inline", "title", "render", "template", "write"})
+        self.assertTrue(all(event["ph"] == "X" for event in json.loads(self.read(trace_path))["traceEvents"]))
+
+    def test_worker_keeps_events_it_was_asked_for(self):
+        source = os.path.join(self.content, "page.md")
+        self.write(source, "# Title\n\ntext")
+        # a spawned worker starts with a fresh, disabled tracer
+        self.assertFalse(tracer.enabled)
+        try:
+            with redirect_stdout(StringIO()):
+                collected = _generate_chunk([(source, os.path.join(self.public, "page.html"))], self.template,
+                                            True, True)[3]
+        finally:
+            tracer.disable()
+            tracer.reset()
+        self.assertTrue(collected["events"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from memo import LRUMemo, memo_stats, memos, stats_delta
+
+
+class testLRUMemo(unittest.TestCase):
+
+    def memo(self, name, **options):
+        # memos register themselves for the build stats, the test ones must not outlive their test
+        memo = LRUMemo(name, **options)
+        self.addCleanup(memos.pop, name)
+        return memo
+
+    def remember(self, memo, key, value):
+        if memo.get(key) is None and memo.admit(key):
+            memo.put(key, value)
+
+    def test_key_is_admitted_on_second_miss(self):
+        memo = self.memo("test_admit")
+        self.remember(memo, "a", ("A",))
+        self.assertIsNone(memo.get("a"))
+        self.remember(memo, "a", ("A",))
+        self.assertEqual(memo.get("a"), ("A",))
+        self.assertEqual(memo.stats(), {"hits": 1, "misses": 3, "evictions": 0})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        memo = self.memo("test_evict", maxsize=2)
+        for key in ("a", "b"):
+            memo.admit(key)
+            memo.put(key, (key,))
+        memo.get("a")
+        memo.admit("c")
+        memo.put("c", ("c",))
+        self.assertEqual(memo.evictions, 1)
+        self.assertIsNone(memo.get("b"))
+        self.assertEqual(memo.get("a"), ("a",))
+
+    def test_long_keys_are_never_admitted(self):
+        memo = self.memo("test_long", max_key_length=4)
+        for _ in range(3):
+            self.assertIsNone(memo.get("longer"))
+            self.assertFalse(memo.admit("longer"))
+        self.assertEqual(memo.stats(), {"hits": 0, "misses": 0, "evictions": 0})
+
+    def test_stats_delta(self):
+        memo = self.memo("test_delta")
+        before = memo_stats()
+        memo.get("a")
+        delta = stats_delta(before, memo_stats())
+        self.assertEqual(delta["test_delta"], {"hits": 0, "misses": 1, "evictions": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from block_cache import BlockCache
+from block_markdown import markdown_to_html_node, use_block_cache
+from page_metadata import Heading, PageMetadata, parse_front_matter, slugify
+from site_gen import extract_title, generate_page
+from site_test_case import SiteTestCase
+
+
+class testPageMetadata(SiteTestCase):
+    template_text = "<title>{{ Title }}</title><p>{{ author }}, {{ WordCount }} words</p>{{ Toc }}{{ Content }}"
+
+    def collect(self, markdown, **options):
+        metadata = PageMetadata(**options)
+        html = markdown_to_html_node(markdown, metadata).to_html()
+        return metadata, html
+
+    def test_title_matches_extract_title(self):
+        for markdown in (
+            "# Title\n\nsome text",
+            "intro\n\n   # Spaced title   \n\n# second",
+            "```\ncode\n```\n\nparagraph\n# Inside a paragraph",
+            "## Not a title\n\n# Real title\nwith more text",
+        ):
+            metadata, _ = self.collect(markdown)
+            self.assertEqual(metadata.page_title(), extract_title(markdown))
+        metadata, _ = self.collect("## no h1 here")
+        with self.assertRaises(ValueError):
+            metadata.page_title()
+
+    def test_heading_outline_and_ids(self):
+        markdown = "# Guide\n\n## Getting **Started**!\n\ntext\n\n### Install `pip`\n\n## Getting Started"
+        metadata, html = self.collect(markdown)
+        self.assertEqual(metadata.headings, [
+            Heading(1, "Guide", "guide"),
+            Heading(2, "Getting Started!", "getting-started"),
+            Heading(3, "Install pip", "install-pip"),
+            Heading(2, "Getting Started", "getting-started-1"),
+        ])
+        self.assertNotIn("id=", html)
+        _, html = self.collect(markdown, toc=True)
+        self.assertIn('<h2 id="getting-started">Getting <b>Started</b>!</h2>', html)
+        self.assertIn('<h2 id="getting-started-1">', html)
+
+    def test_toc_node(self):
+        metadata, _ = self.collect("# T\n\n## A\n\n### A1\n\n### A2\n\n## B\n\n#### B1", toc=True)
+        self.assertEqual(metadata.toc_node().to_html(),
+            '<nav class="toc"><ul>'
+            '<li><a href="#a">A</a><ul><li><a href="#a1">A1</a></li><li><a href="#a2">A2</a></li></ul></li>'
+            '<li><a href="#b">B</a><ul><li><a href="#b1">B1</a></li></ul></li>'
+            '</ul></nav>')
+        metadata, _ = self.collect("# only a title", toc=True)
+        self.assertIsNone(metadata.toc_node())
+        self.assertEqual(metadata.template_values()["Toc"], "")
+
+    def test_front_matter(self):
+        markdown = ('---\ntitle: "Front Title"\ntags: [a, b]\nauthors:\n  - Ann\n  - \'Bo\'\n# comment\ndate: 2024-01-02\n---'
+                    '\n\n# Heading title\n\ntext')
+        metadata, html = self.collect(markdown)
+        self.assertEqual(metadata.front_matter,
+                         {"title": "Front Title", "tags": ["a", "b"], "authors": ["Ann", "Bo"], "date": "2024-01-02"})
+        self.assertEqual(html, "<div><h1>Heading title</h1><p>text</p></div>")
+        values = metadata.template_values()
+        self.assertEqual((values["Title"], values["tags"], values["date"]), ("Front Title", "a, b", "2024-01-02"))
+        self.assertIsNone(parse_front_matter("---\nnot front matter\n---"))
+        _, html = self.collect("---\nnot front matter\n---")
+        self.assertEqual(html, "<div><p>---\nnot front matter\n---</p></div>")
+
+    def test_word_count(self):
+        metadata, _ = self.collect("# Two words\n\n* one\n* [link text](/url)\n\n```\nx = 1\n```", word_count=True)
+        self.assertEqual(metadata.word_count, 7)
+
+    def test_slugify(self):
+        self.assertEqual(slugify("  Hello,   World! "), "hello-world")
+        self.assertEqual(slugify("snake_case and-dash"), "snake_case-and-dash")
+        self.assertEqual(slugify("!!!"), "section")
+
+    def test_cached_blocks_keep_heading_ids(self):
+        markdown = "# T\n\n## Same\n\n## Same"
+        expected = self.collect(markdown, toc=True)[1]
+        with BlockCache(os.path.join(self.root, ".build", "blocks.sqlite")) as cache:
+            use_block_cache(cache)
+            try:
+                self.assertNotIn("id=", self.collect(markdown)[1])
+                self.assertEqual(self.collect(markdown, toc=True)[1], expected)
+                self.assertEqual(self.collect(markdown, toc=True)[1], expected)
+            finally:
+                use_block_cache(None)
+
+    def test_template_consumes_metadata(self):
+        source = os.path.join(self.content, "page.md")
+        dest = os.path.join(self.public, "page.html")
+        self.write(source, "---\nauthor: Ann\n---\n\n# Page\n\n## Part one\n\nsome text")
+        with redirect_stdout(StringIO()):
+            generate_page(source, self.template, dest)
+        self.assertEqual(self.read(dest),
+            '<title>Page</title><p>Ann, 5 words</p>'
+            '<nav class="toc"><ul><li><a href="#part-one">Part one</a></li></ul></nav>'
+            '<div><h1 id="page">Page</h1><h2 id="part-one">Part one</h2><p>some text</p></div>')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from site_gen import chunk_pages, default_chunk_size, generate_pages_recursive
+from site_test_case import SiteTestCase
+
+
+class testParallelBuild(SiteTestCase):
+    template_text = "<title>{{ Title }}</title><article>{{ Content }}</article>"
+
+    def setUp(self):
+        super().setUp()
+        for x in range(12):
+            self.write(os.path.join(self.content, f"section{x % 3}", f"page{x}.md"),
+                       f"# Page {x}\n\nsome **bold** text\n\n* item [link](/page{x})\n* item `code`")
+
+    def test_parallel_output_matches_serial(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        with redirect_stdout(StringIO()):
+            generate_pages_recursive(self.content, self.template, serial)
+            stats = generate_pages_recursive(self.content, self.template, parallel, workers=3, chunk_size=2)
+        self.assertEqual(stats.generated, 12)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_parallel_reports_worker_throughput(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            generate_pages_recursive(self.content, self.template, os.path.join(self.root, "out"), workers=2)
+        self.assertIn("pages/s", output.getvalue())
+
+    def test_chunk_pages(self):
+        pages = [(str(x), str(x)) for x in range(5)]
+        self.assertEqual([len(chunk) for chunk in chunk_pages(pages, 2)], [2, 2, 1])
+
+    def test_default_chunk_size(self):
+        self.assertEqual(default_chunk_size(0, 4), 1)
+        self.assertEqual(default_chunk_size(100, 4), 7)
+        self.assertEqual(default_chunk_size(100000, 4), 64)
+
+
+if __name__ == "__main__":
+    unittest.main()
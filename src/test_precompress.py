@@ -0,0 +1,67 @@
+import os
+import gzip
+import unittest
+
+from precompress import available_codecs, gzip_compress, precompress_dir
+from site_test_case import SiteTestCase
+
+
+class testPrecompress(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.precompress_manifest = os.path.join(self.root, ".build", "precompress_manifest.json")
+        self.page = os.path.join(self.public, "blog", "post.html")
+        self.write(self.page, "<p>some repeated text</p>" * 200)
+
+    def test_gzip_variant_round_trips(self):
+        stats = precompress_dir(self.public, self.precompress_manifest)
+        self.assertEqual(stats.compressed, 1)
+        with gzip.open(self.page + ".gz") as compressed, open(self.page, 'rb') as original:
+            self.assertEqual(compressed.read(), original.read())
+        self.assertEqual(os.stat(self.page + ".gz").st_mtime_ns, os.stat(self.page).st_mtime_ns)
+
+    def test_gzip_output_is_deterministic(self):
+        self.assertEqual(gzip_compress(b"same input" * 100), gzip_compress(b"same input" * 100))
+
+    def test_only_changed_content_is_recompressed(self):
+        precompress_dir(self.public, self.precompress_manifest)
+        self.assertEqual(precompress_dir(self.public, self.precompress_manifest).unchanged, 1)
+        self.write(self.page, "<p>some repeated text</p>" * 200)
+        stats = precompress_dir(self.public, self.precompress_manifest)
+        self.assertEqual((stats.compressed, stats.unchanged), (0, 1))
+        self.write(self.page, "<p>other repeated text</p>" * 200)
+        self.assertEqual(precompress_dir(self.public, self.precompress_manifest).compressed, 1)
+
+    def test_missing_variant_is_rewritten(self):
+        precompress_dir(self.public, self.precompress_manifest)
+        os.remove(self.page + ".gz")
+        self.assertEqual(precompress_dir(self.public, self.precompress_manifest).compressed, 1)
+        self.assertTrue(os.path.exists(self.page + ".gz"))
+
+    def test_small_binary_and_incompressible_files_are_skipped(self):
+        self.write(os.path.join(self.public, "small.css"), "body{}")
+        self.write(os.path.join(self.public, "image.png"), b"\x89PNG" * 1000)
+        self.write(os.path.join(self.public, "random.js"), os.urandom(4096))
+        stats = precompress_dir(self.public, self.precompress_manifest)
+        self.assertEqual((stats.compressed, stats.skipped), (2, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "small.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "image.png.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "random.js.gz")))
+
+    def test_variants_of_removed_files_are_deleted(self):
+        precompress_dir(self.public, self.precompress_manifest)
+        os.remove(self.page)
+        self.assertEqual(precompress_dir(self.public, self.precompress_manifest).removed, 1)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+
+    def test_new_codec_recompresses(self):
+        precompress_dir(self.public, self.precompress_manifest)
+        codecs = dict(available_codecs())
+        codecs[".test"] = lambda data: data[:10]
+        self.assertEqual(precompress_dir(self.public, self.precompress_manifest, codecs=codecs).compressed, 1)
+        self.assertTrue(os.path.exists(self.page + ".test"))
+
+
+if __name__ == "__main__":
+    unittest.main()
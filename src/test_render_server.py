@@ -0,0 +1,158 @@
+import os
+import threading
+import unittest
+import http.client
+from contextlib import redirect_stdout
+from io import StringIO
+
+from render_server import CachedPage, PageCache, RenderServer, etag_matches
+from site_gen import generate_page
+from site_test_case import SiteTestCase
+
+
+class testRenderServer(SiteTestCase):
+    template_text = "<title>{{ Title }}</title><main>{{ Content }}</main>"
+
+    def setUp(self):
+        super().setUp()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nwelcome **home**")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\n* one\n* two")
+        self.write(os.path.join(self.static, "index.css"), "body { color: red; }")
+        self.write(os.path.join(self.static, "images", "logo.png"), "\x89PNG")
+        self.server = RenderServer(("127.0.0.1", 0), self.content, self.static, self.template)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=10)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def get(self, path, headers=None):
+        self.connection.request("GET", path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_page_matches_generated_page(self):
+        generated = os.path.join(self.public, "index.html")
+        with redirect_stdout(StringIO()):
+            generate_page(os.path.join(self.content, "index.md"), self.template, generated)
+        with open(generated, 'rb') as file:
+            expected = file.read()
+        for path in ("/", "/index.html"):
+            response, body = self.get(path)
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.getheader("Content-Type"), "text/html; charset=utf-8")
+            self.assertEqual(body, expected)
+        self.assertEqual(self.server.cache.stats(), {"hits": 1, "misses": 1, "evictions": 0})
+
+    def test_crlf_page_matches_generated_page(self):
+        source = os.path.join(self.content, "blog", "windows.md")
+        self.write(source, b"# Windows\r\n\r\n* one\r\n* two\r\n\r\n```\r\ncode\rline\r\n```\r\n")
+        generated = os.path.join(self.public, "blog", "windows.html")
+        with redirect_stdout(StringIO()):
+            generate_page(source, self.template, generated)
+        response, body = self.get("/blog/windows.html")
+        self.assertEqual(response.status, 200)
+        with open(generated, 'rb') as file:
+            self.assertEqual(body, file.read())
+        self.assertNotIn(b"\r", body)
+
+    def test_etag_revalidation(self):
+        response, _ = self.get("/blog/")
+        etag = response.getheader("ETag")
+        response, body = self.get("/blog/", {"If-None-Match": etag})
+        self.assertEqual((response.status, body), (304, b""))
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\n* one\n* two\n* three")
+        response, body = self.get("/blog/", {"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertIn(b"<li>three</li>", body)
+
+    def test_touched_source_is_not_rendered_again(self):
+        self.get("/")
+        source = os.path.join(self.content, "index.md")
+        os.utime(source, ns=(0, 0))
+        self.get("/")
+        self.assertEqual(self.server.cache.misses, 1)
+
+    def test_template_change_renders_again(self):
+        self.get("/")
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        _, body = self.get("/")
+        self.assertTrue(body.startswith(b"<h1>Home</h1>"))
+        self.assertEqual(self.server.cache.misses, 2)
+
+    def test_static_files(self):
+        response, body = self.get("/index.css")
+        self.assertEqual((response.status, body), (200, b"body { color: red; }"))
+        self.assertEqual(response.getheader("Content-Type"), "text/css")
+        response, body = self.get("/index.css", {"If-None-Match": response.getheader("ETag")})
+        self.assertEqual(response.status, 304)
+        response, _ = self.get("/images/logo.png")
+        self.assertEqual(response.getheader("Content-Type"), "image/png")
+
+    def test_directory_without_slash_redirects(self):
+        response, _ = self.get("/blog")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/blog/")
+
+    def test_missing_and_escaping_paths(self):
+        for path in ("/missing.html", "/../template.html", "/%2e%2e/template.html"):
+            response, _ = self.get(path)
+            self.assertEqual(response.status, 404)
+
+
+    def test_concurrent_renders(self):
+        paths = []
+        for x in range(20):
+            paths.append(os.path.join(self.content, f"page{x}.md"))
+            self.write(paths[-1], f"# Page {x}\n\n" + " ".join(f"**bold {y}** and `code {x % 3}`" for y in range(50)))
+        errors = []
+
+        def request(offset):
+            try:
+                for x in range(60):
+                    self.server.page(paths[(x + offset) % len(paths)])
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=request, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        stats = self.server.cache.stats()
+        self.assertEqual(stats["hits"] + stats["misses"], 8 * 60)
+
+
+class testPageCache(unittest.TestCase):
+
+    def page(self, size):
+        return CachedPage((0, 0), (0, 0), "hash", b"x" * size)
+
+    def test_evicts_least_recently_used_by_size(self):
+        cache = PageCache(max_bytes=250)
+        cache.put("a", self.page(100))
+        cache.put("b", self.page(100))
+        cache.get("a")
+        cache.put("c", self.page(100))
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual((cache.size, cache.evictions), (200, 1))
+
+    def test_page_larger_than_budget_is_not_stored(self):
+        cache = PageCache(max_bytes=50)
+        cache.put("a", self.page(100))
+        self.assertIsNone(cache.get("a"))
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"a", W/"b"', '"b"'))
+        self.assertTrue(etag_matches('*', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from async_pipeline import PipelineOptions
+from search_index import (SearchIndex, delta_decode, delta_encode, index_page, page_url, search, shard_name,
+                          text_terms)
+from site_gen import STREAM_THRESHOLD, generate_pages_recursive
+from site_test_case import SiteTestCase
+from split_page import SplitOptions
+
+
+class testSearchIndex(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.state = os.path.join(self.root, ".build", "search_index.json")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome to the **Rivendell** library")
+        self.write(os.path.join(self.content, "blog", "elves.md"),
+                   "# Elves\n\n* Rivendell [elrond](/elrond)\n* Lothlórien\n\n```\nmithril = 1\n```")
+        self.write(os.path.join(self.content, "blog", "dwarves.md"), "# Dwarves\n\nMoria and ![mithril](/mail.png)")
+
+    def build(self, incremental=True, **options):
+        return super().build(incremental, search_index=SearchIndex.load(self.state), **options)
+
+    def search(self, query):
+        return search(os.path.join(self.public, "search"), query)
+
+    def read_index(self):
+        directory = os.path.join(self.public, "search")
+        files = {}
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name)) as file:
+                files[name] = file.read()
+        return files
+
+    def test_search_published_index(self):
+        self.build()
+        self.assertCountEqual(self.search("rivendell"), [("/", "Home"), ("/blog/elves.html", "Elves")])
+        self.assertEqual(self.search("Rivendell elrond"), [("/blog/elves.html", "Elves")])
+        self.assertEqual(self.search("mithril"), [("/blog/elves.html", "Elves")])
+        self.assertEqual(self.search("lothlórien"), [("/blog/elves.html", "Elves")])
+        self.assertEqual(self.search("moria isengard"), [])
+        # link urls and image sources are not text
+        self.assertEqual(self.search("mail"), [])
+
+    def test_only_pages_this_build_skipped_are_tokenized(self):
+        with mock.patch("site_gen.index_page", wraps=index_page) as indexed:
+            self.build(workers=2)
+            self.build(workers=2)
+            self.write(os.path.join(self.content, "blog", "dwarves.md"), "# Dwarves\n\nErebor")
+            self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome")
+            # rendered in worker processes, which send their terms back
+            self.build(workers=2)
+            self.build(incremental=False, pipeline=PipelineOptions(renderers=2))
+            self.assertEqual(indexed.call_count, 0)
+            # the index lost its state, the pages the build skipped are tokenized once more
+            os.remove(self.state)
+            self.build()
+            self.assertEqual(indexed.call_count, 3)
+        self.assertEqual(self.search("erebor"), [("/blog/dwarves.html", "Dwarves")])
+        self.assertEqual(self.search("moria"), [])
+
+    def test_every_build_mode_indexes_alike(self):
+        self.build(incremental=False)
+        serial = self.read_index()
+        block_cache = os.path.join(self.root, ".build", "blocks.sqlite")
+        modes = [
+            {"workers": 2},
+            {"pipeline": PipelineOptions(renderers=2)},
+            {"pipeline": PipelineOptions(renderers=1)},
+            {"split": SplitOptions(threshold=1, workers=2, chunk_bytes=20)},
+            # a miss fills the cache, then every block is a hit
+            {"block_cache_path": block_cache},
+            {"block_cache_path": block_cache},
+            {"block_cache_path": block_cache, "workers": 2},
+        ]
+        for streamed in (False, True):
+            with mock.patch("site_gen.STREAM_THRESHOLD", 1 if streamed else STREAM_THRESHOLD), \
+                    mock.patch("async_pipeline.STREAM_THRESHOLD", 1 if streamed else STREAM_THRESHOLD), \
+                    mock.patch("site_gen.index_page", wraps=index_page) as indexed:
+                for options in modes:
+                    shutil.rmtree(self.public)
+                    os.remove(self.state)
+                    self.build(incremental=False, **options)
+                    self.assertEqual(self.read_index(), serial, (streamed, options))
+                self.assertEqual(indexed.call_count, 0)
+        # tokenizing the pages a build skipped gives the same terms
+        self.build()
+        os.remove(self.state)
+        with mock.patch("site_gen.index_page", wraps=index_page) as indexed:
+            self.build()
+        self.assertEqual(indexed.call_count, 3)
+        self.assertEqual(self.read_index(), serial)
+
+    def test_only_changed_shards_are_written(self):
+        index = SearchIndex()
+        index.update("a.md", "1", "/a.html", "A", {"alpha", "beta"})
+        index.update("b.md", "1", "/b.html", "B", {"beta", "gamma"})
+        directory = os.path.join(self.root, "search")
+        self.assertEqual(index.write(directory), 3)
+        index.update("b.md", "2", "/b.html", "B", {"beta", "delta"})
+        # gamma's shard is gone, delta's is new
+        self.assertEqual(index.write(directory), 1)
+        self.assertFalse(os.path.exists(os.path.join(directory, shard_name("ga"))))
+        index.remove("a.md")
+        index.update("c.md", "1", "/c.html", "C", {"beta"})
+        index.write(directory)
+        # the freed id is handed to the next new page
+        self.assertEqual(index.pages["c.md"]["id"], 0)
+        self.assertEqual(search(directory, "beta"), [("/c.html", "C"), ("/b.html", "B")])
+
+    def test_removed_pages_leave_the_index(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "elves.md"))
+        self.build()
+        self.assertEqual(self.search("rivendell"), [("/", "Home")])
+        self.assertNotIn("elves", str(SearchIndex.load(self.state).pages))
+
+    def test_helpers(self):
+        self.assertEqual(delta_encode([3, 7, 8, 20]), [3, 4, 1, 12])
+        self.assertEqual(delta_decode([3, 4, 1, 12]), [3, 7, 8, 20])
+        self.assertEqual(text_terms("The x-ray_2 of Ünicode, a"), {"the", "ray", "of", "ünicode"})
+        self.assertEqual(shard_name("ab"), "terms-ab.json")
+        self.assertEqual(shard_name("ün"), "terms-xc3bc6e.json")
+        self.assertEqual(page_url(os.path.join("public", "blog", "index.html"), "public"), "/blog/")
+        with self.assertRaises(ValueError):
+            generate_pages_recursive(self.content, self.template, self.public, search_index=SearchIndex(),
+                                     constant_memory=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
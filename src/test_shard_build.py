@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from search_index import search
+from shard_build import ShardSpec, merge_shards, parse_shard, shard_of, shard_pages, shard_paths, write_shard_info
+from site_gen import generate_pages_recursive, iter_pages
+from site_test_case import SiteTestCase
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+class testShardBuild(SiteTestCase):
+    template_text = '<title>{{ Title }}</title><link href="/index.css">{{ Content }}'
+
+    def setUp(self):
+        super().setUp()
+        self.write(os.path.join(self.static, "index.css"), "body { color: red }")
+        self.write(os.path.join(self.static, "images", "logo.png"), "png")
+        for x in range(12):
+            self.write(os.path.join(self.content, f"section{x % 3}", f"page{x}.md"),
+                       f"# Page {x}\n\nwords about topic{x} and ![logo](/images/logo.png)")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nall the topics")
+
+    def run_main(self, *args):
+        return subprocess.Popen([sys.executable, MAIN, *args], cwd=self.root, stdout=subprocess.DEVNULL)
+
+    def test_merged_shard_processes_match_a_single_build(self):
+        self.assertEqual(self.run_main("--search-index", "--fingerprint-assets").wait(), 0)
+        single = self.read_tree(self.public)
+        with open(os.path.join(self.root, ".build", "dependencies.json")) as file:
+            single_dependencies = json.load(file)
+        single_search = os.path.join(self.root, "single_search")
+        shutil.copytree(os.path.join(self.public, "search"), single_search)
+        shutil.rmtree(self.public)
+        shutil.rmtree(os.path.join(self.root, ".build"))
+
+        builds = [self.run_main("--shard", f"{x}/3", "--search-index", "--fingerprint-assets") for x in range(3)]
+        self.assertEqual([build.wait() for build in builds], [0, 0, 0])
+        shard_dirs = [os.path.join("shards", f"{x}-of-3") for x in (2, 0, 1)]
+        self.assertEqual(self.run_main("--merge-shards", *shard_dirs).wait(), 0)
+
+        merged = self.read_tree(self.public)
+        # page ids of the search index follow the order pages were added in, not their content
+        self.assertEqual({path for path in merged if not path.startswith("search")},
+                         {path for path in single if not path.startswith("search")})
+        for path in single:
+            if not path.startswith("search"):
+                self.assertEqual(merged[path], single[path], path)
+        for query in ("topic3", "topics", "page"):
+            self.assertCountEqual(search(os.path.join(self.public, "search"), query),
+                                  search(single_search, query))
+        self.assertEqual(len(search(os.path.join(self.public, "search"), "page")), 12)
+        with open(os.path.join(self.root, ".build", "dependencies.json")) as file:
+            self.assertEqual(json.load(file), single_dependencies)
+
+    def test_remerge_removes_pages_and_keeps_unchanged_files(self):
+        def build_and_merge():
+            shard_dirs = []
+            for x in range(2):
+                shard_dir = os.path.join(self.root, f"shard{x}")
+                paths = shard_paths(shard_dir)
+                with redirect_stdout(StringIO()):
+                    generate_pages_recursive(self.content, self.template, paths["output"], paths["manifest"],
+                                             shard=ShardSpec(x, 2))
+                write_shard_info(shard_dir, ShardSpec(x, 2), False)
+                shard_dirs.append(shard_dir)
+            return merge_shards(shard_dirs, self.public, self.manifest)
+
+        stats = build_and_merge()
+        self.assertEqual((stats.pages, stats.copied, stats.unchanged, stats.removed), (13, 13, 0, 0))
+        os.remove(os.path.join(self.content, "section1", "page4.md"))
+        stats = build_and_merge()
+        self.assertEqual((stats.pages, stats.copied, stats.unchanged, stats.removed), (12, 0, 12, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "section1", "page4.html")))
+        with open(self.manifest) as file:
+            self.assertEqual(len(json.load(file)["pages"]), 12)
+
+    def test_merge_rejects_missing_shards_and_conflicts(self):
+        shard_dirs = []
+        for x in range(2):
+            shard_dir = os.path.join(self.root, f"shard{x}")
+            write_shard_info(shard_dir, ShardSpec(x, 2), False)
+            shard_dirs.append(shard_dir)
+        with self.assertRaises(ValueError):
+            merge_shards(shard_dirs[:1], self.public, self.manifest)
+        with self.assertRaises(ValueError):
+            merge_shards(shard_dirs + [os.path.join(self.root, "missing")], self.public, self.manifest)
+        for x, text in enumerate(("a", "b")):
+            self.write(os.path.join(shard_paths(shard_dirs[x])["output"], "robots.txt"), text)
+        with self.assertRaises(ValueError):
+            merge_shards(shard_dirs, self.public, self.manifest)
+
+    def test_merge_can_not_watch(self):
+        build = subprocess.run([sys.executable, MAIN, "--merge-shards", "shards/0-of-1", "--watch"], cwd=self.root,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        self.assertEqual(build.returncode, 2)
+        self.assertIn(b"--merge-shards can not be combined with --watch", build.stderr)
+
+    def test_every_page_belongs_to_one_shard(self):
+        pages = list(iter_pages(self.content, self.public))
+        owned = [page for x in range(4) for page in shard_pages(pages, self.content, ShardSpec(x, 4))]
+        self.assertCountEqual(owned, pages)
+        # the partition is part of the build's contract, every machine must agree on it
+        self.assertEqual([shard_of(path, 4) for path in ("index.md", "blog/a.md", "blog/b.md", "x/y/z.md")],
+                         [3, 1, 1, 2])
+        self.assertEqual(shard_of(os.path.join("blog", "a.md"), 4), 1)
+
+    def test_parse_shard(self):
+        shard = parse_shard("2/8")
+        self.assertEqual((shard.index, shard.count, shard.name), (2, 8, "2-of-8"))
+        for text in ("8/8", "-1/8", "2", "a/b", "0/0"):
+            with self.assertRaises(ValueError):
+                parse_shard(text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,20 @@
+import io
+import os
+import sys
+import json
+import shutil
+import subprocess
+import tracemalloc
 import unittest
+from contextlib import redirect_stdout
+from io import StringIO
 
-from site_gen import extract_title
+from block_markdown import markdown_file_to_html_node
+from htmlnode import write_html
+from site_gen import extract_title, extract_title_from_file, generate_page
+from site_test_case import SiteTestCase
 
-class testSiteGen(unittest.TestCase):
+class testSiteGen(SiteTestCase):
     
     def test_extract_title_valid(self):
         markdown = """# this is a title
@@ -44,5 +56,93 @@ then there was sand, we hate sand.
 
 
 
+    def generate_loaded_and_streamed(self, source):
+        """generate source once loaded and once streamed, returning both pages."""
+        loaded = os.path.join(self.public, "loaded.html")
+        streamed = os.path.join(self.public, "streamed.html")
+        with redirect_stdout(StringIO()):
+            generate_page(source, self.template, loaded)
+            generate_page(source, self.template, streamed, stream_threshold=0)
+        return self.read(loaded), self.read(streamed)
+
+    def test_streamed_page_matches_loaded_page(self):
+        source = os.path.join(self.content, "page.md")
+        self.write(source, "intro\n\n# Title here\n\n" + "\n\n".join(f"* item **{x}**\n* [link](/{x})" for x in range(200)))
+        loaded, streamed = self.generate_loaded_and_streamed(source)
+        self.assertEqual(loaded, streamed)
+
+    def test_streamed_page_has_the_loaded_page_metadata(self):
+        source = os.path.join(self.content, "page.md")
+        self.write(source, "---\ntitle: Front Title\n---\n\n# Heading Title\n\n## Part\n\ntext\n\n## Part\n\nmore text")
+        for text in ("<title>{{ Title }}</title>{{ Content }}",
+                     "<title>{{ Title }}</title>{{ Toc }}<p>{{ WordCount }}</p>{{ Content }}"):
+            self.write(self.template, text)
+            loaded, html = self.generate_loaded_and_streamed(source)
+            self.assertEqual(loaded, html)
+            self.assertIn("<title>Front Title</title>", html)
+            self.assertNotIn("{{", html)
+        self.assertIn('<h2 id="part-1">', html)
+
+    def test_streamed_page_memory_is_bounded_by_block(self):
+        source = os.path.join(self.content, "big.md")
+        self.write(source, "# Big\n\n" + "".join(
+            f"paragraph {x} with some **bold** text and a [link](/page/{x})\n\n" for x in range(20000)))
+        size = os.path.getsize(source)
+        tracemalloc.start()
+        write_html(markdown_file_to_html_node(source), NullStream(), buffer_size=4096)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(peak, size / 2)
+
+    def test_extract_title_from_file(self):
+        source = os.path.join(self.content, "page.md")
+        self.write(source, "text\n\n  # the title\n\nmore")
+        self.assertEqual(extract_title_from_file(source), "the title")
+
+
+class testConstantMemoryBuild(SiteTestCase):
+    """CONSTANT_MEMORY_PAGES sets the size of the tree the memory test builds, e.g. 1000000,
+    CONSTANT_MEMORY_RSS_MB the resident memory ceiling it has to stay under.
+    """
+
+    def measure(self, pages, rss_limit_mb):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_build_memory.py")
+        result = subprocess.run([sys.executable, script, "--pages", str(pages), "--pages-per-dir", "100",
+                                 "--tracemalloc", "--json", "--rss-limit", rss_limit_mb],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout)
+
+    def test_peak_memory_does_not_grow_with_the_tree(self):
+        pages = int(os.environ.get("CONSTANT_MEMORY_PAGES", 1600))
+        ceiling = os.environ.get("CONSTANT_MEMORY_RSS_MB", "128")
+        small = self.measure(max(pages // 4, 1), ceiling)
+        large = self.measure(pages, ceiling)
+        if "CONSTANT_MEMORY_PAGES" in os.environ:
+            print(f"\n{large['pages']} pages in {large['seconds']:.1f}s, peak rss {large['peak_rss'] / 2**20:.1f}MiB, "
+                  f"peak traced {large['peak_traced'] / 1024:.0f}KiB ({small['peak_traced'] / 1024:.0f}KiB "
+                  f"for {small['pages']} pages)", file=sys.stderr)
+        self.assertEqual(large["pages"], pages)
+        self.assertLess(large["peak_traced"], small["peak_traced"] * 1.25 + 32 * 1024)
+
+    def test_output_matches_a_regular_build(self):
+        for x, rel_path in enumerate(("index.md", os.path.join("a", "index.md"), os.path.join("a", "b", "c.md"))):
+            self.write(os.path.join(self.content, rel_path), f"# Page {x}\n\nsome *text*")
+        regular = self.build(incremental=False)
+        self.assertEqual(regular.generated, 3)
+        expected = self.read_tree(self.public)
+        shutil.rmtree(self.public)
+        constant = self.build(incremental=False, constant_memory=True)
+        self.assertEqual(constant.generated, 3)
+        self.assertEqual(self.read_tree(self.public), expected)
+        with self.assertRaises(ValueError):
+            self.build(constant_memory=True)
+
+
+class NullStream(io.TextIOBase):
+    def write(self, text):
+        return len(text)
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,74 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from assets import use_asset_map
+from site_gen import generate_page, generate_pages
+from site_test_case import SiteTestCase
+from split_page import SplitOptions, iter_chunks, parse_split_options
+
+
+class testSplitPage(SiteTestCase):
+    template_text = "<title>{{ Title }}</title><p>{{ WordCount }} {{ author }}</p>{{ Toc }}<main>{{ Content }}</main>"
+
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.content, "page.md")
+        sections = []
+        for x in range(60):
+            sections.append(f"## Section {x % 7}\n\nsome **bold** text with ![logo](/images/logo.png) and `code {x}`"
+                            f"\n\n* item {x}\n* [link](/page{x})\n\n> quoted {x}\n\n1. one\n2. two\n\n```\nblock {x}\n```")
+        self.write(self.source, "---\nauthor: Ann\n---\n\n# Reference\n\n" + "\n\n".join(sections))
+        use_asset_map({"/images/logo.png": "/images/logo.0123abcd.png"})
+
+    def tearDown(self):
+        use_asset_map({})
+        super().tearDown()
+
+    def render(self, name, **options):
+        dest = os.path.join(self.public, name)
+        with redirect_stdout(StringIO()):
+            generate_page(self.source, self.template, dest, **options)
+        return self.read(dest)
+
+    def test_output_matches_serial_render(self):
+        serial = self.render("serial.html")
+        self.assertIn('<h2 id="section-0-1">', serial)
+        self.assertIn("/images/logo.0123abcd.png", serial)
+        for options in (SplitOptions(threshold=1, workers=2, chunk_bytes=500, in_flight=1),
+                        SplitOptions(threshold=1, workers=2, chunk_bytes=1),
+                        SplitOptions(threshold=1, workers=1, chunk_bytes=1 << 20)):
+            self.assertEqual(self.render("split.html", split=options), serial, options)
+
+    def test_streamed_output_matches_serial_render(self):
+        serial = self.render("serial.html", stream_threshold=1)
+        split = self.render("split.html", stream_threshold=1, split=SplitOptions(threshold=1, workers=2, chunk_bytes=300))
+        self.assertEqual(split, serial)
+        self.assertEqual(serial, self.render("loaded.html"))
+
+    def test_small_pages_are_not_split(self):
+        size = os.path.getsize(self.source)
+        self.assertEqual(self.render("split.html", split=SplitOptions(threshold=size + 1, workers=2)),
+                         self.render("serial.html"))
+
+    def test_iter_chunks_end_at_block_boundaries(self):
+        blocks = [(f"block {x}", None) for x in range(10)]
+        chunks = list(iter_chunks(blocks, 14))
+        self.assertEqual([len(chunk) for chunk, _ in chunks], [2, 2, 2, 2, 2])
+        self.assertEqual([block for chunk, _ in chunks for block in chunk], [block for block, _ in blocks])
+        self.assertEqual(list(iter_chunks([], 16)), [])
+
+    def test_parse_split_options(self):
+        options = parse_split_options("threshold=16M, workers=3, chunk_bytes=512k")
+        self.assertEqual((options.threshold, options.workers, options.chunk_bytes, options.in_flight),
+                         (16 * 1024 * 1024, 3, 512 * 1024, 6))
+        self.assertEqual(parse_split_options("").threshold, 64 * 1024 * 1024)
+        with self.assertRaises(ValueError):
+            parse_split_options("threads=2")
+        with self.assertRaises(ValueError):
+            generate_pages([], self.template, workers=2, split=SplitOptions())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import io
+import os
+import tempfile
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template_engine import Template, load_template
+
+
+class testTemplateEngine(unittest.TestCase):
+
+    def test_render_fills_placeholders(self):
+        template = Template("<title> {{ Title }} </title><article>{{ Content }}</article>")
+        result = template.render({"Title": "home", "Content": "<p>hi</p>"})
+        self.assertEqual(result, "<title> home </title><article><p>hi</p></article>")
+
+    def test_render_matches_str_replace(self):
+        source = "<head>{{ Title }}</head>\n<body>{{ Content }}</body>\n"
+        result = Template(source).render({"Title": "t", "Content": "c"})
+        self.assertEqual(result, source.replace("{{ Title }}", "t").replace("{{ Content }}", "c"))
+
+    def test_arbitrary_and_repeated_placeholders(self):
+        template = Template("{{Title}}|{{ Author }}|{{  Title  }}")
+        self.assertEqual(template.placeholders, ("Title", "Author", "Title"))
+        self.assertEqual(template.render({"Title": "a", "Author": "b"}), "a|b|a")
+
+    def test_missing_values_are_left_unchanged(self):
+        template = Template("<p>{{ Title }} {{ Date }}</p>")
+        self.assertEqual(template.render({"Title": "a"}), "<p>a {{ Date }}</p>")
+
+    def test_values_are_not_rescanned(self):
+        template = Template("{{ Title }}{{ Content }}")
+        self.assertEqual(template.render({"Title": "{{ Content }}", "Content": "x"}), "{{ Content }}x")
+
+    def test_render_chunks_streams_nodes(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}")
+        node = ParentNode("div", [LeafNode("p", "hi")])
+        values = {"Title": "home", "Content": node}
+        stream = io.StringIO()
+        template.render_to(stream, values)
+        self.assertEqual(stream.getvalue(), "<title>home</title><div><p>hi</p></div>")
+        self.assertEqual(template.render(values), stream.getvalue())
+
+    def test_no_placeholders(self):
+        self.assertEqual(Template("plain").render({}), "plain")
+
+    def test_load_template_caches_until_changed(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "template.html")
+            with open(path, 'w') as file:
+                file.write("{{ Title }}")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+            with open(path, 'w') as file:
+                file.write("<h1>{{ Title }}</h1>")
+            os.utime(path, ns=(0, 0))
+            self.assertEqual(load_template(path).render({"Title": "x"}), "<h1>x</h1>")
+
+    def test_load_template_missing_path(self):
+        with self.assertRaises(ValueError):
+            load_template("/no/such/template.html")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -43,5 +43,18 @@ class testTextNode(unittest.TestCase):
 
 
 
+    def test_text_node_is_slotted(self):
+        node = TextNode("text", text_type_bold)
+        self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_text_node_to_html_node(self):
+        self.assertEqual(text_node_to_html_node(TextNode("t", text_type_text)), LeafNode(None, "t"))
+        self.assertEqual(text_node_to_html_node(TextNode("t", text_type_bold)), LeafNode("b", "t"))
+        self.assertEqual(text_node_to_html_node(TextNode("t", text_type_link, "/u")), LeafNode("a", "t", {"href": "/u"}))
+        self.assertEqual(text_node_to_html_node(TextNode("t", text_type_image, "/i.png")), LeafNode("img", "", {"src": "/i.png", "alt": "t"}))
+        with self.assertRaises(ValueError):
+            text_node_to_html_node(TextNode("t", "underline"))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,161 @@
+import os
+import threading
+import unittest
+import urllib.request
+from contextlib import redirect_stdout
+from io import StringIO
+
+from assets import use_asset_map
+from dependency_graph import DependencyGraph, dependency_key
+from file_system_utilities import sync_static_dir
+from watch import (
+    InotifyWatcher,
+    LiveReloadServer,
+    LIVE_RELOAD_PATH,
+    LIVE_RELOAD_SCRIPT,
+    PollingWatcher,
+    Rebuilder,
+    inject_live_reload,
+    _load_inotify,
+)
+from site_test_case import SiteTestCase
+
+
+class testWatch(SiteTestCase):
+    template_text = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+    def setUp(self):
+        super().setUp()
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+
+    def rebuilder(self):
+        return Rebuilder(self.content, self.static, self.template, self.public, self.manifest, self.static_manifest)
+
+    def test_polling_watcher_reports_changes(self):
+        watcher = PollingWatcher([self.content, self.template], interval=0.01)
+        self.assertEqual(watcher.wait(timeout=0), set())
+        post = os.path.join(self.content, "blog", "post.md")
+        self.write(post, "# Post changed")
+        os.remove(os.path.join(self.content, "index.md"))
+        self.assertEqual(watcher.wait(timeout=1), {post, os.path.join(self.content, "index.md")})
+
+    @unittest.skipIf(_load_inotify() is None, "inotify is not available")
+    def test_inotify_watcher_reports_changes(self):
+        watcher = InotifyWatcher([self.content, self.template])
+        try:
+            self.write(self.template, "{{ Content }}")
+            self.write(os.path.join(self.root, "unrelated.txt"), "ignored")
+            self.assertEqual(watcher.wait(timeout=1), {self.template})
+            os.makedirs(os.path.join(self.content, "new"))
+            self.assertEqual(watcher.wait(timeout=1), {os.path.join(self.content, "new", "")})
+            page = os.path.join(self.content, "new", "page.md")
+            self.write(page, "# New")
+            self.assertEqual(watcher.wait(timeout=1), {page})
+        finally:
+            watcher.close()
+
+    def test_rebuild_single_page(self):
+        self.build()
+        post = os.path.join(self.content, "blog", "post.md")
+        self.write(post, "# Post changed")
+        with redirect_stdout(StringIO()):
+            rebuilt = self.rebuilder().rebuild({post})
+        self.assertEqual(rebuilt, [os.path.join(self.public, "blog", "post.html")])
+        self.assertEqual(self.build().skipped, 2)
+
+    def test_broken_page_keeps_previous_output_until_fixed(self):
+        post = os.path.join(self.content, "blog", "post.md")
+        html = os.path.join(self.public, "blog", "post.html")
+        rebuilder = self.rebuilder()
+        self.build()
+        before = self.read(html)
+        for broken in ("# Post\n\nsome **unclosed", "no title"):
+            self.write(post, broken)
+            output = StringIO()
+            with redirect_stdout(output):
+                self.assertEqual(rebuilder.rebuild({post}), [])
+            self.assertIn(f"Error building {post}", output.getvalue())
+            self.assertEqual(self.read(html), before)
+        self.write(post, "# Post\n\nsome **closed**")
+        with redirect_stdout(StringIO()):
+            self.assertEqual(rebuilder.rebuild({post}), [html])
+        self.assertIn("<b>closed</b>", self.read(html))
+
+    def test_rebuild_deleted_page_and_static(self):
+        self.build()
+        index = os.path.join(self.content, "index.md")
+        os.remove(index)
+        css = os.path.join(self.static, "index.css")
+        with redirect_stdout(StringIO()):
+            rebuilt = self.rebuilder().rebuild({index, css})
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.css")))
+        self.assertEqual(len(rebuilt), 2)
+
+    def test_rebuild_keeps_dependency_graph_current(self):
+        graph_path = os.path.join(self.root, ".build", "dependencies.json")
+        rebuilder = Rebuilder(self.content, self.static, self.template, self.public, self.manifest,
+                              self.static_manifest, graph_path)
+        self.build(dependencies=rebuilder.dependencies)
+        post = os.path.join(self.content, "blog", "post.md")
+        index = os.path.join(self.content, "index.md")
+        with redirect_stdout(StringIO()):
+            self.write(post, "# Post\n\n![image](/index.css)")
+            rebuilder.rebuild({post})
+            os.remove(index)
+            rebuilder.rebuild({index})
+        graph = DependencyGraph.load(graph_path, self.static)
+        self.assertEqual(graph.affected([os.path.join(self.static, "index.css")]),
+                         {dependency_key(os.path.join(self.public, "blog", "post.html"))})
+        self.assertEqual(len(graph.outputs), 1)
+
+    def test_changed_fingerprinted_asset_is_republished(self):
+        self.write(self.template, '<link href="/index.css">{{ Content }}')
+        css = os.path.join(self.static, "index.css")
+        stats = sync_static_dir(self.static, self.public, self.static_manifest, fingerprint=True)
+        self.build(asset_map=stats.assets)
+        rebuilder = Rebuilder(self.content, self.static, self.template, self.public, self.manifest,
+                              self.static_manifest, fingerprint=True, asset_map=stats.assets)
+        self.write(css, "body { color: red }")
+        with redirect_stdout(StringIO()):
+            rebuilder.rebuild({css})
+        try:
+            new_url = rebuilder.asset_map["/index.css"]
+            self.assertNotEqual(new_url, stats.assets["/index.css"])
+            self.assertTrue(os.path.isfile(os.path.join(self.public, new_url[1:])))
+            self.assertIn(f'href="{new_url}"', self.read(os.path.join(self.public, "index.html")))
+            self.assertIn(new_url, self.read(os.path.join(self.public, "_headers")))
+        finally:
+            use_asset_map({})
+
+    def test_template_change_rebuilds_every_page(self):
+        self.build()
+        self.write(self.template, "<h1>{{ Title }}</h1>")
+        with redirect_stdout(StringIO()):
+            rebuilt = self.rebuilder().rebuild({self.template})
+        self.assertEqual(rebuilt, ["pages: generated 2, removed 0"])
+
+    def test_inject_live_reload(self):
+        self.assertEqual(inject_live_reload(b"<body>x</body>"), b"<body>x" + LIVE_RELOAD_SCRIPT.encode() + b"</body>")
+        self.assertEqual(inject_live_reload(b"x"), b"x" + LIVE_RELOAD_SCRIPT.encode())
+
+    def test_live_reload_server(self):
+        self.write(os.path.join(self.public, "index.html"), "<body>home</body>")
+        server = LiveReloadServer(("127.0.0.1", 0), self.public)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            with urllib.request.urlopen(f"{base}/") as response:
+                self.assertIn(LIVE_RELOAD_SCRIPT.encode(), response.read())
+            with urllib.request.urlopen(f"{base}{LIVE_RELOAD_PATH}", timeout=5) as events:
+                server.notify_reload()
+                self.assertEqual(events.readline(), b"data: reload\n")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
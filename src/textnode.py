@@ -1,4 +1,5 @@
 from htmlnode import LeafNode
+from assets import rewrite_url
 from typing import Type
 text_type_text = "text"
 text_type_bold = "bold"
@@ -8,8 +9,21 @@ text_type_link = "link"
 text_type_image = "image"
 
 
+# html tag each text type renders as
+text_type_tags = {
+    text_type_text: None,
+    text_type_bold: "b",
+    text_type_italic: "i",
+    text_type_code: "code",
+    text_type_link: "a",
+    text_type_image: "img",
+}
+
+
 class TextNode:
     """Model to represent types of inline text for parsing Markdown"""    
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text: str, text_type: str, url: str = None):
         """Constructor with 3 properties
             current expected text types are: (Normal text,Bold text,Italic text,Code text,Links,Images)
@@ -56,19 +70,13 @@ def text_node_to_html_node(text_node: TextNode) -> LeafNode:
     """    
     text_type = text_node.text_type
     text = text_node.text
-    if text_type == "text":
-        return LeafNode(None,text)
-    if text_type == "bold":
-        return LeafNode("b",text)
-    if text_type == "italic":
-        return LeafNode("i",text)
-    if text_type == "code":
-        return LeafNode("code",text)
-    if text_type == "link":
+    if text_type == text_type_link:
         return LeafNode("a",text,{"href":text_node.url})
-    if text_type == "image":
-        return LeafNode("img",'',{"src":text_node.url,"alt":text})
-    raise ValueError(f"Invalid text type: {text_type}")
+    if text_type == text_type_image:
+        return LeafNode("img",'',{"src":rewrite_url(text_node.url),"alt":text})
+    if text_type not in text_type_tags:
+        raise ValueError(f"Invalid text type: {text_type}")
+    return LeafNode(text_type_tags[text_type],text)
 
 
 
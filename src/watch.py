@@ -0,0 +1,489 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Dict, List, Set, Tuple
+
+import assets
+from assets import use_asset_map, write_headers_file
+from build_manifest import BuildManifest, hash_file
+from dependency_graph import DependencyGraph
+from file_system_utilities import sync_static_dir
+from site_gen import generate_page, generate_pages_recursive, page_dest_path, record_dependencies
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM
+    | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_SCRIPT = (
+    f'<script>new EventSource("{LIVE_RELOAD_PATH}").onmessage = () => location.reload();</script>'
+)
+
+
+class PollingWatcher:
+    """watch files and directories by comparing stat snapshots.
+    used where inotify is not available.
+    """
+    def __init__(self, paths: List[str], interval: float = 0.2) -> None:
+        """
+        Args:
+            paths (List[str]): files and directories to watch, directories are watched recursively
+            interval (float, optional): seconds between snapshots. Defaults to 0.2.
+        """
+        self.paths = paths
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in self.paths:
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+                continue
+            for dir_path, _, files in os.walk(path):
+                for name in files:
+                    full_path = os.path.join(dir_path, name)
+                    try:
+                        stat = os.stat(full_path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[full_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout: float = None) -> Set[str]:
+        """block until something changed or the timeout expired.
+
+        Args:
+            timeout (float, optional): seconds to wait, None waits forever. Defaults to None.
+
+        Returns:
+            Set[str]: paths of the files that were created, modified or deleted
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._take_snapshot()
+            changed = {
+                path for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """watch files and directories with linux inotify through ctypes.
+    directories are watched recursively, new directories are picked up as they are created.
+    paths of directory events end with os.sep, so callers can tell them apart from files.
+    """
+    def __init__(self, paths: List[str], settle: float = 0.01) -> None:
+        """
+        Args:
+            paths (List[str]): files and directories to watch
+            settle (float, optional): seconds to keep collecting events after the first one,
+                so an editor's burst of writes is handled as one change. Defaults to 0.01.
+
+        Raises:
+            OSError: inotify is not available
+        """
+        self.libc = _load_inotify()
+        if self.libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.settle = settle
+        self.watches: Dict[int, str] = {}
+        self.tree_dirs: Set[str] = set()
+        self.files: Set[str] = set()
+        # directories only watched for the sake of single files, other entries in them are ignored
+        self.file_dirs: Set[str] = set()
+        for path in paths:
+            if os.path.isdir(path):
+                self._add_tree(path)
+            else:
+                # files are watched through their directory, editors often replace them
+                directory = os.path.dirname(path) or "."
+                self.files.add(os.path.join(directory, os.path.basename(path)))
+                self.file_dirs.add(directory)
+        for directory in self.file_dirs - self.tree_dirs:
+            self._add_watch(directory)
+        self.file_dirs -= self.tree_dirs
+
+    def _add_watch(self, path: str) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = path
+
+    def _add_tree(self, path: str) -> None:
+        for dir_path, _, _ in os.walk(path):
+            self.tree_dirs.add(dir_path)
+            self._add_watch(dir_path)
+
+    def _read_events(self) -> Set[str]:
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # events were dropped, report every watched directory as changed
+                    changed.update(os.path.join(path, '') for path in self.watches.values())
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if directory in self.file_dirs and path not in self.files:
+                    continue
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_tree(path)
+                    path = os.path.join(path, '')
+                changed.add(path)
+
+    def wait(self, timeout: float = None) -> Set[str]:
+        """block until something changed or the timeout expired.
+
+        Args:
+            timeout (float, optional): seconds to wait, None waits forever. Defaults to None.
+
+        Returns:
+            Set[str]: paths of the files and directories (ending with os.sep) that changed
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = self._read_events()
+        while True:
+            readable, _, _ = select.select([self.fd], [], [], self.settle)
+            if not readable:
+                return changed
+            changed |= self._read_events()
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+def create_watcher(paths: List[str], polling: bool = False):
+    """create an inotify watcher where available, falling back to polling.
+
+    Args:
+        paths (List[str]): files and directories to watch
+        polling (bool, optional): always use the polling watcher. Defaults to False.
+
+    Returns:
+        InotifyWatcher | PollingWatcher: the watcher
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(paths)
+        except OSError:
+            pass
+    return PollingWatcher(paths)
+
+
+class Rebuilder:
+    """turns a set of changed paths into the smallest rebuild:
+    changed markdown files regenerate only their own page, deleted ones remove their html,
+    static changes sync only the changed assets and a template change rebuilds every page.
+    with a dependency graph path the graph is kept current with every rebuild.
+    with fingerprinted assets a changed static file gets a new fingerprinted copy,
+    and the pages referencing it are rebuilt to point at it.
+    """
+    def __init__(self, content_dir: str, static_dir: str, template_path: str, dest_dir: str,
+                 manifest_path: str, static_manifest_path: str, dependencies_path: str = None,
+                 use_hash: bool = False, link: bool = False, fingerprint: bool = False,
+                 asset_map: Dict[str, str] = None) -> None:
+        """
+        Args:
+            content_dir (str): directory with markdown content
+            static_dir (str): directory with static assets
+            template_path (str): path to the template html file
+            dest_dir (str): output directory
+            manifest_path (str): path to the build manifest
+            static_manifest_path (str): path to the manifest of synced static files
+            dependencies_path (str, optional): path to the dependency graph. Defaults to None.
+            use_hash (bool, optional): compare static file contents, see sync_static_dir. Defaults to False.
+            link (bool, optional): hard link static files, see sync_static_dir. Defaults to False.
+            fingerprint (bool, optional): publish fingerprinted static files, see sync_static_dir. Defaults to False.
+            asset_map (Dict[str, str], optional): fingerprinted urls of the build being watched. Defaults to None.
+        """
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.dest_dir = dest_dir
+        self.manifest_path = manifest_path
+        self.static_manifest_path = static_manifest_path
+        self.dependencies = DependencyGraph.load(dependencies_path, static_dir) if dependencies_path else None
+        self.use_hash = use_hash
+        self.link = link
+        self.fingerprint = fingerprint
+        self.asset_map = asset_map or {}
+
+    def rebuild(self, paths: Set[str]) -> List[str]:
+        """rebuild whatever the changed paths affect.
+
+        Args:
+            paths (Set[str]): changed files, directories end with os.sep
+
+        Returns:
+            List[str]: descriptions of what was rebuilt, empty if nothing was affected
+        """
+        content_root = os.path.join(os.path.abspath(self.content_dir), '')
+        static_root = os.path.join(os.path.abspath(self.static_dir), '')
+        template = os.path.abspath(self.template_path)
+        pages = []
+        full_build = False
+        static_changed = False
+        for path in paths:
+            absolute = os.path.abspath(path)
+            if absolute == template:
+                full_build = True
+            elif absolute.startswith(content_root) or absolute == content_root[:-1]:
+                if path.endswith(os.sep):
+                    full_build = True
+                elif path.endswith(".md"):
+                    pages.append(path)
+            elif absolute.startswith(static_root) or absolute == static_root[:-1]:
+                static_changed = True
+
+        rebuilt = []
+        if static_changed:
+            stats = sync_static_dir(self.static_dir, self.dest_dir, self.static_manifest_path, self.use_hash,
+                                    self.link, self.fingerprint)
+            rebuilt.append(f"static: copied {stats.copied}, removed {stats.removed}")
+            if self.fingerprint:
+                write_headers_file(os.path.join(self.dest_dir, "_headers"), stats.assets)
+                if stats.assets != self.asset_map:
+                    # the full build only regenerates the pages referencing a changed asset, given a graph
+                    self.asset_map = stats.assets
+                    full_build = True
+        if self.asset_map != assets.asset_map:
+            use_asset_map(self.asset_map)
+        if full_build:
+            stats = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, self.manifest_path,
+                                             asset_map=self.asset_map, dependencies=self.dependencies)
+            rebuilt.append(f"pages: generated {stats.generated}, removed {stats.removed}")
+        elif pages:
+            rebuilt.extend(self.rebuild_pages(pages))
+        return rebuilt
+
+    def rebuild_pages(self, pages: List[str]) -> List[str]:
+        """regenerate or remove single pages and keep the build manifest in step.
+        a page with invalid markdown is reported and left as it was, it is built again once its source changes.
+        """
+        manifest = BuildManifest.load(self.manifest_path)
+        rebuilt = []
+        for from_path in sorted(pages):
+            key = os.path.join(self.content_dir, os.path.relpath(from_path, self.content_dir))
+            dest_path = page_dest_path(key, self.content_dir, self.dest_dir)
+            if os.path.isfile(from_path):
+                source_hash = hash_file(from_path)
+                if manifest.page_unchanged(key, source_hash, dest_path):
+                    continue
+                try:
+                    # written atomically, so a page that fails while it is written keeps its previous html
+                    generate_page(from_path, self.template_path, dest_path, skip_unchanged=True)
+                except ValueError as error:
+                    print(f"Error building {from_path}, keeping the previous {dest_path}: {error}")
+                    continue
+                manifest.pages[key] = {"hash": source_hash, "dest": dest_path}
+                if self.dependencies is not None:
+                    record_dependencies(self.dependencies, [(key, dest_path)], self.content_dir, self.template_path)
+                rebuilt.append(dest_path)
+            else:
+                manifest.pages.pop(key, None)
+                if self.dependencies is not None:
+                    self.dependencies.remove(dest_path)
+                if os.path.isfile(dest_path):
+                    os.remove(dest_path)
+                    rebuilt.append(dest_path)
+        if rebuilt:
+            manifest.save()
+            if self.dependencies is not None:
+                self.dependencies.save()
+        return rebuilt
+
+
+class LiveReloadServer(ThreadingHTTPServer):
+    """serve the output directory and push a reload event to every open page after a rebuild.
+    pages subscribe with server sent events, the subscription script is injected into html responses.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], directory: str) -> None:
+        self.version = 0
+        self.closing = False
+        self.condition = threading.Condition()
+        super().__init__(address, partial(LiveReloadHandler, directory=directory))
+
+    def notify_reload(self) -> None:
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def shutdown(self) -> None:
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        super().shutdown()
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == LIVE_RELOAD_PATH:
+            self.send_events()
+            return
+        super().do_GET()
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split('?', 1)[0].endswith('/'):
+            path = os.path.join(path, "index.html")
+        if not path.endswith(".html") or not os.path.isfile(path):
+            return super().send_head()
+        with open(path, 'rb') as file:
+            html = file.read()
+        body = inject_live_reload(html)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        return BytesIO(body)
+
+    def send_events(self):
+        server = self.server
+        # read the version before the client sees the response, so no rebuild after it is missed
+        version = server.version
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        try:
+            while True:
+                with server.condition:
+                    server.condition.wait_for(lambda: server.version != version or server.closing, timeout=15)
+                    if server.closing:
+                        return
+                    changed = server.version != version
+                    version = server.version
+                self.wfile.write(b"data: reload\n\n" if changed else b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def log_message(self, format, *args):
+        pass
+
+def inject_live_reload(html: bytes) -> bytes:
+    """add the live reload script to an html page, before </body> when there is one."""
+    script = LIVE_RELOAD_SCRIPT.encode()
+    index = html.rfind(b"</body>")
+    if index == -1:
+        return html + script
+    return html[:index] + script + html[index:]
+
+
+def watch(content_dir: str, static_dir: str, template_path: str, dest_dir: str,
+          manifest_path: str, static_manifest_path: str, port: int = 8888, polling: bool = False,
+          dependencies_path: str = None, use_hash: bool = False, link: bool = False, fingerprint: bool = False,
+          asset_map: Dict[str, str] = None) -> None:
+    """serve the output directory and rebuild whatever changes in content, static or the template,
+    reloading open browsers after every rebuild. runs until interrupted.
+
+    Args:
+        content_dir (str): directory with markdown content
+        static_dir (str): directory with static assets
+        template_path (str): path to the template html file
+        dest_dir (str): output directory that is served
+        manifest_path (str): path to the build manifest
+        static_manifest_path (str): path to the manifest of synced static files
+        port (int, optional): port to serve on. Defaults to 8888.
+        polling (bool, optional): poll for changes instead of using inotify. Defaults to False.
+        dependencies_path (str, optional): path to the dependency graph kept current while watching. Defaults to None.
+        use_hash (bool, optional): compare static file contents, as the first build did. Defaults to False.
+        link (bool, optional): hard link static files, as the first build did. Defaults to False.
+        fingerprint (bool, optional): publish fingerprinted static files, as the first build did. Defaults to False.
+        asset_map (Dict[str, str], optional): fingerprinted urls of the first build. Defaults to None.
+    """
+    rebuilder = Rebuilder(content_dir, static_dir, template_path, dest_dir, manifest_path, static_manifest_path,
+                          dependencies_path, use_hash, link, fingerprint, asset_map)
+    watcher = create_watcher([content_dir, static_dir, template_path], polling)
+    server = LiveReloadServer(("", port), dest_dir)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Watching with {type(watcher).__name__}, serving {dest_dir} on http://localhost:{port}/")
+    try:
+        while True:
+            paths = watcher.wait()
+            start = time.perf_counter()
+            try:
+                rebuilt = rebuilder.rebuild(paths)
+            except ValueError as error:
+                # e.g. a full rebuild reaching a page with invalid markdown, keep serving and watching
+                print(f"Rebuild failed: {error}")
+                continue
+            if rebuilt:
+                server.notify_reload()
+                print(f"Rebuilt {', '.join(rebuilt)} in {(time.perf_counter() - start) * 1000:.1f}ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        watcher.close()